@@ -26,8 +26,29 @@ Estructura del Proyecto:
     - `m3uorgan1zat0r.py`: Este archivo. El punto de entrada de la aplicación.
     - `organizadorm3u.py`: Contiene la clase principal `M3UOrganizer`, que define la interfaz y la lógica principal.
     - `actions.py`: Define las funciones para manejar acciones del usuario, como copiar, pegar, y mostrar menús contextuales.
-    - `threads.py`: Define hilos para cargar archivos M3U y buscar dentro del contenido.
+    - `threads.py`: Define hilos para buscar dentro del contenido, leer guías EPG, comparar, descargar y exportar listas.
     - `optionsmenu.py`: Contiene funciones para mostrar diálogos de "Acerca de" y "Cómo usar".
+    - `network.py`: Sesión HTTP compartida (pool de conexiones, timeouts, reintentos y paralelismo acotado).
+    - `logos.py`: Carga asíncrona de logos de canales con caché LRU en memoria y caché en disco.
+    - `widgets.py`: Widgets propios, como el editor de canales que muestra los logos de las filas visibles.
+    - `player.py`: Pool de reproductores VLC reutilizables para la previsualización de streams.
+    - `probe.py`: Análisis en segundo plano de resolución, códecs y bitrate de los streams, con caché en disco.
+    - `epg.py`: Lectura incremental de guías XMLTV (también .xml.gz) unidas a los canales por tvg-id.
+    - `channelstore.py`: Analizador M3U y almacén columnar de canales con índices por group-title y host.
+    - `query.py`: Lenguaje de consulta del filtro, compilado a un plan que se evalúa sobre las columnas del almacén.
+    - `grouptree.py`: Panel de grupos (group-title) con recuentos mantenidos de forma incremental.
+    - `diff.py`: Comparación en tiempo lineal de dos versiones de una lista (añadidos, eliminados y cambios).
+    - `exporters.py`: Exportación en streaming a M3U, JSON Lines, CSV y XSPF, y división por group-title en paralelo.
+    - `server.py`: Servidor HTTP local que publica la lista del panel derecho y las vistas de filtro guardadas.
+    - `watcher.py`: Vigilancia del archivo cargado, leyendo solo las líneas añadidas al final cuando solo crece.
+    - `scheduler.py`: Actualización programada en segundo plano de las listas de las URLs guardadas.
+    - `downloads.py`: Descargas reanudables y en tramos paralelos (HTTP Range) de las listas remotas.
+    - `compression.py`: Lectura en streaming de listas y guías comprimidas (gzip, xz, bzip2, zip).
+    - `loader.py`: Carga de listas por etapas (lectura, decodificación, análisis, indexado y presentación) con cancelación inmediata.
+    - `history.py`: Historial de deshacer/rehacer formado por operaciones pequeñas, sin copias de la lista.
+    - `thumbnails.py`: Cuadrícula de miniaturas de los canales capturadas con un pool acotado de reproductores VLC sin ventana, con caché en disco.
+    - `workspace.py`: Guardado periódico y al cerrar de la sesión de trabajo en un archivo binario compacto, y recuperación en segundo plano al arrancar.
+    - `uptime.py`: Historial de disponibilidad, TTFB y bitrate de cada URL con totales diarios acumulados, y cifras por canal y por host.
     - `url_guardadas.json: Contiene las URL y los nombres que el usuario guarde".
 
 Uso:
@@ -9,18 +9,23 @@ y utiliza la `vlc` para reproducir vídeos fuera del programa.
 
 Funciones:
 ----------
-- copy_selection(main_window): Copia el texto seleccionado en el QTextEdit enfocado.
-- paste_selection(main_window): Pega el texto del portapapeles en el QTextEdit enfocado.
+- copy_selection(main_window): Copia la selección del panel enfocado (texto o referencias a canales).
+- paste_selection(main_window): Pega el contenido del portapapeles en el panel enfocado.
 - show_context_menu(main_window, position): Muestra un menú contextual en la posición dada 
   con opciones de copiar, pegar, abrir en VLC, previsualizar streaming y seleccionar todo.
 - open_with_vlc(main_window, url): Abre la URL dada en VLC según el sistema operativo.
+- show_right_panel_menu(main_window, position): Muestra el menú contextual del panel derecho (copiar, pegar,
+  eliminar, subir, bajar, ordenar, previsualizar y vaciar la lista).
 - handle_double_click(main_window, event): Maneja la edición de una línea de texto en un QTextEdit al hacer doble clic.
+- edit_right_panel_channel(main_window, index): Edita la línea EXTINF de un canal del panel derecho.
 - VideoDialog(QDialog): Crea una ventana detro del programa para previsualizar un stream de video utilizando 
-python-VLC en un widget de video integrado.
+python-VLC en un widget de video integrado. Reutiliza un reproductor del pool compartido, detecta si el stream
+está listo mediante los eventos de VLC y permite cambiar de canal sin cerrar la ventana.
 - load_urls(): Carga las URLs guardadas desde un archivo JSON.
 - save_urls(urls): Guarda las URLs en un archivo JSON.
 - guardar_url(self): Muestra un diálogo para guardar una nueva URL bajo un nombre específico.
-- ver_urls_guardadas(self): Muestra un diálogo para gestionar las URLs guardadas, permitiendo editarlas, eliminarlas y copiarlas.
+- ver_urls_guardadas(self): Muestra un diálogo para gestionar las URLs guardadas, permitiendo editarlas, eliminarlas, copiarlas,
+  abrirlas y programar su actualización automática. Cada entrada muestra su última actualización, tamaño y cambios.
 
 Clases:
 -------
@@ -29,31 +34,45 @@ requirements.txt.
 
 """
 
-from PyQt5.QtWidgets import (QAction, QDialog, QLineEdit, 
-                             QApplication, QDialog, QVBoxLayout, QPushButton, QListWidget,
+from PyQt5.QtWidgets import (QAction, QDialog, QLineEdit, QLabel, QHBoxLayout,
+                             QApplication, QDialog, QVBoxLayout, QPushButton, QListWidget, QListWidgetItem,
                             QInputDialog, QMenu, QMessageBox, QScrollArea, QWidget, QFileDialog)
 from PyQt5.QtGui import QTextCursor
-from PyQt5.QtCore import QProcess, QTimer
+from PyQt5.QtCore import QProcess, QTimer, Qt, pyqtSignal
 from PyQt5.QtMultimediaWidgets import QVideoWidget
 import sys
 import vlc
 import json
 import os
+from scheduler import entry_interval, entry_url
 
 def copy_selection(main_window):
-    text_edit = main_window.text_left if main_window.text_left.hasFocus() else main_window.text_right
-    text_edit.copy()
+    if main_window.right_panel.hasFocus():
+        # Se copian las referencias a los canales (y su texto, si la selección no es muy grande)
+        view = main_window.right_panel
+        indexes = [view.model().index(row) for row in view.selected_rows()]
+        if indexes:
+            QApplication.clipboard().setMimeData(view.model().mimeData(indexes))
+        return
+    main_window.text_left.copy()
 
 def paste_selection(main_window):
-    text_edit = main_window.text_left if main_window.text_left.hasFocus() else main_window.text_right
-    text_edit.paste()
+    if main_window.right_panel.hasFocus():
+        main_window.paste_into_right_panel(QApplication.clipboard().mimeData())
+        return
+    main_window.text_left.paste()
 
 def show_context_menu(main_window, position):
-    cursor = main_window.text_left.textCursor() if main_window.text_left.hasFocus() else main_window.text_right.textCursor()
+    cursor = main_window.text_left.textCursor()
     selected_text = cursor.selectedText().strip()
 
     context_menu = QMenu()
 
+    # Opción para añadir los canales seleccionados a la lista del panel derecho
+    send_action = QAction("Enviar al panel derecho", main_window)
+    send_action.triggered.connect(main_window.send_selection_to_right_panel)
+    context_menu.addAction(send_action)
+
     # Opción para copiar el texto seleccionado
     copy_action = QAction("Copiar", main_window)
     copy_action.triggered.connect(lambda: copy_selection(main_window))
@@ -77,11 +96,76 @@ def show_context_menu(main_window, position):
 
     # Opción para seleccionar todo el texto
     select_all_action = QAction("Seleccionar Todo", main_window)
-    select_all_action.triggered.connect(lambda: (main_window.text_left.selectAll() if main_window.text_left.hasFocus() else main_window.text_right.selectAll()))
+    select_all_action.triggered.connect(main_window.text_left.selectAll)
     context_menu.addAction(select_all_action)
 
     # Mostrar el menú contextual
-    context_menu.exec_(main_window.text_left.mapToGlobal(position) if main_window.text_left.hasFocus() else main_window.text_right.mapToGlobal(position))
+    context_menu.exec_(main_window.text_left.mapToGlobal(position))
+
+def show_right_panel_menu(main_window, position):
+    view = main_window.right_panel
+    model = view.model()
+    rows = view.selected_rows()
+
+    context_menu = QMenu()
+
+    copy_action = QAction("Copiar", main_window)
+    copy_action.triggered.connect(lambda: copy_selection(main_window))
+    copy_action.setEnabled(bool(rows))
+    context_menu.addAction(copy_action)
+
+    paste_action = QAction("Pegar", main_window)
+    paste_action.triggered.connect(lambda: main_window.paste_into_right_panel(QApplication.clipboard().mimeData()))
+    context_menu.addAction(paste_action)
+
+    delete_action = QAction("Eliminar", main_window)
+    delete_action.triggered.connect(lambda: model.remove_rows(rows))
+    delete_action.setEnabled(bool(rows))
+    context_menu.addAction(delete_action)
+
+    context_menu.addSeparator()
+
+    up_action = QAction("Subir", main_window)
+    up_action.triggered.connect(lambda: main_window.move_right_panel_rows(rows, rows[0] - 1))
+    up_action.setEnabled(bool(rows) and rows[0] > 0)
+    context_menu.addAction(up_action)
+
+    down_action = QAction("Bajar", main_window)
+    down_action.triggered.connect(lambda: main_window.move_right_panel_rows(rows, rows[-1] + 2))
+    down_action.setEnabled(bool(rows) and rows[-1] < model.rowCount() - 1)
+    context_menu.addAction(down_action)
+
+    sort_name_action = QAction("Ordenar por nombre", main_window)
+    sort_name_action.triggered.connect(lambda: model.sort_by(lambda store, channel_id: store.name[channel_id].lower()))
+    context_menu.addAction(sort_name_action)
+
+    sort_group_action = QAction("Ordenar por group-title", main_window)
+    sort_group_action.triggered.connect(lambda: model.sort_by(lambda store, channel_id: store.group[channel_id].lower()))
+    context_menu.addAction(sort_group_action)
+
+    context_menu.addSeparator()
+
+    if len(rows) == 1:
+        store, channel_id = model.rows[rows[0]]
+        url = store.url[channel_id]
+        if url.startswith("http://") or url.startswith("https://"):
+            open_with_vlc_action = QAction("Abrir con VLC", main_window)
+            open_with_vlc_action.triggered.connect(lambda: open_with_vlc(main_window, url))
+            context_menu.addAction(open_with_vlc_action)
+
+            preview_action = QAction("Previsualizar Streaming", main_window)
+            preview_action.triggered.connect(lambda: main_window.preview_stream_from_menu(url))
+            context_menu.addAction(preview_action)
+
+    select_all_action = QAction("Seleccionar Todo", main_window)
+    select_all_action.triggered.connect(view.selectAll)
+    context_menu.addAction(select_all_action)
+
+    clear_action = QAction("Vaciar lista", main_window)
+    clear_action.triggered.connect(model.clear)
+    context_menu.addAction(clear_action)
+
+    context_menu.exec_(view.viewport().mapToGlobal(position))
 
 # Funciones para abrir con VLC
 
@@ -150,8 +234,7 @@ def is_executable_in_path(executable):
     return False
 
 def handle_double_click(main_window, event):
-    # Identificar cuál de los QTextEdit ha recibido el evento
-    text_edit = main_window.text_left if main_window.text_left.viewport().underMouse() else main_window.text_right
+    text_edit = main_window.text_left
 
     cursor = text_edit.cursorForPosition(event.pos())
     cursor.select(QTextCursor.LineUnderCursor)
@@ -169,66 +252,191 @@ def handle_double_click(main_window, event):
 
     if ok:
         cursor.insertText(new_text)
+        # Mantener el almacén de canales sincronizado con las ediciones del panel izquierdo
+        main_window.on_left_line_edited(cursor.blockNumber(), selected_text, new_text)
+
+def edit_right_panel_channel(main_window, index):
+    if not index.isValid():
+        return
+    store, channel_id = main_window.right_panel.model().rows[index.row()]
+
+    dialog = QInputDialog(main_window)
+    dialog.setWindowTitle("Editar canal")
+    dialog.setLabelText("Modifica la línea EXTINF:")
+    dialog.setTextValue(store.extinf[channel_id])
+    dialog.setFixedSize(400, 150)
+
+    if dialog.exec_():
+        main_window.edit_right_panel_row(index.row(), dialog.textValue().strip())
         
 class VideoDialog(QDialog):
-    def __init__(self, parent=None, instance=None):
+    # Señales emitidas desde los callbacks de VLC (hilo de libvlc) hacia el hilo de la interfaz
+    stream_playing = pyqtSignal()
+    stream_failed = pyqtSignal()
+    stream_buffering = pyqtSignal(float)
+
+    # Tiempo máximo de espera antes de dar por fallido un stream que no llega a reproducirse
+    STREAM_TIMEOUT_MS = 15000
+
+    def __init__(self, parent=None, instance=None, player_pool=None):
         super(VideoDialog, self).__init__(parent)
         self.setWindowTitle("Video Preview")
         self.video_widget = QVideoWidget()
         self.video_widget.setMinimumSize(640, 480)
+        self.status_label = QLabel("")
+
+        # Botones para cambiar de canal sin cerrar la ventana
+        self.prev_button = QPushButton("Anterior")
+        self.next_button = QPushButton("Siguiente")
+        self.prev_button.clicked.connect(lambda: self.zap(-1))
+        self.next_button.clicked.connect(lambda: self.zap(1))
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(self.prev_button)
+        buttons_layout.addWidget(self.status_label, 1)
+        buttons_layout.addWidget(self.next_button)
+
         layout = QVBoxLayout()
         layout.addWidget(self.video_widget)
+        layout.addLayout(buttons_layout)
         self.setLayout(layout)
-        self.media_player = None
+
         self.instance = instance
+        self.player_pool = player_pool
+        self.media_player = None
+        self.playlist = []
+        self.current_index = -1
+        self.waiting = False
+
+        self.timeout_timer = QTimer(self)
+        self.timeout_timer.setSingleShot(True)
+        self.timeout_timer.timeout.connect(self.on_stream_failed)
+
+        self.stream_playing.connect(self.on_stream_playing)
+        self.stream_failed.connect(self.on_stream_failed)
+        self.stream_buffering.connect(self.on_stream_buffering)
 
     def closeEvent(self, event):
+        self.timeout_timer.stop()
+        self.waiting = False
         if self.media_player:
             self.media_player.stop()
         event.accept()
 
+    def acquire_player(self):
+        """
+        Obtiene (una sola vez) un reproductor del pool compartido, lo asocia al widget de vídeo y
+        registra los eventos de VLC que indican si el stream está listo o ha fallado.
+        """
+        if self.media_player is not None:
+            return self.media_player
+
+        if self.player_pool is not None:
+            self.media_player = self.player_pool.acquire()
+        else:
+            self.media_player = self.instance.media_player_new()
+
+        # Establecer el widget de salida de video según el sistema operativo
+        if sys.platform.startswith('linux'):
+            self.media_player.set_xwindow(int(self.video_widget.winId()))
+        elif sys.platform.startswith('win'):
+            self.media_player.set_hwnd(int(self.video_widget.winId()))
+        elif sys.platform.startswith('darwin'):  # macOS
+            self.media_player.set_nsobject(int(self.video_widget.winId()))
+
+        events = self.media_player.event_manager()
+        events.event_attach(vlc.EventType.MediaPlayerPlaying, lambda event: self.stream_playing.emit())
+        events.event_attach(vlc.EventType.MediaPlayerEncounteredError, lambda event: self.stream_failed.emit())
+        events.event_attach(vlc.EventType.MediaPlayerEndReached, lambda event: self.stream_failed.emit())
+        events.event_attach(vlc.EventType.MediaPlayerBuffering,
+                            lambda event: self.stream_buffering.emit(event.u.new_cache))
+        return self.media_player
+
+    def release_player(self):
+        if self.media_player is None:
+            return
+        events = self.media_player.event_manager()
+        for event_type in (vlc.EventType.MediaPlayerPlaying, vlc.EventType.MediaPlayerEncounteredError,
+                           vlc.EventType.MediaPlayerEndReached, vlc.EventType.MediaPlayerBuffering):
+            events.event_detach(event_type)
+        if self.player_pool is not None:
+            self.player_pool.release(self.media_player)
+        else:
+            self.media_player.release()
+        self.media_player = None
+
+    def set_playlist(self, urls, current_url):
+        """
+        Establece la lista de URLs por la que se puede navegar con los botones Anterior/Siguiente.
+        """
+        self.playlist = urls
+        try:
+            self._set_current_index(urls.index(current_url))
+        except ValueError:
+            self._set_current_index(-1)
+
+    def _set_current_index(self, index):
+        self.current_index = index
+        self.prev_button.setEnabled(index > 0)
+        self.next_button.setEnabled(0 <= index < len(self.playlist) - 1)
+
+    def zap(self, step):
+        index = self.current_index + step
+        if 0 <= index < len(self.playlist):
+            self._set_current_index(index)
+            self.play_video(self.playlist[index])
+
     def play_video(self, url):
         try:
             # Crear un nuevo objeto de medios desde la URL
             media = self.instance.media_new(url)
             if not media:
                 raise Exception("No se pudo crear el objeto de medios VLC.")
-            
+
             # Establecer la opción vout en opengl
             media.add_option('vout=opengl')
-            
-            # Asociar el medio con el reproductor
-            self.media_player = vlc.MediaPlayer()
-            self.media_player.set_media(media)
-            
-            # Establecer el widget de salida de video según el sistema operativo
-            if sys.platform.startswith('linux'):
-                self.media_player.set_xwindow(int(self.video_widget.winId()))
-            elif sys.platform.startswith('win'):
-                self.media_player.set_hwnd(int(self.video_widget.winId()))
-            elif sys.platform.startswith('darwin'):  # macOS
-                self.media_player.set_nsobject(int(self.video_widget.winId()))
-
-            # Comenzar la reproducción (sin mostrar la ventana aún)
-            self.media_player.play()
+
+            # Reutilizar el reproductor (solo se cambia el medio al cambiar de canal)
+            player = self.acquire_player()
+            player.stop()
+            player.set_media(media)
+
+            self.waiting = True
+            self.status_label.setText("Conectando...")
+            self.setWindowTitle(f"Video Preview - {url}")
+            player.play()
             print("Reproduciendo URL:", url)  # Mensaje de depuración
 
-            # Esperar un momento para verificar si el stream comienza
-            QTimer.singleShot(3000, self.check_stream_status)  # Esperar 3 segundos antes de verificar
+            # La disponibilidad del stream se detecta con los eventos de VLC; el temporizador solo
+            # evita esperar indefinidamente a un stream que nunca responde
+            self.timeout_timer.start(self.STREAM_TIMEOUT_MS)
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al intentar reproducir el stream: {str(e)}")
 
-    def check_stream_status(self):
-        # Comprobar si el estado es Error, Stopped o Ended
-        if self.media_player.get_state() in [vlc.State.Error, vlc.State.Stopped, vlc.State.Ended]:
-            # Detener el reproductor y mostrar un mensaje de error
+    def on_stream_buffering(self, percent):
+        if self.waiting:
+            self.status_label.setText(f"Cargando... {int(percent)}%")
+
+    def on_stream_playing(self):
+        if not self.waiting:
+            return
+        self.waiting = False
+        self.timeout_timer.stop()
+        self.status_label.setText("Reproduciendo")
+        self.show()  # Mostrar la ventana en cuanto la reproducción comienza
+
+    def on_stream_failed(self):
+        if not self.waiting:
+            return
+        self.waiting = False
+        self.timeout_timer.stop()
+        if self.media_player:
             self.media_player.stop()
-            QMessageBox.warning(self, "Error de reproducción", "No se pudo reproducir el stream. La URL puede estar inactiva o ser incorrecta.")
-            print("El stream no se pudo reproducir.")
-            self.close()  # Cerrar la ventana si la reproducción falla
-        else:
-            self.show()  # Mostrar la ventana solo si la reproducción es exitosa
+        self.status_label.setText("Stream no disponible")
+        QMessageBox.warning(self, "Error de reproducción", "No se pudo reproducir el stream. La URL puede estar inactiva o ser incorrecta.")
+        print("El stream no se pudo reproducir.")
+        if not self.isVisible():
+            self.close()  # Si la ventana aún no se había mostrado, no se llega a abrir
 
             
 # Acciones sobre las URL a Guardar
@@ -281,9 +489,27 @@ def ver_urls_guardadas(self):
     container_widget = QWidget()
     container_layout = QVBoxLayout(container_widget)
 
+    scheduler = self.refresh_scheduler
+
+    def item_text(nombre):
+        intervalo = entry_interval(urls[nombre])
+        programada = f"cada {intervalo} min, " if intervalo else ""
+        return f"{nombre} ({programada}{scheduler.describe(nombre)})"
+
     list_widget = QListWidget(container_widget)
     for nombre in urls:
-        list_widget.addItem(nombre)
+        item = QListWidgetItem(item_text(nombre))
+        item.setData(Qt.UserRole, nombre)
+        list_widget.addItem(item)
+
+    def update_item(nombre, state):
+        for row in range(list_widget.count()):
+            item = list_widget.item(row)
+            if item.data(Qt.UserRole) == nombre and nombre in urls:
+                item.setText(item_text(nombre))
+
+    scheduler.refreshed.connect(update_item)
+    dialog.finished.connect(lambda result: scheduler.refreshed.disconnect(update_item))
 
     container_layout.addWidget(list_widget)
     container_widget.setLayout(container_layout)
@@ -295,11 +521,14 @@ def ver_urls_guardadas(self):
     edit_button = QPushButton("Editar URL", dialog)
     delete_button = QPushButton("Eliminar URL", dialog)
     copy_button = QPushButton("Copiar URL", dialog)
+    open_button = QPushButton("Abrir lista", dialog)
+    refresh_button = QPushButton("Actualizar ahora", dialog)
+    schedule_button = QPushButton("Programar actualización", dialog)
 
     def edit_url():
         current_item = list_widget.currentItem()
         if current_item:
-            nombre_original = current_item.text()
+            nombre_original = current_item.data(Qt.UserRole)
 
             # Editar el nombre
             nuevo_nombre, ok_pressed = QInputDialog.getText(dialog, "Editar Nombre", "Modifica el nombre:", text=nombre_original)
@@ -308,25 +537,29 @@ def ver_urls_guardadas(self):
                 return
 
             # Editar la URL
-            nueva_url, ok_pressed = QInputDialog.getText(dialog, "Editar URL", "Modifica la URL:", text=urls[nombre_original])
+            nueva_url, ok_pressed = QInputDialog.getText(dialog, "Editar URL", "Modifica la URL:", text=entry_url(urls[nombre_original]))
             if not ok_pressed or not nueva_url:
                 QMessageBox.warning(dialog, "Advertencia", "La URL no puede estar vacía.")
                 return
 
             # Actualizar el registro y guardar
-            del urls[nombre_original]  # Eliminar el antiguo nombre
-            urls[nuevo_nombre] = nueva_url
+            entrada = urls.pop(nombre_original)  # Eliminar el antiguo nombre
+            if isinstance(entrada, dict):
+                urls[nuevo_nombre] = dict(entrada, url=nueva_url)
+            else:
+                urls[nuevo_nombre] = nueva_url
             save_urls(urls)
 
             # Actualizar la lista en la UI
-            current_item.setText(nuevo_nombre)
+            current_item.setData(Qt.UserRole, nuevo_nombre)
+            current_item.setText(item_text(nuevo_nombre))
 
             QMessageBox.information(dialog, "Éxito", f"'{nombre_original}' actualizado correctamente a '{nuevo_nombre}'.")
 
     def delete_url():
         current_item = list_widget.currentItem()
         if current_item:
-            nombre = current_item.text()
+            nombre = current_item.data(Qt.UserRole)
             del urls[nombre]
             save_urls(urls)
             list_widget.takeItem(list_widget.row(current_item))
@@ -335,19 +568,54 @@ def ver_urls_guardadas(self):
     def copy_url():
         current_item = list_widget.currentItem()
         if current_item:
-            nombre = current_item.text()
-            url = urls[nombre]
+            nombre = current_item.data(Qt.UserRole)
+            url = entry_url(urls[nombre])
             clipboard = QApplication.clipboard()
             clipboard.setText(url)
             QMessageBox.information(dialog, "Éxito", f"URL '{url}' copiada al portapapeles.")
 
+    def open_list():
+        current_item = list_widget.currentItem()
+        if current_item:
+            nombre = current_item.data(Qt.UserRole)
+            dialog.accept()
+            self.open_saved_list(nombre, entry_url(urls[nombre]))
+
+    def refresh_now():
+        current_item = list_widget.currentItem()
+        if current_item:
+            nombre = current_item.data(Qt.UserRole)
+            scheduler.refresh_now(nombre, entry_url(urls[nombre]))
+            current_item.setText(item_text(nombre))
+
+    def schedule_refresh():
+        current_item = list_widget.currentItem()
+        if current_item:
+            nombre = current_item.data(Qt.UserRole)
+            intervalo, ok_pressed = QInputDialog.getInt(dialog, "Programar actualización",
+                                                        "Actualizar cada (minutos, 0 para desactivar):",
+                                                        entry_interval(urls[nombre]), 0, 7 * 24 * 60)
+            if not ok_pressed:
+                return
+            url = entry_url(urls[nombre])
+            urls[nombre] = {"url": url, "intervalo": intervalo} if intervalo else url
+            save_urls(urls)
+            current_item.setText(item_text(nombre))
+            scheduler.check_due()
+
     edit_button.clicked.connect(edit_url)
     delete_button.clicked.connect(delete_url)
     copy_button.clicked.connect(copy_url)
+    open_button.clicked.connect(open_list)
+    refresh_button.clicked.connect(refresh_now)
+    schedule_button.clicked.connect(schedule_refresh)
 
     layout.addWidget(edit_button)
     layout.addWidget(delete_button)
     layout.addWidget(copy_button)
+    layout.addWidget(open_button)
+    layout.addWidget(refresh_button)
+    layout.addWidget(schedule_button)
 
     dialog.setLayout(layout)
     dialog.exec_()
\ No newline at end of file
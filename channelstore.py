@@ -0,0 +1,240 @@
+"""
+channelstore.py - Almacén de canales de M3U Organizer
+
+Este módulo contiene el analizador de listas M3U y el almacén en el que se guardan los canales cargados.
+El almacén es columnar: cada atributo del canal (línea #EXTINF, URL, nombre, group-title, tvg-id, host...)
+se guarda en su propia lista y un canal se identifica por su posición (id) en esas listas. Así los filtros,
+las ordenaciones y las vistas trabajan con listas de ids en lugar de copiar y volver a trocear texto.
+
+Funciones:
+----------
+- parse_extinf(line): Devuelve un diccionario con los atributos (tvg-id, group-title...) y el nombre del canal.
+- url_host(url): Devuelve el host (en minúsculas) de una URL.
+- record_fields(extinf, url): Campos derivados de un canal (nombre, group-title, tvg-id, host).
+- get_store(key): Devuelve el almacén con esa clave si sigue existiendo, o None.
+
+Clases:
+-------
+- ChannelStore: Almacén columnar de canales con índices por group-title y por host.
+
+    Methods:
+    - append(extinf, url, extra, fields): Añade un canal y devuelve su id.
+    - record_lines(channel_id): Devuelve las líneas M3U de un canal (EXTINF, líneas extra y URL).
+    - iter_lines(ids): Genera las líneas M3U de una secuencia de canales.
+    - set_extinf(channel_id, line) / set_url(channel_id, url): Modifican un canal manteniendo los índices.
+    - group_index() / host_index(): Índices (valor -> lista de ids) construidos bajo demanda.
+    - ids_for_url(url): Ids de los canales con esa URL.
+    - cached(key, builder): Valores derivados del almacén que se recalculan solo cuando este cambia.
+    - to_state() / from_state(state): Columnas del almacén en un diccionario serializable (p. ej. con
+      pickle) y almacén reconstruido a partir de él sin volver a analizar las líneas.
+
+- M3UParser: Analizador incremental que recibe las líneas de una lista M3U y las añade al almacén.
+"""
+
+import itertools
+import re
+import weakref
+from urllib.parse import urlsplit
+
+_ATTRIBUTE_RE = re.compile(r'([\w-]+)="([^"]*)"')
+
+# Registro de almacenes vivos por clave, para resolver referencias a canales (p. ej. al arrastrar y soltar)
+_stores = weakref.WeakValueDictionary()
+_store_keys = itertools.count(1)
+
+
+def parse_extinf(line):
+    """
+    Separa una línea #EXTINF en sus atributos y el nombre del canal (el texto tras la coma que sigue
+    a los atributos).
+    """
+    attributes = {key.lower(): value.strip() for key, value in _ATTRIBUTE_RE.findall(line)}
+    last_quote = line.rfind('"')
+    comma = line.find(',', last_quote + 1)
+    if comma < 0:
+        comma = line.find(',')
+    name = line[comma + 1:].strip() if comma >= 0 else ''
+    return attributes, name
+
+
+def record_fields(extinf, url):
+    """
+    Devuelve los campos derivados de un canal (nombre, group-title, tvg-id y host) que guarda el almacén.
+    """
+    attributes, name = parse_extinf(extinf)
+    return name or url, attributes.get('group-title', ''), attributes.get('tvg-id', ''), url_host(url)
+
+
+def get_store(key):
+    return _stores.get(key)
+
+
+def url_host(url):
+    try:
+        return (urlsplit(url).hostname or '').lower()
+    except ValueError:
+        return ''
+
+
+class ChannelStore:
+    def __init__(self):
+        self.header = "#EXTM3U"
+        self.extinf = []
+        self.url = []
+        self.extra = []  # Líneas entre #EXTINF y la URL (#EXTVLCOPT, #EXTGRP...), como tupla
+        self.name = []
+        self.group = []
+        self.tvg_id = []
+        self.host = []
+        self.status = []  # '', 'alive' o 'dead' según el último análisis de la URL
+        self.height = []  # Altura del vídeo en píxeles según el análisis (0 si se desconoce)
+        self.version = 0  # Se incrementa con cada cambio, para invalidar cachés derivadas
+        self._group_index = None
+        self._host_index = None
+        self._url_index = None
+        self._derived = {}
+        self.key = next(_store_keys)
+        _stores[self.key] = self
+
+    def __len__(self):
+        return len(self.url)
+
+    COLUMNS = ("extinf", "url", "extra", "name", "group", "tvg_id", "host", "status", "height")
+
+    def to_state(self):
+        state = {column: getattr(self, column) for column in self.COLUMNS}
+        state["header"] = self.header
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        store = cls()
+        store.header = state.get("header", store.header)
+        for column in cls.COLUMNS:
+            setattr(store, column, list(state[column]))
+        store.version += 1
+        return store
+
+    def append(self, extinf, url, extra=(), fields=None):
+        """
+        Añade un canal y devuelve su id. `fields` son los campos ya calculados con `record_fields` (p. ej.
+        en otro hilo); si no se indican, se calculan aquí.
+        """
+        name, group, tvg_id, host = fields or record_fields(extinf, url)
+        channel_id = len(self.url)
+        self.extinf.append(extinf)
+        self.url.append(url)
+        self.extra.append(tuple(extra))
+        self.name.append(name)
+        self.group.append(group)
+        self.tvg_id.append(tvg_id)
+        self.host.append(host)
+        self.status.append('')
+        self.height.append(0)
+        if self._group_index is not None:
+            self._group_index.setdefault(self.group[-1].lower(), []).append(channel_id)
+        if self._host_index is not None:
+            self._host_index.setdefault(self.host[-1], []).append(channel_id)
+        if self._url_index is not None:
+            self._url_index.setdefault(url, []).append(channel_id)
+        self.version += 1
+        return channel_id
+
+    def record_lines(self, channel_id):
+        lines = [self.extinf[channel_id]] if self.extinf[channel_id] else []
+        lines.extend(self.extra[channel_id])
+        lines.append(self.url[channel_id])
+        return lines
+
+    def iter_lines(self, ids):
+        for channel_id in ids:
+            yield from self.record_lines(channel_id)
+
+    def set_extinf(self, channel_id, line):
+        attributes, name = parse_extinf(line)
+        self.extinf[channel_id] = line
+        self.name[channel_id] = name or self.url[channel_id]
+        self.group[channel_id] = attributes.get('group-title', '')
+        self.tvg_id[channel_id] = attributes.get('tvg-id', '')
+        self._group_index = None
+        self.version += 1
+
+    def set_url(self, channel_id, url):
+        self.url[channel_id] = url
+        self.host[channel_id] = url_host(url)
+        self.status[channel_id] = ''
+        self.height[channel_id] = 0
+        self._host_index = None
+        self._url_index = None
+        self.version += 1
+
+    def set_probe_result(self, url, status, height):
+        """
+        Guarda el resultado del análisis de una URL en todos los canales que la usan.
+        """
+        for channel_id in self.ids_for_url(url):
+            self.status[channel_id] = status
+            self.height[channel_id] = height
+        self.version += 1
+
+    def cached(self, key, builder):
+        """
+        Devuelve un valor derivado del almacén (por ejemplo, una columna preparada para búsquedas),
+        recalculándolo con `builder()` solo si el almacén ha cambiado desde la última vez.
+        """
+        entry = self._derived.get(key)
+        if entry is None or entry[0] != self.version:
+            entry = (self.version, builder())
+            self._derived[key] = entry
+        return entry[1]
+
+    def _build_index(self, column):
+        index = {}
+        for channel_id, value in enumerate(column):
+            index.setdefault(value, []).append(channel_id)
+        return index
+
+    def group_index(self):
+        if self._group_index is None:
+            self._group_index = self._build_index([group.lower() for group in self.group])
+        return self._group_index
+
+    def host_index(self):
+        if self._host_index is None:
+            self._host_index = self._build_index(self.host)
+        return self._host_index
+
+    def ids_for_url(self, url):
+        if self._url_index is None:
+            self._url_index = self._build_index(self.url)
+        return self._url_index.get(url, [])
+
+
+class M3UParser:
+    """
+    Analizador incremental: cada línea se pasa a `feed` y, cuando se completa un canal (al llegar su
+    URL), se añade al almacén y se devuelve su id.
+    """
+    def __init__(self, store):
+        self.store = store
+        self._extinf = ''
+        self._extra = []
+
+    def feed(self, line):
+        line = line.strip()
+        if not line:
+            return None
+        if line.startswith("#EXTM3U"):
+            self.store.header = line
+            return None
+        if line.startswith("#EXTINF:"):
+            self._extinf = line
+            self._extra = []
+            return None
+        if line.startswith("#"):
+            self._extra.append(line)
+            return None
+        channel_id = self.store.append(self._extinf, line, self._extra)
+        self._extinf = ''
+        self._extra = []
+        return channel_id
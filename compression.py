@@ -0,0 +1,141 @@
+"""
+compression.py - Lectura de listas comprimidas para M3U Organizer
+
+Este módulo abre listas (y guías) comprimidas con gzip (`.m3u.gz`), xz (`.m3u.xz`), bzip2 (`.m3u.bz2`) o
+empaquetadas en un `.zip`, y las descomprime en streaming según se leen, sin escribir nunca una copia
+descomprimida en disco ni cargarla entera en memoria. El formato se detecta por los primeros bytes del
+contenido (no por la extensión), así que funciona igual con archivos locales y con descargas cuya URL no
+indica la compresión.
+
+De un `.zip` se lee el primer archivo de lista que contenga (`.m3u`, `.m3u8` o `.xml`) o, si no hay
+ninguno, su primer archivo. Como el índice de un zip está al final, un zip que llega por la red se guarda
+antes (comprimido) en un archivo temporal.
+
+Funciones:
+----------
+- detect_compression(head): Devuelve "gzip", "xz", "bz2", "zip" o None según los primeros bytes.
+- decompress_stream(stream): Devuelve un flujo binario con el contenido descomprimido de `stream`.
+- response_stream(response): Flujo binario con el cuerpo de una respuesta de `requests` en streaming.
+- open_playlist(source): Abre una ruta local o URL como flujo binario ya descomprimido.
+- text_stream(stream, encoding): Flujo de texto sobre un flujo binario, detectando la codificación con chardet.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import shutil
+import tempfile
+import zipfile
+
+import chardet
+
+import network
+
+# Firmas de los formatos de compresión admitidos
+MAGIC_NUMBERS = (
+    (b"\x1f\x8b", "gzip"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"BZh", "bz2"),
+    (b"PK\x03\x04", "zip"),
+)
+MAGIC_SIZE = max(len(magic) for magic, _ in MAGIC_NUMBERS)
+
+BUFFER_SIZE = 64 * 1024
+# Bytes que se pasan a chardet para detectar la codificación
+ENCODING_SAMPLE_SIZE = 10000
+# Archivos que se prefieren al abrir un zip
+PLAYLIST_EXTENSIONS = (".m3u", ".m3u8", ".xml")
+
+
+def detect_compression(head):
+    for magic, kind in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+class _DecompressedStream(io.BufferedReader):
+    """
+    Flujo descomprimido que al cerrarse cierra también los objetos de los que lee (los descompresores de
+    la biblioteca estándar no cierran el archivo que reciben).
+    """
+    def __init__(self, raw, *owned):
+        super().__init__(raw, buffer_size=BUFFER_SIZE)
+        self._owned = owned
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            for obj in self._owned:
+                obj.close()
+
+
+def _pick_member(archive):
+    members = [info for info in archive.infolist() if not info.is_dir()]
+    if not members:
+        raise ValueError("El archivo zip está vacío")
+    for info in members:
+        if info.filename.lower().endswith(PLAYLIST_EXTENSIONS):
+            return info
+    return members[0]
+
+
+def decompress_stream(stream):
+    """
+    Devuelve un flujo binario con el contenido descomprimido de `stream` (o el mismo flujo si no está
+    comprimido). Cerrar el flujo devuelto cierra también `stream`.
+    """
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream, buffer_size=BUFFER_SIZE)
+    kind = detect_compression(stream.peek(MAGIC_SIZE)[:MAGIC_SIZE])
+    if kind is None:
+        return stream
+    if kind == "gzip":
+        return _DecompressedStream(gzip.GzipFile(fileobj=stream), stream)
+    if kind == "xz":
+        return _DecompressedStream(lzma.LZMAFile(stream), stream)
+    if kind == "bz2":
+        return _DecompressedStream(bz2.BZ2File(stream), stream)
+
+    if not stream.seekable():
+        spool = tempfile.TemporaryFile()
+        with stream:
+            shutil.copyfileobj(stream, spool, BUFFER_SIZE)
+        spool.seek(0)
+        stream = spool
+    archive = zipfile.ZipFile(stream)
+    return _DecompressedStream(archive.open(_pick_member(archive)), archive, stream)
+
+
+def response_stream(response):
+    """
+    Devuelve el cuerpo de una respuesta pedida con `stream=True` como flujo binario, ya sin la
+    compresión de transporte (Content-Encoding), que descomprime urllib3.
+    """
+    response.raw.decode_content = True
+    # Los descompresores pueden volver a leer al llegar al final: el flujo no debe cerrarse solo
+    response.raw.auto_close = False
+    return io.BufferedReader(response.raw, buffer_size=BUFFER_SIZE)
+
+
+def open_playlist(source):
+    """
+    Abre una lista (ruta local o URL http/https) como flujo binario descomprimido.
+    """
+    if source.startswith(("http://", "https://")):
+        response = network.get(source, stream=True)
+        response.raise_for_status()
+        return decompress_stream(response_stream(response))
+    return decompress_stream(open(source, "rb", buffering=BUFFER_SIZE))
+
+
+def text_stream(stream, encoding=None):
+    """
+    Devuelve (flujo de texto, codificación) para leer `stream` línea a línea. Si no se indica la
+    codificación se detecta con chardet sobre el principio del contenido ya descomprimido.
+    """
+    if encoding is None:
+        encoding = chardet.detect(stream.peek(ENCODING_SAMPLE_SIZE)[:ENCODING_SAMPLE_SIZE])["encoding"] or "utf-8"
+    return io.TextIOWrapper(stream, encoding=encoding, errors="ignore"), encoding
@@ -0,0 +1,161 @@
+"""
+diff.py - Comparación de dos versiones de una lista M3U para M3U Organizer
+
+Este módulo compara dos almacenes de canales (por ejemplo, la lista guardada y la que el proveedor acaba
+de publicar) y clasifica los cambios en canales añadidos, eliminados, con la URL cambiada o con los
+atributos (línea EXTINF u opciones) cambiados.
+
+Cada canal se identifica por una clave que no depende de la URL (su tvg-id o, si no tiene, su nombre y
+group-title) y se resume con un hash de su registro. La comparación hace una sola pasada por cada lista
+usando diccionarios, por lo que su coste es lineal: dos listas de 500.000 canales se comparan en unos
+segundos sin emparejar canales uno a uno.
+
+Funciones:
+----------
+- channel_key(store, channel_id): Clave con la que se empareja un canal entre las dos versiones.
+- diff_stores(old, new, keep_unchanged): Compara dos almacenes y devuelve un `PlaylistDiff`.
+- write_report(diff, path): Exporta el resultado de la comparación a un archivo CSV.
+
+Clases:
+-------
+- PlaylistDiff: Resultado de la comparación (listas de ids de cada tipo de cambio y recuentos).
+"""
+
+import csv
+
+ADDED = "añadido"
+REMOVED = "eliminado"
+URL_CHANGED = "url cambiada"
+ATTRIBUTES_CHANGED = "atributos cambiados"
+
+
+def channel_key(store, channel_id):
+    tvg_id = store.tvg_id[channel_id]
+    if tvg_id:
+        return ("id", tvg_id.lower())
+    return ("nombre", store.name[channel_id].lower(), store.group[channel_id].lower())
+
+
+def _record_hashes(store, channel_id):
+    return hash((store.extinf[channel_id], store.extra[channel_id])), hash(store.url[channel_id])
+
+
+def _keys(store):
+    return [("id", tvg_id.lower()) if tvg_id else ("nombre", name.lower(), group.lower())
+            for tvg_id, name, group in zip(store.tvg_id, store.name, store.group)]
+
+
+def _index_by_key(keys):
+    """
+    Devuelve dos diccionarios: clave -> primer id con esa clave, y clave -> resto de ids con esa clave
+    (p. ej. el mismo canal en dos calidades) en orden inverso, para emparejarlos por orden de aparición
+    sacándolos del final de la lista. Casi todas las claves son únicas y no necesitan lista propia.
+    """
+    first = {}
+    more = {}
+    for channel_id, key in enumerate(keys):
+        if first.setdefault(key, channel_id) != channel_id:
+            more.setdefault(key, []).append(channel_id)
+    for ids in more.values():
+        ids.reverse()
+    return first, more
+
+
+class PlaylistDiff:
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        self.added = []  # Ids en `new`
+        self.removed = []  # Ids en `old`
+        self.url_changed = []  # Pares (id en `old`, id en `new`)
+        self.attributes_changed = []  # Pares (id en `old`, id en `new`)
+        self.unchanged = 0
+        self.unchanged_pairs = []  # Solo si se pide con `keep_unchanged`
+
+    def id_map(self):
+        """
+        Devuelve un diccionario id en `old` -> id en `new` con todos los canales emparejados. Los canales
+        sin cambios solo se incluyen si la comparación se hizo con `keep_unchanged`.
+        """
+        mapping = dict(self.unchanged_pairs)
+        mapping.update(self.url_changed)
+        mapping.update(self.attributes_changed)
+        return mapping
+
+    def change_count(self):
+        return len(self.added) + len(self.removed) + len(self.url_changed) + len(self.attributes_changed)
+
+    def summary(self):
+        return (f"{len(self.added)} añadidos, {len(self.removed)} eliminados, "
+                f"{len(self.url_changed)} con URL cambiada, {len(self.attributes_changed)} con atributos cambiados, "
+                f"{self.unchanged} sin cambios")
+
+    def iter_changes(self):
+        """
+        Genera tuplas (tipo de cambio, id en `old` o None, id en `new` o None).
+        """
+        for old_id, new_id in self.url_changed:
+            yield URL_CHANGED, old_id, new_id
+        for old_id, new_id in self.attributes_changed:
+            yield ATTRIBUTES_CHANGED, old_id, new_id
+        for old_id in self.removed:
+            yield REMOVED, old_id, None
+        for new_id in self.added:
+            yield ADDED, None, new_id
+
+
+def diff_stores(old, new, keep_unchanged=False):
+    """
+    Compara `old` con `new`. Con `keep_unchanged` se guardan también los pares de canales sin cambios,
+    necesarios para trasladar a la lista nueva referencias a canales de la antigua.
+    """
+    result = PlaylistDiff(old, new)
+    old_first, old_more = _index_by_key(_keys(old))
+
+    for new_id, key in enumerate(_keys(new)):
+        old_id = old_first.pop(key, None)
+        if old_id is None:
+            ids = old_more.get(key)
+            if not ids:
+                result.added.append(new_id)
+                continue
+            old_id = ids.pop()
+        old_attributes, old_url = _record_hashes(old, old_id)
+        new_attributes, new_url = _record_hashes(new, new_id)
+        if old_url != new_url:
+            result.url_changed.append((old_id, new_id))
+        elif old_attributes != new_attributes:
+            result.attributes_changed.append((old_id, new_id))
+        else:
+            result.unchanged += 1
+            if keep_unchanged:
+                result.unchanged_pairs.append((old_id, new_id))
+
+    # Los canales antiguos que no se han emparejado han desaparecido de la lista nueva
+    removed = list(old_first.values())
+    for ids in old_more.values():
+        removed.extend(ids)
+    result.removed = sorted(removed)
+    return result
+
+
+def write_report(diff, path):
+    """
+    Escribe un CSV con una fila por cambio: tipo, nombre, group-title, URL anterior, URL nueva y las
+    líneas EXTINF anterior y nueva.
+    """
+    old, new = diff.old, diff.new
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["cambio", "nombre", "group-title", "url_anterior", "url_nueva", "extinf_anterior", "extinf_nuevo"])
+        for change, old_id, new_id in diff.iter_changes():
+            store, channel_id = (new, new_id) if new_id is not None else (old, old_id)
+            writer.writerow([
+                change,
+                store.name[channel_id],
+                store.group[channel_id],
+                old.url[old_id] if old_id is not None else "",
+                new.url[new_id] if new_id is not None else "",
+                old.extinf[old_id] if old_id is not None else "",
+                new.extinf[new_id] if new_id is not None else "",
+            ])
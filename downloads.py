@@ -0,0 +1,252 @@
+"""
+downloads.py - Descargas reanudables y en paralelo para M3U Organizer
+
+Este módulo descarga listas remotas muy grandes usando peticiones HTTP Range cuando el servidor las admite:
+
+- La descarga se escribe en un archivo `.part` junto con un archivo `.part.json` que indica qué partes se
+  han completado. Si la descarga se interrumpe (error de red, cancelación, cierre del programa), al volver
+  a descargar la misma URL se continúa desde donde se quedó en lugar de empezar de cero.
+- Los archivos grandes se dividen en varios tramos que se descargan en paralelo y se escriben directamente
+  en su posición del archivo `.part`, de modo que al terminar el archivo ya está ensamblado en orden.
+- Para reanudar se usa `If-Range` con el ETag (o la fecha de modificación) de la descarga original: si la
+  lista ha cambiado en el servidor, se descarta lo descargado y se empieza de nuevo (una sola vez; si el
+  servidor sigue sin respetar los tramos, se descarga en una sola petición). Los ETag débiles no se envían en
+  `If-Range`, y las peticiones piden el contenido sin compresión de transporte para que los bytes recibidos
+  coincidan con los tramos.
+
+Si el servidor no admite Range, la descarga se hace en una sola petición como hasta ahora.
+
+Funciones:
+----------
+- probe_download(url): Consulta el tamaño de la descarga y si el servidor admite Range.
+- download_file(url, path, progress_callback, is_cancelled, parts): Descarga una URL a `path`.
+- format_progress(done, total, speed): Texto con lo descargado y la velocidad, para mostrarlo al usuario.
+
+Clases:
+-------
+- DownloadCancelled(Exception): Se lanza cuando la descarga se cancela; lo descargado se conserva para reanudarla.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import network
+
+# Tramos en paralelo (no debe superar las conexiones por host de la sesión compartida)
+PARALLEL_PARTS = 4
+# Tamaño mínimo para dividir la descarga en tramos
+PARALLEL_MIN_SIZE = 16 * 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+# Cada cuánto se guarda el estado de los tramos en el archivo .part.json (segundos)
+META_SAVE_INTERVAL = 1.0
+# Veces que se empieza de nuevo por tramos si el servidor responde con el archivo completo a una petición Range
+RANGE_RETRIES = 1
+# Sin compresión de transporte: `iter_content` la deshace y los bytes recibidos no coincidirían con los tramos
+IDENTITY_ENCODING = {"Accept-Encoding": "identity"}
+
+_CONTENT_RANGE_RE = re.compile(r'bytes\s+\d+-\d+/(\d+)')
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+class _RangeRejected(Exception):
+    """El servidor ha respondido con el archivo completo en lugar del tramo pedido."""
+
+
+def probe_download(url):
+    """
+    Pide el primer byte de la URL. Devuelve un diccionario con el tamaño total (o None), si el servidor
+    admite Range y el validador (ETag o Last-Modified) que identifica la versión del archivo.
+    """
+    with network.get(url, stream=True, headers=dict(IDENTITY_ENCODING, Range="bytes=0-0")) as response:
+        response.raise_for_status()
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified") or ""
+        if response.status_code == 206:
+            match = _CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+            if match:
+                return {"size": int(match.group(1)), "ranges": True, "validator": validator}
+        length = response.headers.get("Content-Length")
+        size = int(length) if length and length.isdigit() and response.status_code == 200 else None
+        return {"size": size, "ranges": False, "validator": validator}
+
+
+def format_progress(done, total, speed):
+    text = f"{done / (1024 * 1024):.1f} MB"
+    if total:
+        text += f" de {total / (1024 * 1024):.1f} MB"
+    return f"{text} ({speed / (1024 * 1024):.2f} MB/s)"
+
+
+class _Progress:
+    """
+    Suma el progreso de todos los tramos (desde varios hilos) y calcula la velocidad de la descarga actual.
+    """
+    def __init__(self, done, total, callback):
+        self.done = done
+        self.total = total
+        self.callback = callback
+        self._session_bytes = 0
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, count):
+        with self._lock:
+            self.done += count
+            self._session_bytes += count
+            elapsed = max(time.monotonic() - self._start, 1e-6)
+            done, speed = self.done, self._session_bytes / elapsed
+        if self.callback:
+            self.callback(done, self.total, speed)
+
+
+def _load_meta(meta_path):
+    try:
+        with open(meta_path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_meta(meta_path, meta):
+    temporary = meta_path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump(meta, file)
+    os.replace(temporary, meta_path)
+
+
+def _remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _if_range(validator):
+    """
+    Validador que se puede enviar en If-Range. Un ETag débil (W/"...") no vale: el servidor respondería
+    siempre con el archivo completo (RFC 7233).
+    """
+    return "" if validator.startswith("W/") else validator
+
+
+def _split(size, parts):
+    step = -(-size // parts)
+    return [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]
+
+
+def download_file(url, path, progress_callback=None, is_cancelled=None, parts=PARALLEL_PARTS):
+    """
+    Descarga `url` a `path` reanudando una descarga anterior incompleta si existe. `progress_callback(
+    descargado, total, bytes_por_segundo)` se llama desde los hilos de descarga y `is_cancelled()` permite
+    detenerla (se lanza `DownloadCancelled` y lo descargado se conserva).
+    """
+    part_path = path + ".part"
+    meta_path = path + ".part.json"
+    for attempt in range(RANGE_RETRIES + 1):
+        info = probe_download(url)
+        if not info["ranges"] or not info["size"]:
+            break
+
+        meta = _load_meta(meta_path)
+        if (meta is None or not os.path.exists(part_path) or meta.get("url") != url
+                or meta.get("size") != info["size"] or meta.get("validator") != info["validator"]):
+            # No hay descarga previa de esta misma versión: se empieza de cero
+            count = parts if info["size"] >= PARALLEL_MIN_SIZE else 1
+            meta = {"url": url, "size": info["size"], "validator": info["validator"],
+                    "ranges": _split(info["size"], count)}
+            with open(part_path, "wb") as file:
+                file.truncate(info["size"])
+            _save_meta(meta_path, meta)
+
+        try:
+            _download_ranges(url, part_path, meta_path, meta, progress_callback, is_cancelled)
+        except _RangeRejected:
+            # La lista ha cambiado en el servidor desde la descarga anterior: empezar de nuevo
+            _remove(part_path, meta_path)
+            continue
+
+        os.replace(part_path, path)
+        _remove(meta_path)
+        return path
+
+    # Sin Range (o el servidor no respeta los tramos que anuncia): una sola petición
+    _remove(part_path, meta_path)
+    _download_whole(url, part_path, _Progress(0, info["size"], progress_callback), is_cancelled)
+    os.replace(part_path, path)
+    return path
+
+
+def _download_whole(url, part_path, progress, is_cancelled):
+    with network.get(url, stream=True) as response:
+        response.raise_for_status()
+        with open(part_path, "wb") as file:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if is_cancelled and is_cancelled():
+                    raise DownloadCancelled()
+                file.write(chunk)
+                progress.add(len(chunk))
+
+
+def _download_ranges(url, part_path, meta_path, meta, progress_callback, is_cancelled):
+    ranges = meta["ranges"]
+    progress = _Progress(sum(done for _, _, done in ranges), meta["size"], progress_callback)
+    lock = threading.Lock()
+    last_save = [time.monotonic()]
+    failed = threading.Event()  # Si un tramo falla, los demás se detienen también
+
+    def save(force=False):
+        with lock:
+            if force or time.monotonic() - last_save[0] >= META_SAVE_INTERVAL:
+                _save_meta(meta_path, meta)
+                last_save[0] = time.monotonic()
+
+    def fetch(rng):
+        start, end, done = rng
+        if start + done > end:
+            return
+        headers = dict(IDENTITY_ENCODING, Range=f"bytes={start + done}-{end}")
+        if _if_range(meta["validator"]):
+            headers["If-Range"] = meta["validator"]
+        with network.get(url, stream=True, headers=headers) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise _RangeRejected()
+            with open(part_path, "r+b") as file:
+                file.seek(start + done)
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if failed.is_set() or (is_cancelled and is_cancelled()):
+                        raise DownloadCancelled()
+                    chunk = chunk[:end + 1 - (start + rng[2])]  # Nunca escribir fuera del tramo
+                    file.write(chunk)
+                    rng[2] += len(chunk)
+                    progress.add(len(chunk))
+                    save()
+        if start + rng[2] <= end:
+            raise IOError("La conexión se cerró antes de completar el tramo")
+
+    def fetch_or_stop(rng):
+        try:
+            fetch(rng)
+        except Exception:
+            failed.set()
+            raise
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="descarga") as executor:
+            futures = [executor.submit(fetch_or_stop, rng) for rng in ranges]
+            # Se propaga el primer error real (no la detención de los demás tramos)
+            errors = [future.exception() for future in futures]
+            for error in errors:
+                if error is not None and not isinstance(error, DownloadCancelled):
+                    raise error
+            for error in errors:
+                if error is not None:
+                    raise error
+    finally:
+        # Guardar lo descargado para poder reanudar aunque la descarga haya fallado o se haya cancelado
+        save(force=True)
@@ -0,0 +1,148 @@
+"""
+epg.py - Guía de programación (EPG) en formato XMLTV para M3U Organizer
+
+Este módulo importa guías XMLTV y las une a los canales de la lista mediante el atributo `tvg-id`.
+Las guías de varios cientos de MB se leen de forma incremental con `iterparse`, liberando cada elemento
+en cuanto se ha procesado, y solo se guardan los programas de los canales presentes en la lista cargada
+y dentro de una ventana de tiempo alrededor del momento actual. Así la memoria usada depende del número
+de canales de la lista y no del tamaño de la guía.
+
+Las guías comprimidas (`.xml.gz`, `.xml.xz`, `.zip`...) se descomprimen al vuelo mientras se leen, tanto si son archivos
+locales como descargas, sin crear archivos temporales.
+
+Funciones:
+----------
+- extract_tvg_id(line): Devuelve el tvg-id de una línea #EXTINF, o '' si no tiene.
+- parse_xmltv_time(value): Convierte una fecha XMLTV ("20240101203000 +0100") en un timestamp.
+- open_guide(source): Abre una guía local o remota como flujo binario, descomprimiéndola si está comprimida.
+- parse_xmltv(stream, wanted_ids, ...): Lee una guía XMLTV y devuelve un `EpgIndex`.
+
+Clases:
+-------
+- EpgIndex: Índice de programas por tvg-id ordenados por hora de inicio, con consulta de "ahora" y
+  "a continuación" mediante búsqueda binaria.
+"""
+
+import re
+import time
+import xml.etree.ElementTree as ET
+from bisect import bisect_right
+from datetime import datetime
+
+from compression import open_playlist
+
+# Ventana de programas que se conservan alrededor del momento de la carga (segundos)
+EPG_PAST_WINDOW = 2 * 3600
+EPG_FUTURE_WINDOW = 36 * 3600
+
+_TVG_ID_RE = re.compile(r'tvg-id="([^"]*)"')
+
+
+def extract_tvg_id(line):
+    match = _TVG_ID_RE.search(line)
+    if match:
+        return match.group(1).strip()
+    return ''
+
+
+def parse_xmltv_time(value):
+    """
+    Convierte una fecha XMLTV en un timestamp. Si la fecha no indica zona horaria se interpreta
+    como hora local. Devuelve None si el formato no es válido.
+    """
+    value = (value or '').strip()
+    try:
+        if len(value) > 14 and value[14:].strip():
+            return datetime.strptime(value[:14] + value[14:].strip(), "%Y%m%d%H%M%S%z").timestamp()
+        return datetime.strptime(value[:14], "%Y%m%d%H%M%S").timestamp()
+    except ValueError:
+        return None
+
+
+def open_guide(source):
+    """
+    Abre una guía XMLTV (ruta local o URL http/https) y devuelve un flujo binario. Si el contenido está
+    comprimido (gzip, xz, bzip2 o zip) se descomprime en streaming (ver `compression.py`).
+    """
+    return open_playlist(source)
+
+
+class EpgIndex:
+    def __init__(self):
+        # tvg-id (en minúsculas) -> listas paralelas ordenadas por inicio
+        self._starts = {}
+        self._programmes = {}
+
+    def add(self, tvg_id, start, stop, title):
+        self._starts.setdefault(tvg_id, []).append(start)
+        self._programmes.setdefault(tvg_id, []).append((start, stop, title))
+
+    def finalize(self):
+        """
+        Ordena los programas de cada canal por hora de inicio. Se llama una vez al terminar la carga.
+        """
+        for tvg_id, programmes in self._programmes.items():
+            programmes.sort()
+            self._starts[tvg_id] = [programme[0] for programme in programmes]
+
+    def channel_count(self):
+        return len(self._programmes)
+
+    def programme_count(self):
+        return sum(len(programmes) for programmes in self._programmes.values())
+
+    def now_next(self, tvg_id, at=None):
+        """
+        Devuelve una tupla (ahora, a continuación) para el canal, donde cada elemento es
+        (inicio, fin, título) o None.
+        """
+        key = (tvg_id or '').lower()
+        starts = self._starts.get(key)
+        if not starts:
+            return None, None
+        at = time.time() if at is None else at
+        programmes = self._programmes[key]
+        i = bisect_right(starts, at) - 1
+        current = programmes[i] if i >= 0 and programmes[i][1] > at else None
+        following = programmes[i + 1] if i + 1 < len(programmes) else None
+        return current, following
+
+
+def parse_xmltv(stream, wanted_ids, now=None, progress_callback=None, is_cancelled=None):
+    """
+    Lee una guía XMLTV de forma incremental y devuelve un `EpgIndex` con los programas de los canales
+    cuyo id está en `wanted_ids` (sin distinguir mayúsculas). `progress_callback(n)` recibe el número
+    de programas leídos cada cierto tiempo y `is_cancelled()` permite abortar la lectura.
+    """
+    wanted = {tvg_id.lower() for tvg_id in wanted_ids if tvg_id}
+    now = time.time() if now is None else now
+    window_start = now - EPG_PAST_WINDOW
+    window_end = now + EPG_FUTURE_WINDOW
+    index = EpgIndex()
+    root = None
+    seen = 0
+
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if root is None:
+            root = elem  # El primer evento es el inicio de <tv>
+            continue
+        if event != "end" or elem.tag not in ("programme", "channel"):
+            continue
+        if elem.tag == "programme":
+            seen += 1
+            channel = (elem.get("channel") or '').lower()
+            if channel in wanted:
+                start = parse_xmltv_time(elem.get("start"))
+                stop = parse_xmltv_time(elem.get("stop")) or start
+                if start is not None and stop >= window_start and start <= window_end:
+                    index.add(channel, start, stop, (elem.findtext("title") or '').strip())
+            if progress_callback and seen % 10000 == 0:
+                progress_callback(seen)
+                if is_cancelled and is_cancelled():
+                    break
+        # Liberar el elemento ya procesado para que la memoria no crezca con el tamaño de la guía
+        elem.clear()
+        root.clear()
+
+    index.finalize()
+    return index
@@ -0,0 +1,146 @@
+"""
+exporters.py - Exportación de canales a otros formatos para M3U Organizer
+
+Este módulo escribe listas de canales en formato M3U, JSON Lines, CSV y XSPF. Los canales se reciben como
+referencias (almacén, id) y se escriben uno a uno según se recorren, sin construir antes la salida completa
+en memoria, por lo que la memoria usada no depende del tamaño de la lista.
+
+La exportación "dividida por group-title" agrupa los canales en una sola pasada y escribe un archivo por
+grupo, repartiendo los archivos entre varios hilos.
+
+Funciones:
+----------
+- channel_record(store, channel_id): Diccionario con los campos exportados de un canal.
+- write_m3u(refs, file, header) / write_jsonl(refs, file) / write_csv(refs, file) / write_xspf(refs, file):
+  Escriben los canales en un archivo de texto ya abierto (en M3U, tras la línea #EXTM3U `header`).
+- export_to_file(refs, path, fmt, header): Exporta los canales a un archivo en el formato indicado.
+- safe_filename(name): Convierte un group-title en un nombre de archivo válido.
+- split_by_group(refs, directory, fmt, max_workers, header): Escribe un archivo por group-title en paralelo.
+"""
+
+import csv
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from xml.sax.saxutils import escape
+
+from logos import extract_tvg_logo
+
+FIELDS = ["nombre", "group-title", "tvg-id", "tvg-logo", "url", "estado", "altura", "extinf"]
+
+# Extensión de archivo de cada formato de exportación
+EXTENSIONS = {"m3u": ".m3u", "jsonl": ".jsonl", "csv": ".csv", "xspf": ".xspf"}
+
+NO_GROUP_FILENAME = "sin_grupo"
+# Cabecera de las listas M3U que no tienen una propia (con url-tvg, etc.)
+DEFAULT_M3U_HEADER = "#EXTM3U"
+
+_UNSAFE_FILENAME_RE = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+
+def channel_record(store, channel_id):
+    return {
+        "nombre": store.name[channel_id],
+        "group-title": store.group[channel_id],
+        "tvg-id": store.tvg_id[channel_id],
+        "tvg-logo": extract_tvg_logo(store.extinf[channel_id]) or '',
+        "url": store.url[channel_id],
+        "estado": store.status[channel_id],
+        "altura": store.height[channel_id],
+        "extinf": store.extinf[channel_id],
+    }
+
+
+def write_m3u(refs, file, header=DEFAULT_M3U_HEADER):
+    file.write((header or DEFAULT_M3U_HEADER) + "\n")
+    for store, channel_id in refs:
+        for line in store.record_lines(channel_id):
+            file.write(line)
+            file.write("\n")
+
+
+def write_jsonl(refs, file):
+    for store, channel_id in refs:
+        file.write(json.dumps(channel_record(store, channel_id), ensure_ascii=False))
+        file.write("\n")
+
+
+def write_csv(refs, file):
+    writer = csv.DictWriter(file, fieldnames=FIELDS)
+    writer.writeheader()
+    for store, channel_id in refs:
+        writer.writerow(channel_record(store, channel_id))
+
+
+def write_xspf(refs, file):
+    file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    file.write('<playlist version="1" xmlns="http://xspf.org/ns/0/">\n  <trackList>\n')
+    for store, channel_id in refs:
+        file.write("    <track>\n")
+        file.write(f"      <location>{escape(store.url[channel_id])}</location>\n")
+        file.write(f"      <title>{escape(store.name[channel_id])}</title>\n")
+        if store.group[channel_id]:
+            file.write(f"      <album>{escape(store.group[channel_id])}</album>\n")
+        logo = extract_tvg_logo(store.extinf[channel_id])
+        if logo:
+            file.write(f"      <image>{escape(logo)}</image>\n")
+        file.write("    </track>\n")
+    file.write("  </trackList>\n</playlist>\n")
+
+
+WRITERS = {"m3u": write_m3u, "jsonl": write_jsonl, "csv": write_csv, "xspf": write_xspf}
+
+
+def export_to_file(refs, path, fmt="m3u", header=DEFAULT_M3U_HEADER):
+    """
+    Escribe los canales `refs` (iterable de pares (almacén, id)) en `path` con el formato `fmt`. En M3U,
+    `header` es la línea #EXTM3U de la lista (con su url-tvg, si la tiene). Devuelve el número de canales escritos.
+    """
+    writer = partial(write_m3u, header=header) if fmt == "m3u" else WRITERS[fmt]
+    count = 0
+
+    def counted():
+        nonlocal count
+        for ref in refs:
+            count += 1
+            yield ref
+
+    with open(path, "w", encoding="utf-8", newline="" if fmt == "csv" else None) as file:
+        writer(counted(), file)
+    return count
+
+
+def safe_filename(name):
+    name = _UNSAFE_FILENAME_RE.sub("_", name).strip(" .")
+    return name[:120] or NO_GROUP_FILENAME
+
+
+def split_by_group(refs, directory, fmt="m3u", max_workers=4, header=DEFAULT_M3U_HEADER):
+    """
+    Escribe en `directory` un archivo por group-title con sus canales, en paralelo. Los grupos cuyo
+    nombre de archivo coincide (p. ej. "Cine" y "cine" en sistemas sin distinción de mayúsculas) se
+    numeran para no sobrescribirse. Devuelve un diccionario ruta -> número de canales.
+    """
+    groups = {}
+    for store, channel_id in refs:
+        groups.setdefault(store.group[channel_id], []).append((store, channel_id))
+
+    paths = {}
+    used = set()
+    for group in groups:
+        base = safe_filename(group)
+        filename = base
+        suffix = 2
+        while filename.lower() in used:
+            filename = f"{base}_{suffix}"
+            suffix += 1
+        used.add(filename.lower())
+        paths[group] = os.path.join(directory, filename + EXTENSIONS[fmt])
+
+    os.makedirs(directory, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {paths[group]: executor.submit(export_to_file, group_refs, paths[group], fmt, header)
+                   for group, group_refs in groups.items()}
+        return {path: future.result() for path, future in futures.items()}
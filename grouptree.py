@@ -0,0 +1,213 @@
+"""
+grouptree.py - Árbol de group-title con recuentos por grupo para M3U Organizer
+
+Este módulo muestra los grupos (group-title) de la lista cargada en un panel de árbol con el número de
+canales, canales activos, duplicados (URL repetida en la lista) y canales en la vista actual de cada grupo.
+
+Los recuentos se calculan en una sola pasada mientras se carga la lista y después se mantienen de forma
+incremental: al editar un canal solo se restan sus aportaciones antiguas y se suman las nuevas, sin
+recorrer de nuevo toda la lista. Los canales de cada grupo (hijos del árbol) solo se crean cuando el
+usuario despliega el grupo.
+
+Clases:
+-------
+- GroupStats: Recuentos por grupo (total, activos, duplicados) mantenidos de forma incremental.
+
+    Methods:
+    - add(channel_id): Añade las aportaciones de un canal nuevo.
+    - refresh(channel_id): Actualiza las aportaciones de un canal que ha cambiado en el almacén.
+    - set_view(ids): Recalcula el recuento de canales visibles por grupo.
+    - take_dirty(): Devuelve y vacía el conjunto de grupos cuyos recuentos han cambiado.
+
+- GroupTreeWidget(QTreeWidget): Panel con un elemento por grupo y sus recuentos.
+
+    Signals:
+    - group_selected (str): Emitida con el group-title seleccionado ('' para "Sin grupo").
+    - channel_activated (int): Emitida con el id del canal al hacer doble clic sobre un canal.
+"""
+
+from collections import Counter
+
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QTreeWidget, QTreeWidgetItem
+
+# Número máximo de canales que se muestran al desplegar un grupo
+MAX_CHILDREN = 1000
+
+NO_GROUP_LABEL = "(Sin grupo)"
+
+
+class GroupStats:
+    def __init__(self, store):
+        self.store = store
+        self.total = Counter()
+        self.alive = Counter()
+        self.duplicates = Counter()
+        self.in_view = Counter()
+        # Última aportación de cada canal, para poder restarla cuando el canal cambia
+        self._group_of = []
+        self._url_of = []
+        self._alive_of = []
+        self._url_ids = {}  # URL -> ids de los canales que la usan
+        self._view_ids = set()
+        self._dirty = set()
+        for channel_id in range(len(store)):
+            self.add(channel_id)
+
+    def _link(self, channel_id, group, url, alive):
+        self.total[group] += 1
+        if alive:
+            self.alive[group] += 1
+        ids = self._url_ids.setdefault(url, set())
+        ids.add(channel_id)
+        if len(ids) == 2:
+            # El primer canal con esta URL también pasa a ser duplicado
+            other = next(i for i in ids if i != channel_id)
+            self.duplicates[self._group_of[other]] += 1
+            self._dirty.add(self._group_of[other])
+        if len(ids) >= 2:
+            self.duplicates[group] += 1
+        self._dirty.add(group)
+
+    def _unlink(self, channel_id, group, url, alive):
+        self.total[group] -= 1
+        if alive:
+            self.alive[group] -= 1
+        ids = self._url_ids[url]
+        if len(ids) >= 2:
+            self.duplicates[group] -= 1
+        ids.discard(channel_id)
+        if len(ids) == 1:
+            other = next(iter(ids))
+            self.duplicates[self._group_of[other]] -= 1
+            self._dirty.add(self._group_of[other])
+        elif not ids:
+            del self._url_ids[url]
+        self._dirty.add(group)
+
+    def add(self, channel_id):
+        group = self.store.group[channel_id]
+        url = self.store.url[channel_id]
+        alive = self.store.status[channel_id] == 'alive'
+        self._group_of.append(group)
+        self._url_of.append(url)
+        self._alive_of.append(alive)
+        self._link(channel_id, group, url, alive)
+
+    def refresh(self, channel_id):
+        group = self.store.group[channel_id]
+        url = self.store.url[channel_id]
+        alive = self.store.status[channel_id] == 'alive'
+        old = (self._group_of[channel_id], self._url_of[channel_id], self._alive_of[channel_id])
+        if old == (group, url, alive):
+            return
+        self._unlink(channel_id, *old)
+        if channel_id in self._view_ids and old[0] != group:
+            self.in_view[old[0]] -= 1
+            self.in_view[group] += 1
+        self._group_of[channel_id] = group
+        self._url_of[channel_id] = url
+        self._alive_of[channel_id] = alive
+        self._link(channel_id, group, url, alive)
+
+    def set_view(self, ids):
+        previous = self.in_view
+        self._view_ids = set(ids)
+        self.in_view = Counter(map(self._group_of.__getitem__, ids))
+        self._dirty.update(group for group in previous.keys() | self.in_view.keys()
+                           if previous[group] != self.in_view[group])
+
+    def take_dirty(self):
+        dirty = self._dirty
+        self._dirty = set()
+        return dirty
+
+
+class GroupTreeWidget(QTreeWidget):
+    group_selected = pyqtSignal(str)
+    channel_activated = pyqtSignal(int)
+
+    COLUMNS = ["Grupo", "Canales", "Activos", "Duplicados", "En vista"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setHeaderLabels(self.COLUMNS)
+        self.setSortingEnabled(True)
+        self.sortByColumn(0, Qt.AscendingOrder)
+        self.stats = None
+        self._items = {}  # group-title -> elemento del árbol
+
+        # Agrupar las actualizaciones mientras se carga la lista
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(200)
+        self._refresh_timer.timeout.connect(self.refresh)
+
+        self.itemExpanded.connect(self._populate_children)
+        self.itemClicked.connect(self._on_item_clicked)
+        self.itemDoubleClicked.connect(self._on_item_double_clicked)
+
+    def set_stats(self, stats):
+        self.stats = stats
+        self.clear()
+        self._items = {}
+        self.refresh()
+
+    def schedule_refresh(self):
+        if not self._refresh_timer.isActive():
+            self._refresh_timer.start()
+
+    def refresh(self):
+        """
+        Actualiza solo los grupos cuyos recuentos han cambiado desde la última actualización.
+        """
+        if self.stats is None:
+            return
+        self.setSortingEnabled(False)
+        for group in self.stats.take_dirty():
+            item = self._items.get(group)
+            if self.stats.total[group] <= 0:
+                if item is not None:
+                    self.takeTopLevelItem(self.indexOfTopLevelItem(item))
+                    del self._items[group]
+                continue
+            if item is None:
+                item = QTreeWidgetItem([group or NO_GROUP_LABEL])
+                item.setData(0, Qt.UserRole, group)
+                item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+                self.addTopLevelItem(item)
+                self._items[group] = item
+            elif item.childCount() and item.data(1, Qt.DisplayRole) != self.stats.total[group]:
+                # Los canales del grupo han cambiado: se volverán a crear al desplegarlo
+                item.takeChildren()
+                item.setExpanded(False)
+            for column, counter in enumerate((self.stats.total, self.stats.alive,
+                                              self.stats.duplicates, self.stats.in_view), start=1):
+                item.setData(column, Qt.DisplayRole, counter[group])
+        self.setSortingEnabled(True)
+
+    def _populate_children(self, item):
+        if item.parent() is not None or item.childCount() or self.stats is None:
+            return
+        group = item.data(0, Qt.UserRole)
+        store = self.stats.store
+        ids = [channel_id for channel_id in store.group_index().get(group.lower(), [])
+               if store.group[channel_id] == group]
+        children = []
+        for channel_id in ids[:MAX_CHILDREN]:
+            child = QTreeWidgetItem([store.name[channel_id]])
+            child.setData(0, Qt.UserRole, channel_id)
+            child.setToolTip(0, store.url[channel_id])
+            children.append(child)
+        if len(ids) > MAX_CHILDREN:
+            children.append(QTreeWidgetItem([f"... y {len(ids) - MAX_CHILDREN} canales más"]))
+        item.addChildren(children)
+
+    def _on_item_clicked(self, item, column):
+        if item.parent() is None:
+            self.group_selected.emit(item.data(0, Qt.UserRole))
+
+    def _on_item_double_clicked(self, item, column):
+        channel_id = item.data(0, Qt.UserRole)
+        if item.parent() is not None and channel_id is not None:
+            self.channel_activated.emit(channel_id)
@@ -0,0 +1,190 @@
+"""
+history.py - Historial de deshacer/rehacer para M3U Organizer
+
+Este módulo guarda el historial de cambios como una lista de operaciones pequeñas, no como copias de la
+lista: cada operación sabe deshacerse y rehacerse a partir de los pocos datos que la describen (la consulta
+de un filtro, la línea que se editó con su valor anterior, las filas que se movieron, la permutación de
+una ordenación...). Así cientos de pasos sobre una lista de un millón de canales ocupan unos pocos KB, y
+deshacer aplica solo ese cambio a los paneles.
+
+Cada operación indica el objeto sobre el que actúa y las llamadas (método, argumentos) que la deshacen y la
+rehacen, con argumentos que son datos simples (textos, números, arrays, referencias a canales). Por eso el
+historial se puede guardar con la sesión (ver `workspace.py`) y recuperar en la siguiente.
+
+Las referencias a canales son pares (almacén, id), así que el historial mantiene vivos los almacenes que
+nombra. Por eso, siempre que se sustituye un almacén (abrir otra lista, recargar el archivo vigilado,
+recuperar una sesión) hay que vaciar el historial con `clear()` o reemplazarlo con `from_state()`: las
+operaciones antiguas apuntarían a canales que ya no están en los paneles.
+
+Funciones:
+----------
+- encode_ids(ids) / decode_ids(data): Guardan una lista de ids de forma compacta (array de enteros sin signo).
+
+Clases:
+-------
+- Operation: Cambio que se puede deshacer, con su descripción, el objeto sobre el que actúa y las llamadas
+  que lo deshacen y rehacen.
+- History(QObject): Pilas de deshacer y rehacer.
+
+    Signals:
+    - changed (): Emitida cuando cambia lo que se puede deshacer o rehacer.
+
+    Methods:
+    - push(operation): Añade una operación ya aplicada (se ignora mientras se deshace o rehace).
+    - macro(description): Contexto que agrupa en un solo paso las operaciones añadidas dentro de él.
+    - undo() / redo(): Deshacen o rehacen el último paso y devuelven su descripción.
+    - undo_text() / redo_text(): Descripción del paso que se desharía o reharía ('' si no hay).
+    - clear(): Vacía el historial (p. ej. al cargar otra lista).
+    - register(name, target): Da nombre a un objeto sobre el que actúan las operaciones, para guardarlas.
+    - to_state() / from_state(state): Historial como datos serializables (con los objetos por su nombre)
+      y restauración a partir de ellos.
+"""
+
+from array import array
+from contextlib import contextmanager
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Pasos que se conservan en el historial
+MAX_STEPS = 500
+
+
+def encode_ids(ids):
+    return array('I', ids)
+
+
+def decode_ids(data):
+    return data.tolist()
+
+
+class Operation:
+    __slots__ = ("description", "target", "undo_call", "redo_call")
+
+    def __init__(self, description, target, undo_call, redo_call):
+        self.description = description
+        self.target = target
+        self.undo_call = undo_call  # (nombre del método, argumentos)
+        self.redo_call = redo_call
+
+    def undo(self):
+        self._call(self.undo_call)
+
+    def redo(self):
+        self._call(self.redo_call)
+
+    def _call(self, call):
+        method, args = call
+        getattr(self.target, method)(*args)
+
+
+class _Macro:
+    __slots__ = ("description", "operations")
+
+    def __init__(self, description, operations=None):
+        self.description = description
+        self.operations = [] if operations is None else operations
+
+    def undo(self):
+        for operation in reversed(self.operations):
+            operation.undo()
+
+    def redo(self):
+        for operation in self.operations:
+            operation.redo()
+
+
+class History(QObject):
+    changed = pyqtSignal()
+
+    def __init__(self, parent=None, max_steps=MAX_STEPS):
+        super().__init__(parent)
+        self.max_steps = max_steps
+        self._done = []
+        self._undone = []
+        self._macro = None
+        self._applying = False  # Mientras se deshace o rehace no se registran operaciones nuevas
+        self._targets = {}  # Nombre -> objeto sobre el que actúan las operaciones
+        self.version = 0  # Se incrementa con cada cambio del historial
+
+    def push(self, operation):
+        if self._applying:
+            return
+        if self._macro is not None:
+            self._macro.operations.append(operation)
+            return
+        self._done.append(operation)
+        if len(self._done) > self.max_steps:
+            del self._done[0]
+        self._undone.clear()
+        self.version += 1
+        self.changed.emit()
+
+    @contextmanager
+    def macro(self, description):
+        if self._macro is not None or self._applying:
+            yield  # Ya dentro de otro paso: sus operaciones se añaden a ese
+            return
+        self._macro = _Macro(description)
+        try:
+            yield
+        finally:
+            macro, self._macro = self._macro, None
+            if macro.operations:
+                self.push(macro)
+
+    def _apply(self, source, target, method):
+        if not source:
+            return None
+        operation = source.pop()
+        self._applying = True
+        try:
+            getattr(operation, method)()
+        finally:
+            self._applying = False
+        target.append(operation)
+        self.version += 1
+        self.changed.emit()
+        return operation.description
+
+    def undo(self):
+        return self._apply(self._done, self._undone, "undo")
+
+    def redo(self):
+        return self._apply(self._undone, self._done, "redo")
+
+    def undo_text(self):
+        return self._done[-1].description if self._done else ''
+
+    def redo_text(self):
+        return self._undone[-1].description if self._undone else ''
+
+    def clear(self):
+        self._done.clear()
+        self._undone.clear()
+        self.version += 1
+        self.changed.emit()
+
+    def register(self, name, target):
+        self._targets[name] = target
+
+    def _operation_state(self, operation):
+        if isinstance(operation, _Macro):
+            return ("macro", operation.description, [self._operation_state(op) for op in operation.operations])
+        name = next(name for name, target in self._targets.items() if target is operation.target)
+        return ("op", operation.description, name, operation.undo_call, operation.redo_call)
+
+    def _operation_from_state(self, state):
+        if state[0] == "macro":
+            return _Macro(state[1], [self._operation_from_state(op) for op in state[2]])
+        _, description, name, undo_call, redo_call = state
+        return Operation(description, self._targets[name], undo_call, redo_call)
+
+    def to_state(self):
+        return {"done": [self._operation_state(op) for op in self._done],
+                "undone": [self._operation_state(op) for op in self._undone]}
+
+    def from_state(self, state):
+        self._done = [self._operation_from_state(op) for op in state["done"]]
+        self._undone = [self._operation_from_state(op) for op in state["undone"]]
+        self.version += 1
+        self.changed.emit()
@@ -0,0 +1,245 @@
+"""
+loader.py - Carga de listas M3U por etapas para M3U Organizer
+
+Este módulo carga una lista como una cadena de etapas, cada una en su propio hilo y unidas por colas de
+tamaño limitado:
+
+    lectura -> decodificación -> análisis -> indexado -> presentación
+
+- Lectura: lee el archivo por bloques, descomprimiéndolo si está comprimido (ver `compression.py`).
+- Decodificación: detecta la codificación con chardet y convierte los bloques en líneas.
+- Análisis: agrupa las líneas en canales (#EXTINF, líneas extra y URL) sin tocar el almacén.
+- Indexado: calcula los campos de cada canal (nombre, group-title, tvg-id, host).
+- Presentación: en el hilo de la interfaz, un temporizador recoge los canales preparados y los entrega
+  por lotes, sin dedicar a ello más de unos milisegundos seguidos.
+
+Si la interfaz no da abasto, las colas se llenan y las etapas anteriores esperan, en lugar de acumular
+miles de señales pendientes. Cada canal se entrega completo, así que el estado de la aplicación es siempre
+coherente. Cancelar la carga es inmediato: se deja de entregar lotes y las etapas terminan por sí solas
+en cuanto comprueban la cancelación.
+
+Clases:
+-------
+- LoadPipeline(QObject): Carga una lista local por etapas.
+
+    Signals:
+    - progress (int): Porcentaje leído del archivo.
+    - batch (list): Lote de canales preparados. Cada elemento es (líneas, extinf, extra, url, campos); las
+      líneas que quedan al final del archivo sin URL llegan con extinf, extra, url y campos a None.
+    - finished (): La lista se ha cargado completa.
+    - error (str): Mensaje de error si la lista no se puede leer.
+
+    Methods:
+    - start(): Arranca las etapas.
+    - cancel(): Detiene la carga inmediatamente.
+    - is_running(): Indica si la carga sigue en curso.
+"""
+
+import codecs
+import os
+import queue
+import threading
+import time
+
+import chardet
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from channelstore import record_fields
+from compression import BUFFER_SIZE, ENCODING_SAMPLE_SIZE, decompress_stream
+
+# Tamaño de los bloques leídos del archivo (ya descomprimidos)
+BLOCK_SIZE = 256 * 1024
+# Canales por lote
+BATCH_SIZE = 500
+# Elementos que caben en cada cola entre etapas
+QUEUE_SIZE = 8
+# Tiempo máximo que la presentación ocupa el hilo de la interfaz en cada paso (segundos)
+RENDER_BUDGET = 0.03
+# Espera entre pasos de la presentación cuando no hay canales preparados (milisegundos)
+RENDER_IDLE_INTERVAL = 15
+# Cada cuánto las etapas bloqueadas en una cola comprueban si se ha cancelado la carga (segundos)
+POLL_INTERVAL = 0.1
+
+_END = object()  # Marca de fin de los datos en las colas
+
+
+class _Stopped(Exception):
+    """La carga se ha cancelado mientras una etapa esperaba en una cola."""
+
+
+class LoadPipeline(QObject):
+    progress = pyqtSignal(int)
+    batch = pyqtSignal(list)
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.encoding = None
+        self.header = None  # Línea #EXTM3U de la lista, si tiene
+        self._stop = threading.Event()
+        self._error = None
+        self._percent = 0
+        self._reported_percent = -1
+        self._blocks = queue.Queue(QUEUE_SIZE)
+        self._lines = queue.Queue(QUEUE_SIZE)
+        self._records = queue.Queue(QUEUE_SIZE)
+        self._batches = queue.Queue(QUEUE_SIZE)
+        self._running = False
+
+        self._render_timer = QTimer(self)
+        self._render_timer.setInterval(RENDER_IDLE_INTERVAL)
+        self._render_timer.timeout.connect(self._render)
+
+    def start(self):
+        self._running = True
+        stages = (
+            ("lectura", self._read, None, self._blocks),
+            ("decodificacion", self._decode, self._blocks, self._lines),
+            ("analisis", self._parse, self._lines, self._records),
+            ("indexado", self._index, self._records, self._batches),
+        )
+        for name, stage, source, target in stages:
+            threading.Thread(target=self._run_stage, args=(stage, source, target),
+                             name="carga-" + name, daemon=True).start()
+        self._render_timer.start()
+
+    def cancel(self):
+        self._stop.set()
+        self._render_timer.stop()
+        self._running = False
+
+    def is_running(self):
+        return self._running
+
+    # Etapas (hilos de trabajo)
+
+    def _put(self, target, item):
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                target.put(item, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def _items(self, source):
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                item = source.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if item is _END:
+                return
+            yield item
+
+    def _run_stage(self, stage, source, target):
+        try:
+            stage(source, target)
+            self._put(target, _END)
+        except _Stopped:
+            pass
+        except Exception as e:
+            # Las etapas siguientes se detienen y la presentación muestra el error
+            self._error = str(e)
+            self._stop.set()
+
+    def _read(self, source, target):
+        with open(self.path, 'rb', buffering=BUFFER_SIZE) as file:
+            size = os.fstat(file.fileno()).st_size
+            with decompress_stream(file) as stream:
+                while True:
+                    block = stream.read(BLOCK_SIZE)
+                    if not block:
+                        break
+                    if size:
+                        self._percent = min(int(file.tell() * 100 / size), 100)
+                    self._put(target, block)
+
+    def _decode(self, source, target):
+        decoder = None
+        pending = ''
+        for block in self._items(source):
+            if decoder is None:
+                self.encoding = chardet.detect(block[:ENCODING_SAMPLE_SIZE])["encoding"] or 'utf-8'
+                decoder = codecs.getincrementaldecoder(self.encoding)(errors='ignore')
+            lines = (pending + decoder.decode(block)).split('\n')
+            pending = lines.pop()
+            self._put(target, [line.strip() for line in lines])
+        if decoder is not None:
+            pending += decoder.decode(b'', final=True)
+        if pending:
+            self._put(target, [pending.strip()])
+
+    def _parse(self, source, target):
+        # Mismas reglas que M3UParser: las líneas de comentario antes de un #EXTINF se muestran pero no
+        # forman parte del canal
+        display = []
+        extinf = ''
+        extra = []
+        records = []
+        for lines in self._items(source):
+            for line in lines:
+                if line.startswith("#EXTM3U"):
+                    self.header = line
+                    continue
+                display.append(line)
+                if not line:
+                    continue
+                if line.startswith("#EXTINF:"):
+                    extinf = line
+                    extra = []
+                elif line.startswith("#"):
+                    extra.append(line)
+                else:
+                    records.append((display, extinf, tuple(extra), line))
+                    display = []
+                    extinf = ''
+                    extra = []
+            if len(records) >= BATCH_SIZE:
+                self._put(target, records)
+                records = []
+        if display:
+            records.append((display, None, None, None))
+        if records:
+            self._put(target, records)
+
+    def _index(self, source, target):
+        for records in self._items(source):
+            self._put(target, [(display, extinf, extra, url, None if url is None else record_fields(extinf, url))
+                               for display, extinf, extra, url in records])
+
+    # Presentación (hilo de la interfaz)
+
+    def _render(self):
+        deadline = time.monotonic() + RENDER_BUDGET
+        busy = True
+        while time.monotonic() < deadline:
+            try:
+                records = self._batches.get_nowait()
+            except queue.Empty:
+                busy = False
+                break
+            if records is _END:
+                self._report_progress(100)
+                self.cancel()
+                self.finished.emit()
+                return
+            self.batch.emit(records)
+            if not self._running:
+                return  # Cancelada desde el lote
+        # Si quedan canales se sigue en cuanto la interfaz haya atendido sus eventos
+        self._render_timer.setInterval(0 if busy else RENDER_IDLE_INTERVAL)
+        self._report_progress(self._percent)
+        if self._error is not None:
+            self.cancel()
+            self.error.emit(self._error)
+
+    def _report_progress(self, percent):
+        if percent != self._reported_percent:
+            self._reported_percent = percent
+            self.progress.emit(percent)
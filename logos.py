@@ -0,0 +1,227 @@
+"""
+logos.py - Carga asíncrona de logos de canales (tvg-logo) para M3U Organizer
+
+Este módulo descarga, decodifica y guarda en caché los logos indicados en el atributo `tvg-logo` de las
+líneas #EXTINF. Todo el trabajo pesado (red, decodificación y escalado) se hace fuera del hilo de la
+interfaz gráfica, en un `QThreadPool` con un número acotado de hilos. Cada logo se escala una única vez
+al tamaño de visualización y se guarda:
+
+- En una caché en memoria LRU limitada por tamaño (bytes aproximados de los QPixmap).
+- En una caché en disco (`cache/logos`), usando como nombre de archivo el hash SHA-1 de la URL.
+
+Las vistas solo solicitan los logos de las filas visibles; las peticiones que aún no han empezado y
+dejan de ser visibles se retiran de la cola, de modo que recorrer una lista de 50.000 canales no
+lanza 50.000 descargas.
+
+Funciones:
+----------
+- extract_tvg_logo(line): Devuelve la URL del atributo tvg-logo de una línea #EXTINF, o '' si no tiene.
+- logo_cache_path(url): Devuelve la ruta del archivo de la caché en disco para una URL.
+- prune_disk_cache(max_bytes, directory): Elimina los logos (u otras imágenes de una caché en disco, como las
+  miniaturas) usados hace más tiempo hasta no superar `max_bytes`.
+
+Clases:
+-------
+- PixmapLRUCache: Caché LRU en memoria de QPixmap limitada por tamaño.
+- LogoLoader(QObject): Gestiona las peticiones de logos y emite `logo_ready(url)` cuando un logo está disponible.
+"""
+
+import hashlib
+import logging
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+import network
+
+# Directorio del script actual
+current_directory = Path(__file__).parent
+
+LOGO_CACHE_DIR = current_directory / "cache" / "logos"
+# Tamaño (en píxeles) al que se escalan los logos una única vez
+LOGO_SIZE = 20
+# Límite de la caché en memoria (bytes aproximados de los píxeles) y en disco
+MEMORY_CACHE_BYTES = 16 * 1024 * 1024
+DISK_CACHE_BYTES = 64 * 1024 * 1024
+# Tamaño máximo de un logo descargado; los archivos mayores se descartan
+MAX_LOGO_BYTES = 2 * 1024 * 1024
+# Descargas de logos simultáneas
+MAX_LOGO_THREADS = 4
+
+_TVG_LOGO_RE = re.compile(r'tvg-logo="([^"]*)"')
+
+
+def extract_tvg_logo(line):
+    match = _TVG_LOGO_RE.search(line)
+    if match:
+        return match.group(1).strip()
+    return ''
+
+
+def logo_cache_path(url):
+    return LOGO_CACHE_DIR / (hashlib.sha1(url.encode('utf-8')).hexdigest() + ".png")
+
+
+def prune_disk_cache(max_bytes=DISK_CACHE_BYTES, directory=LOGO_CACHE_DIR):
+    """
+    Elimina los logos menos usados recientemente de la caché en disco hasta que su tamaño total
+    no supere `max_bytes`.
+    """
+    if not directory.exists():
+        return
+    entries = []
+    total = 0
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+class PixmapLRUCache:
+    def __init__(self, max_bytes=MEMORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._items = OrderedDict()
+
+    @staticmethod
+    def _cost(pixmap):
+        return max(1, pixmap.width() * pixmap.height() * 4)
+
+    def get(self, key):
+        pixmap = self._items.get(key)
+        if pixmap is not None:
+            self._items.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        if key in self._items:
+            self.current_bytes -= self._cost(self._items.pop(key))
+        self._items[key] = pixmap
+        self.current_bytes += self._cost(pixmap)
+        while self.current_bytes > self.max_bytes and len(self._items) > 1:
+            _, oldest = self._items.popitem(last=False)
+            self.current_bytes -= self._cost(oldest)
+
+    def remove(self, key):
+        pixmap = self._items.pop(key, None)
+        if pixmap is not None:
+            self.current_bytes -= self._cost(pixmap)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
+class _LogoSignals(QObject):
+    loaded = pyqtSignal(str, QImage)
+    failed = pyqtSignal(str)
+
+
+class _LogoTask(QRunnable):
+    """
+    Tarea que obtiene un logo de la caché en disco o de la red, lo decodifica y lo escala.
+    Se ejecuta en un hilo del QThreadPool, por eso trabaja con QImage y no con QPixmap.
+    """
+    def __init__(self, url, signals):
+        super().__init__()
+        self.url = url
+        self.signals = signals
+        self.setAutoDelete(False)
+
+    def run(self):
+        path = logo_cache_path(self.url)
+        image = QImage()
+        try:
+            if path.exists() and image.load(str(path)):
+                os.utime(path, None)  # Marcar como usado recientemente para la poda de la caché en disco
+            else:
+                data = network.fetch_bytes(self.url, max_bytes=MAX_LOGO_BYTES + 1)
+                if len(data) > MAX_LOGO_BYTES or not image.loadFromData(data):
+                    raise ValueError("Logo demasiado grande o en un formato no soportado")
+                image = image.scaled(LOGO_SIZE, LOGO_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                image.save(str(path), "PNG")
+        except Exception as e:
+            logging.debug(f"No se pudo cargar el logo {self.url}: {e}")
+            self._emit(self.signals.failed, self.url)
+            return
+        self._emit(self.signals.loaded, self.url, image)
+
+    @staticmethod
+    def _emit(signal, *args):
+        try:
+            signal.emit(*args)
+        except RuntimeError:
+            pass  # El cargador ya se ha destruido (la aplicación se está cerrando)
+
+
+class LogoLoader(QObject):
+    logo_ready = pyqtSignal(str)
+
+    def __init__(self, parent=None, max_threads=MAX_LOGO_THREADS):
+        super().__init__(parent)
+        self.cache = PixmapLRUCache()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._queued = {}  # url -> tarea aún no finalizada
+        self._failed = set()  # URLs que no se pudieron cargar (no se reintentan en esta sesión)
+        self._signals = _LogoSignals(self)
+        self._signals.loaded.connect(self._on_loaded)
+        self._signals.failed.connect(self._on_failed)
+        network.submit(prune_disk_cache)
+
+    def pixmap(self, url):
+        """
+        Devuelve el QPixmap del logo si ya está en memoria, o None. No lanza ninguna descarga.
+        """
+        return self.cache.get(url)
+
+    def request(self, url):
+        """
+        Solicita un logo. Si ya está en memoria, en cola o ha fallado antes, no hace nada.
+        """
+        if not url or url in self.cache or url in self._queued or url in self._failed:
+            return
+        task = _LogoTask(url, self._signals)
+        self._queued[url] = task
+        self.pool.start(task)
+
+    def set_visible(self, urls):
+        """
+        Retira de la cola las peticiones que todavía no han empezado y ya no corresponden a filas
+        visibles. Las que ya están en curso se dejan terminar (acabarán en la caché).
+        """
+        visible = set(urls)
+        for url in [u for u in self._queued if u not in visible]:
+            if self.pool.tryTake(self._queued[url]):
+                del self._queued[url]
+
+    def _on_loaded(self, url, image):
+        self._queued.pop(url, None)
+        # La conversión a QPixmap debe hacerse en el hilo de la interfaz gráfica
+        self.cache.put(url, QPixmap.fromImage(image))
+        self.logo_ready.emit(url)
+
+    def _on_failed(self, url):
+        self._queued.pop(url, None)
+        self._failed.add(url)
+
+    def shutdown(self):
+        self.pool.clear()
+        self.pool.waitForDone(2000)
@@ -0,0 +1,144 @@
+"""
+network.py - Capa de red compartida para M3U Organizer
+
+Este módulo centraliza todas las peticiones HTTP de la aplicación (descarga de listas M3U, logos,
+guías EPG, comprobación de streams...). En lugar de llamar a `requests.get` de forma aislada, todas
+las descargas reutilizan una única `requests.Session` con un pool de conexiones keep-alive, de forma
+que refrescar varias listas alojadas en el mismo CDN no obliga a repetir el handshake TCP/TLS.
+
+Características:
+----------------
+- Pool de conexiones keep-alive con un máximo de conexiones simultáneas por host.
+- Tiempos de espera por defecto para la conexión y la lectura, para que ninguna descarga se quede colgada.
+- Reintentos con espera exponencial ante errores transitorios (errores de conexión, 429 y 5xx).
+- Paralelismo acotado mediante un pool de hilos compartido para las tareas de red en segundo plano.
+
+Funciones:
+----------
+- get_session(): Devuelve la sesión HTTP compartida, creándola la primera vez que se necesita.
+- get(url, **kwargs): Realiza una petición GET con la sesión compartida y los tiempos de espera por defecto.
+- fetch_bytes(url, max_bytes=None, **kwargs): Descarga el cuerpo de una URL (o solo sus primeros bytes).
+- read_bytes(response, max_bytes=None): Lee el cuerpo (o sus primeros bytes) de una respuesta en streaming.
+- was_retried(response): Indica si la petición tuvo que repetirse por un error transitorio.
+- submit(fn, *args, **kwargs): Envía una tarea de red al pool compartido de hilos.
+- close(): Cierra la sesión y el pool de hilos (se llama al salir de la aplicación).
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Tiempos de espera por defecto (conexión, lectura) en segundos
+TIMEOUT_POR_DEFECTO = (5, 30)
+# Número de hosts distintos cuyas conexiones se mantienen en el pool
+MAX_HOSTS_EN_POOL = 32
+# Conexiones simultáneas máximas contra un mismo host
+MAX_CONEXIONES_POR_HOST = 6
+# Número máximo de tareas de red ejecutándose a la vez en segundo plano
+MAX_DESCARGAS_PARALELAS = 8
+# Reintentos ante errores transitorios
+REINTENTOS = 3
+FACTOR_ESPERA = 0.5
+
+USER_AGENT = "M3U-Organizer/0.5 (+https://github.com/sapoclay/organizador-m3u)"
+
+_session = None
+_executor = None
+_lock = threading.Lock()
+
+
+def _crear_session():
+    retry = Retry(
+        total=REINTENTOS,
+        connect=REINTENTOS,
+        read=REINTENTOS,
+        backoff_factor=FACTOR_ESPERA,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    # pool_block=True hace que MAX_CONEXIONES_POR_HOST sea un límite real y no solo un tamaño de caché
+    adapter = HTTPAdapter(
+        pool_connections=MAX_HOSTS_EN_POOL,
+        pool_maxsize=MAX_CONEXIONES_POR_HOST,
+        pool_block=True,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _crear_session()
+        return _session
+
+
+def get(url, **kwargs):
+    """
+    Realiza una petición GET usando la sesión compartida. Si no se indica `timeout`, se aplica
+    TIMEOUT_POR_DEFECTO.
+    """
+    kwargs.setdefault("timeout", TIMEOUT_POR_DEFECTO)
+    return get_session().get(url, **kwargs)
+
+
+def fetch_bytes(url, max_bytes=None, **kwargs):
+    """
+    Descarga el cuerpo de una URL y lo devuelve como bytes. Si se indica `max_bytes`, solo se leen
+    los primeros bytes y se corta la conexión (útil para inspeccionar cabeceras de streams).
+    """
+    with get(url, stream=True, **kwargs) as response:
+        response.raise_for_status()
+        return read_bytes(response, max_bytes)
+
+
+def read_bytes(response, max_bytes=None):
+    if max_bytes is None:
+        return response.content
+    data = bytearray()
+    for chunk in response.iter_content(chunk_size=min(max_bytes, 64 * 1024)):
+        data.extend(chunk)
+        if len(data) >= max_bytes:
+            break
+    return bytes(data[:max_bytes])
+
+
+def was_retried(response):
+    """
+    Indica si urllib3 tuvo que repetir la petición (errores de conexión, 429 o 5xx) antes de obtener la
+    respuesta. Las redirecciones las sigue `requests` y no cuentan.
+    """
+    retries = getattr(response.raw, "retries", None)
+    return bool(retries is not None and retries.history)
+
+
+def submit(fn, *args, **kwargs):
+    """
+    Ejecuta `fn` en el pool compartido de hilos de red y devuelve un `Future`. El tamaño del pool
+    limita cuántas descargas en segundo plano hay en marcha a la vez.
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_DESCARGAS_PARALELAS, thread_name_prefix="red")
+    return _executor.submit(fn, *args, **kwargs)
+
+
+def close():
+    global _session, _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -9,10 +9,21 @@ streams de vídeo directamente desde la aplicación.
 
 Principales funcionalidades:
 - Cargar archivos M3U locales o desde URL.
-- Filtrar y ordenar canales por nombre o group-title.
-- Interfaz gráfica intuitiva con soporte para arrastrar y soltar.
+- Panel de grupos (group-title) con recuentos de canales, activos y duplicados.
+- Filtrar canales con un lenguaje de consulta (campos, expresiones regulares, AND/OR/NOT) y ordenarlos por nombre, group-title, resolución o disponibilidad.
+- Historial de disponibilidad y latencia de cada canal y de cada servidor en los últimos días.
+- Interfaz gráfica intuitiva con soporte para arrastrar y soltar canales completos entre paneles.
+- Panel derecho para construir una lista nueva a partir de referencias a los canales cargados.
 - Previsualización de streams de vídeo utilizando VLC.
-- Guardado del archivo M3U con los cambios aplicados.
+- Logos de los canales (tvg-logo) cargados en segundo plano y guardados en caché.
+- Cuadrícula de miniaturas con una imagen de lo que emite cada canal, capturada en segundo plano con VLC.
+- Guía de programación XMLTV (ahora y a continuación) unida a los canales por tvg-id.
+- Comparación con otra versión de la lista (añadidos, eliminados y cambios de URL o atributos) y exportación del informe.
+- Actualización programada en segundo plano de las URLs guardadas, con copia ya analizada en caché.
+- Vigilancia del archivo cargado: si solo crece se leen únicamente las líneas añadidas.
+- Guardado del archivo M3U con los cambios aplicados y exportación a JSON Lines, CSV y XSPF, también dividida por group-title.
+- Servidor HTTP local que publica la lista del panel derecho y las vistas de filtro guardadas (con gzip y ETag).
+- Deshacer/rehacer con un historial de operaciones y recuperación de la sesión de trabajo al volver a abrir el programa.
 - Soporte para menús contextuales y acciones personalizadas.
 
 El módulo también integra hilos para la carga de archivos M3U y la búsqueda dentro del archivo, 
@@ -30,51 +41,140 @@ Imports:
 - PyQt5.QtCore: Contiene clases básicas no gráficas.
 - PyQt5.QtGui: Proporciona funcionalidades gráficas, como la manipulación de texto y el uso de colores.
 - pathlib.Path: Se utiliza para manejar rutas de archivos de manera sencilla.
-- requests: Maneja las descargas de archivos M3U desde URL.
+- requests: Maneja las descargas de archivos M3U desde URL (a través de la sesión compartida de `network`).
 - vlc: Proporciona la integración con el reproductor VLC.
-- re: Proporciona soporte para expresiones regulares.
 - logging: Proporciona soporte para la generación de logs.
 
 """
 
+import itertools
 import os
-from PyQt5.QtWidgets import QMainWindow,  QTextEdit, QHBoxLayout, QWidget, QAction, QVBoxLayout, QFileDialog, QMessageBox, QInputDialog,  QProgressDialog, QSystemTrayIcon, QMenu, QPushButton, QComboBox, QLabel, QLineEdit
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QTextCursor, QTextCharFormat, QBrush, QColor, QIcon
+from PyQt5.QtWidgets import QMainWindow,  QTextEdit, QHBoxLayout, QWidget, QAction, QVBoxLayout, QFileDialog, QMessageBox, QInputDialog,  QProgressDialog, QSystemTrayIcon, QMenu, QPushButton, QComboBox, QLabel, QLineEdit, QDialog, QTableWidget, QTableWidgetItem, QHeaderView
+from PyQt5.QtCore import Qt, QDateTime, QTimer
+from PyQt5.QtNetwork import QAbstractSocket, QNetworkInterface
+from PyQt5.QtGui import QTextCursor, QTextCharFormat, QBrush, QColor, QIcon, QKeySequence
 from pathlib import Path
 from optionsmenu import show_about_dialog, show_how_to_use_dialog, open_github_url, abrir_vpn, restore_window, show_about_dialog
-from actions import copy_selection, paste_selection, show_context_menu, open_with_vlc, handle_double_click, guardar_url, ver_urls_guardadas
-from threads import LoadFileThread, SearchThread
-import requests  # Importa la librería requests para realizar la descarga
+from actions import copy_selection, paste_selection, show_context_menu, show_right_panel_menu, open_with_vlc, handle_double_click, edit_right_panel_channel, guardar_url, ver_urls_guardadas, load_urls
+from threads import SearchThread, EpgLoadThread, DiffThread, DownloadThread, ExportThread, SessionLoadThread, PublishThread
+from epg import extract_tvg_id
+from channelstore import ChannelStore, M3UParser
+from diff import write_report
+from exporters import EXTENSIONS, export_to_file, split_by_group, write_m3u
+from watcher import PlaylistWatcher
+from loader import LoadPipeline
+from history import History, Operation, encode_ids, decode_ids
+from workspace import SAVE_INTERVAL_MS, SESSION_PATH, capture_session, read_session_header, write_session
+from scheduler import RefreshScheduler, load_cached_store
+from server import PLAYLIST_PATH, DEFAULT_PORT, PlaylistServer, load_views, path_url, save_views, view_path
+from query import compile_query, QueryError
+from grouptree import GroupStats, GroupTreeWidget
+from logos import LogoLoader
+from widgets import ChannelListModel, ChannelListView, ChannelTextEdit
+from player import PlayerPool
+from thumbnails import ThumbnailDialog, ThumbnailLoader
+from probe import ProbeManager, QUALITY_MIN_HEIGHT, describe, height_key
+from uptime import UPTIME_WINDOWS, UptimeStore
+import network  # Sesión HTTP compartida con pool de conexiones, timeouts y reintentos
 import logging # Para el manejo de advertencias y errores
 import vlc
-import re
 from actions import VideoDialog 
 
 # Directorio del script actual
 current_directory = Path(__file__).parent
 
+# Filtro de los diálogos para abrir listas (también comprimidas, ver compression.py)
+M3U_FILE_FILTER = "M3U Files (*.m3u *.m3u8 *.gz *.xz *.bz2 *.zip);;All Files (*)"
+# Ordenaciones por disponibilidad (ver uptime.py): texto del selector -> días
+UPTIME_SORT_CRITERIA = {f'Disponibilidad (últimos {days} días)': days for days in UPTIME_WINDOWS}
+
 
 class M3UOrganizer(QMainWindow):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
         try:
-            # Inicializar la instancia de VLC y el reproductor de medios
+            # Inicializar la instancia de VLC y el pool de reproductores reutilizables
             self.instance = vlc.Instance()
-            self.media_player = self.instance.media_player_new()
-
-            if not self.media_player:
-                raise Exception("Error al inicializar el reproductor de medios VLC.")
+            if not self.instance:
+                raise Exception("Error al inicializar la instancia de VLC.")
+            # Los reproductores se piden al pool cuando hacen falta (vídeo y miniaturas)
+            self.player_pool = PlayerPool(self.instance)
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error al inicializar VLC: {str(e)}")
-            self.media_player = None
+            self.instance = None
+            self.player_pool = None
+
+        self.video_dialog = None  # Ventana de previsualización reutilizada entre canales
+        self.thumbnail_loader = None  # Capturas de las miniaturas (ver thumbnails.py), creado al usarlo
+        self.thumbnail_dialog = None
+
+        # Análisis en segundo plano de resolución, códecs y bitrate de cada URL
+        self.probe_manager = ProbeManager(self, instance=self.instance)
+        self.probe_results = {}  # URL -> información obtenida por el análisis
+        self.probe_manager.result.connect(self.on_probe_result)
+        self.probe_manager.progress.connect(self.on_probe_progress)
+        self.probe_manager.finished.connect(lambda: self.statusBar().showMessage("Análisis de canales finalizado", 5000))
+        # Historial de disponibilidad y latencia de cada URL, alimentado por el análisis
+        self.uptime = UptimeStore()
+        self.probe_manager.finished.connect(self.uptime.flush)
 
         self.initUI()
         self.threads = []  # Inicializa el atributo threads
         self.temp_file_path = None  # Añade un atributo para la ruta del archivo temporal
-        self.original_content = []  # Almacena el contenido original sin filtrar ni ordenar
+        self.download_thread = None
+        self.load_pipeline = None  # Carga en curso de la lista (ver loader.py)
+        self.store = ChannelStore()  # Canales cargados (almacén columnar)
+        self.parser = M3UParser(self.store)
+        self.view_ids = []  # Ids de los canales mostrados en el panel izquierdo, en orden
+        self.view_descriptor = ("all",)  # Cómo se obtuvo la vista actual (ver show_view)
+        self.left_line_ids = []  # Id del canal de cada línea del panel izquierdo (None si aún no se conoce)
+        self._pending_lines = 0  # Líneas mostradas del canal que se está leyendo (aún sin URL)
+        self.group_stats = GroupStats(self.store)
+        self.group_tree.set_stats(self.group_stats)
+        self.right_store = ChannelStore()  # Canales pegados como texto o editados en el panel derecho
+        self.right_model.text_store = self.right_store
+        self.epg_index = None  # Guía de programación (XMLTV) unida a los canales por tvg-id
+        self.last_diff = None  # Resultado de la última comparación con otra versión de la lista
+        self.current_file_path = None  # Archivo local de la lista cargada (None si se descargó de una URL)
+        self.file_encoding = None  # Codificación detectada al cargar el archivo
+        self.source_url = None  # URL de la que se descargó la lista cargada
+        self.showing_all = True  # El panel izquierdo muestra todos los canales en el orden del archivo
+
+        # Vigilancia del archivo cargado para leer solo lo que cambie
+        self.file_watcher = PlaylistWatcher(self)
+        self.file_watcher.appended.connect(self.on_watched_lines_appended)
+        self.file_watcher.rewritten.connect(self.on_watched_file_rewritten)
+        self.reload_thread = None
+        self.reload_pending = False
+
+        # Actualización programada de las listas de urls_guardadas.json
+        self.refresh_scheduler = RefreshScheduler(self, load_urls=load_urls)
+        self.refresh_scheduler.start()
+
+        # Servidor HTTP local con la lista del panel derecho y las vistas de filtro guardadas
+        self.playlist_server = PlaylistServer()
+        self.published_versions = {}  # Ruta -> versión de los datos con la que se generó su respuesta
+        self.publish_thread = None  # Preparación en curso de las respuestas (ver PublishThread)
+        self.publish_timer = QTimer(self)
+        self.publish_timer.setSingleShot(True)
+        self.publish_timer.setInterval(500)
+        self.publish_timer.timeout.connect(self.publish_playlists)
+        for signal in (self.right_model.rowsInserted, self.right_model.rowsRemoved,
+                       self.right_model.modelReset, self.right_model.dataChanged):
+            signal.connect(self.schedule_publish)
+
+        # Sesión de trabajo: se guarda periódicamente y al cerrar, y se recupera al arrancar (ver workspace.py)
+        self.session_signature = None  # Estado de la última sesión guardada
+        self.session_save_thread = None
+        self.session_load_thread = None
+        self.session_timer = QTimer(self)
+        self.session_timer.setInterval(SAVE_INTERVAL_MS)
+        self.session_timer.timeout.connect(self.save_session_in_background)
+        self.session_timer.timeout.connect(self.uptime.flush)
+        self.session_timer.start()
+        QTimer.singleShot(0, self.restore_session)
 
         
     def initUI(self):
@@ -116,33 +216,57 @@ class M3UOrganizer(QMainWindow):
         else:
             logging.warning(f"Icono no encontrado en {icon_path}")
             
-        self.loaded_lines = []  # Inicializar lista para acumular líneas cargadas
-        self.original_lines = []  # Para almacenar la lista original sin filtrar/ordenar
         self.setWindowTitle('M3U 0rgan1zat0r')
 
-        # Crear los widgets
-        self.text_left = QTextEdit()
-        self.text_right = QTextEdit()
-        
+        # Cargador de logos (tvg-logo) compartido por ambos paneles
+        self.logo_loader = LogoLoader(self)
 
-        # Hacer que ambos cuadros de texto acepten arrastrar y soltar
+        # Historial de deshacer/rehacer de ambos paneles (ver history.py)
+        self.history = History(self)
+
+        # Crear los widgets
+        self.text_left = ChannelTextEdit(logo_loader=self.logo_loader)
+        self.text_left.channel_ids_provider = self.channels_in_blocks
+        self.text_left.lines_changed.connect(self.on_left_lines_changed)
+        # El historial propio del documento guardaría una copia de cada texto insertado
+        self.text_left.setUndoRedoEnabled(False)
+
+        # Panel derecho: lista en construcción formada por referencias a canales
+        self.right_model = ChannelListModel(self, logo_loader=self.logo_loader)
+        self.right_model.history = self.history
+        self.history.register("ventana", self)
+        self.history.register("panel_derecho", self.right_model)
+        self.right_panel = ChannelListView()
+        self.right_panel.setModel(self.right_model)
+        self.right_model.rowsInserted.connect(self.update_right_panel_title)
+        self.right_model.rowsRemoved.connect(self.update_right_panel_title)
+        self.right_model.modelReset.connect(self.update_right_panel_title)
+
+        # Hacer que ambos paneles acepten arrastrar y soltar
         self.text_left.setAcceptDrops(True)
-        self.text_right.setAcceptDrops(True)
+        self.right_panel.setAcceptDrops(True)
 
         # Crear los botones de filtrado, ordenación y reseteo
         filter_label = QLabel("Filtrar:")
         self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText('Texto o consulta, p. ej.: group:"Deportes" AND NOT host:example.com AND name~/hd$/i')
+        self.filter_input.returnPressed.connect(self.filter_list)
         filter_button = QPushButton("Aplicar")
         filter_button.clicked.connect(self.filter_list)
 
+        quality_label = QLabel("Calidad:")
+        self.quality_selector = QComboBox()
+        self.quality_selector.addItems(['Todas'] + [f"{label} o superior" for label in QUALITY_MIN_HEIGHT])
+
         sort_label = QLabel("Ordenar:")
         self.sort_selector = QComboBox()
         self.sort_selector.addItems([
             'Nombre del Canal (A-Z)', 
             'Nombre del Canal (Z-A)', 
             'Group-title (A-Z)', 
-            'Group-title (Z-A)'
-        ])
+            'Group-title (Z-A)',
+            'Resolución (mayor a menor)'
+        ] + list(UPTIME_SORT_CRITERIA))
         sort_button = QPushButton("Aplicar")
         sort_button.clicked.connect(self.sort_list)
 
@@ -153,6 +277,8 @@ class M3UOrganizer(QMainWindow):
         top_layout = QHBoxLayout()
         top_layout.addWidget(filter_label)
         top_layout.addWidget(self.filter_input)
+        top_layout.addWidget(quality_label)
+        top_layout.addWidget(self.quality_selector)
         top_layout.addWidget(filter_button)
         top_layout.addWidget(sort_label)
         top_layout.addWidget(self.sort_selector)
@@ -160,9 +286,19 @@ class M3UOrganizer(QMainWindow):
         top_layout.addWidget(reset_button)
 
         # Layout principal con los textos
+        # Panel de grupos (group-title) con sus recuentos
+        self.group_tree = GroupTreeWidget()
+        self.group_tree.group_selected.connect(self.show_group)
+        self.group_tree.channel_activated.connect(lambda channel_id: self.preview_stream_from_menu(self.store.url[channel_id]))
+
         h_layout = QHBoxLayout()
+        h_layout.addWidget(self.group_tree)
         h_layout.addWidget(self.text_left)
-        h_layout.addWidget(self.text_right)
+        self.right_title = QLabel("Lista nueva: 0 canales")
+        right_layout = QVBoxLayout()
+        right_layout.addWidget(self.right_title)
+        right_layout.addWidget(self.right_panel)
+        h_layout.addLayout(right_layout)
         #h_layout.addWidget(self.video_widget)  # Añadir el widget de video al diseño
 
         # Layout final que combina todo
@@ -173,10 +309,6 @@ class M3UOrganizer(QMainWindow):
         container = QWidget()
         container.setLayout(main_layout)
         self.setCentralWidget(container)
-        
-        # Inicializar el reproductor de VLC
-        self.media_player = vlc.MediaPlayer()
-       # self.media_player.set_hwnd(self.video_widget.winId())
 
         # Crear el menú (mantiene el código existente para el menú)
         menubar = self.menuBar()
@@ -186,18 +318,39 @@ class M3UOrganizer(QMainWindow):
         open_action = QAction('Abrir M3U local', self)
         open_from_url_action = QAction('Abrir M3U desde URL', self)  
         save_action = QAction('Guardar M3U', self)
+        export_action = QAction('Exportar como JSON Lines, CSV o XSPF', self)
+        split_action = QAction('Exportar dividido por group-title', self)
+        self.watch_action = QAction('Vigilar cambios del archivo', self)
+        self.watch_action.setCheckable(True)
         exit_action = QAction('Salir', self)
         open_action.triggered.connect(self.load_m3u)
         open_from_url_action.triggered.connect(self.load_m3u_from_url) 
         save_action.triggered.connect(self.save_m3u)
+        export_action.triggered.connect(self.export_list)
+        split_action.triggered.connect(self.export_split_by_group)
+        self.watch_action.toggled.connect(self.toggle_file_watch)
         exit_action.triggered.connect(self.close)
         file_menu.addAction(open_action)
         file_menu.addAction(open_from_url_action)  
+        file_menu.addAction(self.watch_action)
         file_menu.addAction(save_action)
+        file_menu.addAction(export_action)
+        file_menu.addAction(split_action)
         file_menu.addAction(exit_action)
 
         # Menú Editar
         edit_menu = menubar.addMenu('Editar')
+        self.undo_action = QAction('Deshacer', self)
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.undo_action.triggered.connect(self.undo)
+        self.redo_action = QAction('Rehacer', self)
+        self.redo_action.setShortcut(QKeySequence.Redo)
+        self.redo_action.triggered.connect(self.redo)
+        edit_menu.addAction(self.undo_action)
+        edit_menu.addAction(self.redo_action)
+        edit_menu.addSeparator()
+        self.history.changed.connect(self.update_undo_actions)
+        self.update_undo_actions()
         search_action = QAction('Buscar y seleccionar', self)
         copy_action = QAction('Copiar selección', self)
         paste_action = QAction('Pegar', self)
@@ -217,6 +370,25 @@ class M3UOrganizer(QMainWindow):
         sort_action = QAction('Ordenar', self)
         sort_action.triggered.connect(self.sort_list)
         edit_menu.addAction(sort_action)
+
+        # Acción de análisis de resolución, códecs y bitrate
+        probe_action = QAction('Analizar canales (resolución y códecs)', self)
+        probe_action.triggered.connect(lambda: self.probe_channels())
+        edit_menu.addAction(probe_action)
+
+        # Comprobación de disponibilidad: vuelve a analizar aunque haya resultados recientes en caché
+        uptime_check_action = QAction('Comprobar disponibilidad de los canales', self)
+        uptime_check_action.triggered.connect(lambda: self.probe_channels(force=True))
+        edit_menu.addAction(uptime_check_action)
+
+        uptime_action = QAction('Disponibilidad por servidor', self)
+        uptime_action.triggered.connect(self.show_uptime_dialog)
+        edit_menu.addAction(uptime_action)
+
+        # Cuadrícula con una imagen de lo que emite cada canal
+        thumbnails_action = QAction('Ver miniaturas de los canales', self)
+        thumbnails_action.triggered.connect(self.show_thumbnails)
+        edit_menu.addAction(thumbnails_action)
         
         # Menú Listas
         list_menu = menubar.addMenu('Listas')
@@ -235,6 +407,51 @@ class M3UOrganizer(QMainWindow):
         view_list_action.triggered.connect(lambda: ver_urls_guardadas(self) )
         list_menu.addAction(view_list_action)
 
+        # Comparación con otra versión de la lista
+        list_menu.addSeparator()
+        diff_file_action = QAction('Comparar con otra lista local', self)
+        diff_file_action.triggered.connect(self.compare_with_file)
+        list_menu.addAction(diff_file_action)
+        diff_url_action = QAction('Comparar con lista desde URL', self)
+        diff_url_action.triggered.connect(self.compare_with_url)
+        list_menu.addAction(diff_url_action)
+        self.export_diff_action = QAction('Exportar informe de diferencias', self)
+        self.export_diff_action.triggered.connect(self.export_diff_report)
+        self.export_diff_action.setEnabled(False)
+        list_menu.addAction(self.export_diff_action)
+
+        # Menú Guía (EPG en formato XMLTV)
+        epg_menu = menubar.addMenu('Guía')
+        load_epg_action = QAction('Cargar guía EPG local', self)
+        load_epg_action.triggered.connect(self.load_epg)
+        epg_menu.addAction(load_epg_action)
+        load_epg_url_action = QAction('Cargar guía EPG desde URL', self)
+        load_epg_url_action.triggered.connect(self.load_epg_from_url)
+        epg_menu.addAction(load_epg_url_action)
+        show_epg_action = QAction('Ver ahora y a continuación', self)
+        show_epg_action.triggered.connect(self.show_epg_dialog)
+        epg_menu.addAction(show_epg_action)
+
+        # Menú Servidor (publicación de listas en la red local)
+        server_menu = menubar.addMenu('Servidor')
+        self.start_server_action = QAction('Iniciar servidor HTTP', self)
+        self.start_server_action.triggered.connect(self.start_server)
+        server_menu.addAction(self.start_server_action)
+        self.stop_server_action = QAction('Detener servidor HTTP', self)
+        self.stop_server_action.triggered.connect(self.stop_server)
+        self.stop_server_action.setEnabled(False)
+        server_menu.addAction(self.stop_server_action)
+        server_menu.addSeparator()
+        save_view_action = QAction('Publicar el filtro actual como vista', self)
+        save_view_action.triggered.connect(self.save_filter_view)
+        server_menu.addAction(save_view_action)
+        delete_view_action = QAction('Eliminar vista publicada', self)
+        delete_view_action.triggered.connect(self.delete_filter_view)
+        server_menu.addAction(delete_view_action)
+        show_addresses_action = QAction('Ver direcciones publicadas', self)
+        show_addresses_action.triggered.connect(self.show_server_addresses)
+        server_menu.addAction(show_addresses_action)
+
         # Menú Opciones
         options_menu = menubar.addMenu('Opciones')
 
@@ -257,13 +474,16 @@ class M3UOrganizer(QMainWindow):
         self.text_left.setContextMenuPolicy(Qt.CustomContextMenu)
         self.text_left.customContextMenuRequested.connect(lambda position: show_context_menu(self, position))
 
-        # Conectar el menú contextual del texto derecho
-        self.text_right.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.text_right.customContextMenuRequested.connect(lambda position: show_context_menu(self, position))
+        # Conectar el menú contextual del panel derecho
+        self.right_panel.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.right_panel.customContextMenuRequested.connect(lambda position: show_right_panel_menu(self, position))
+
+        # Mostrar en la barra de estado la información técnica del canal bajo el cursor
+        self.text_left.cursorPositionChanged.connect(self.show_channel_info)
 
         # Conectar la señal de doble clic a una función
         self.text_left.mouseDoubleClickEvent = lambda event: handle_double_click(self, event)
-        self.text_right.mouseDoubleClickEvent = lambda event: handle_double_click(self, event)
+        self.right_panel.doubleClicked.connect(lambda index: edit_right_panel_channel(self, index))
 
     def preview_stream_from_menu(self, url):
 
@@ -271,10 +491,34 @@ class M3UOrganizer(QMainWindow):
             QMessageBox.critical(self, "Error", "El reproductor VLC no está inicializado.")
             return
 
-        video_dialog = VideoDialog(self, instance=self.instance)  # Crear una instancia de VideoDialog
-        video_dialog.play_video(url)
-        video_dialog.exec_()
+        # Reutilizar la misma ventana (y el mismo reproductor) para cambiar de canal rápidamente
+        if self.video_dialog is None:
+            self.video_dialog = VideoDialog(self, instance=self.instance, player_pool=self.player_pool)
+        # Se navega por los canales mostrados en el panel izquierdo, tomados del almacén (no del texto)
+        self.video_dialog.set_playlist(list(map(self.store.url.__getitem__, self.view_ids)), url)
+        self.video_dialog.play_video(url)
         
+    def show_thumbnails(self):
+        """
+        Abre la cuadrícula de miniaturas con los canales mostrados en el panel izquierdo.
+        """
+        if not self.instance:
+            QMessageBox.critical(self, "Error", "El reproductor VLC no está inicializado.")
+            return
+        if not self.view_ids:
+            QMessageBox.warning(self, "Advertencia", "No hay ningún canal en el panel izquierdo.")
+            return
+        if self.thumbnail_loader is None:
+            self.thumbnail_loader = ThumbnailLoader(self, instance=self.instance)
+        if self.thumbnail_dialog is None:
+            self.thumbnail_dialog = ThumbnailDialog(self, self.thumbnail_loader, self.store, self.view_ids,
+                                                    preview=self.preview_stream_from_menu)
+        else:
+            self.thumbnail_dialog.set_channels(self.store, self.view_ids)
+        self.thumbnail_dialog.show()
+        self.thumbnail_dialog.raise_()
+        self.thumbnail_dialog.activateWindow()
+
     def play_m3u_file(self):
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getOpenFileName(self, "Seleccionar archivo M3U", "", "M3U Files (*.m3u);;All Files (*)", options=options)
@@ -295,37 +539,103 @@ class M3UOrganizer(QMainWindow):
 
     def load_m3u(self):
         options = QFileDialog.Options()
-        file_path, _ = QFileDialog.getOpenFileName(self, "Abrir M3U local", "", "M3U Files (*.m3u);;All Files (*)", options=options)
+        file_path, _ = QFileDialog.getOpenFileName(self, "Abrir M3U local", "", M3U_FILE_FILTER, options=options)
         if file_path:
             self.start_loading_m3u(file_path)
+            self.current_file_path = file_path
+            self.source_url = None
 
     def load_m3u_from_url(self):
         url, ok = QInputDialog.getText(self, 'Abrir M3U desde URL', 'Escribe la URL del archivo M3U:')
         
         if ok and url:
-            try:
-                response = requests.get(url, stream=True)
-                response.raise_for_status()
+            self.download_and_load(url)
 
-                # Guardar temporalmente el archivo M3U descargado
-                self.temp_file_path = str(current_directory / "temp_downloaded.m3u")
-                with open(self.temp_file_path, 'wb') as temp_file:
-                    for chunk in response.iter_content(chunk_size=1024):
-                        if chunk:
-                            temp_file.write(chunk)
+    def download_and_load(self, url):
+        """
+        Descarga la lista en segundo plano y la carga al terminar. Si una descarga anterior de la misma URL
+        quedó a medias, se reanuda desde donde se quedó.
+        """
+        # Guardar temporalmente el archivo M3U descargado
+        self.temp_file_path = str(current_directory / "temp_downloaded.m3u")
+        self.source_url = url
+
+        self.download_dialog = QProgressDialog("Descargando lista...", "Cancelar", 0, 100, self)
+        self.download_dialog.setWindowTitle("Descargando")
+        self.download_dialog.setWindowModality(Qt.WindowModal)
+        self.download_dialog.setMinimumDuration(0)
+        self.download_dialog.setAutoClose(False)
+        self.download_dialog.setValue(0)
+
+        self.download_thread = DownloadThread(url, self.temp_file_path)
+        self.threads.append(self.download_thread)
+        self.download_thread.progress.connect(self.update_download_progress)
+        self.download_thread.done.connect(self.on_download_finished)
+        self.download_thread.error.connect(self.on_download_error)
+        self.download_thread.finished.connect(lambda thread=self.download_thread: self.threads.remove(thread) if thread in self.threads else None)
+        self.download_dialog.canceled.connect(self.cancel_download)
+        self.download_thread.start()
+
+    def update_download_progress(self, percent, text):
+        if percent < 0:
+            self.download_dialog.setRange(0, 0)  # Tamaño desconocido: barra indeterminada
+        else:
+            self.download_dialog.setValue(percent)
+        self.download_dialog.setLabelText(f"Descargando lista...\n{text}")
 
-                self.start_loading_m3u(self.temp_file_path)
+    def close_download_dialog(self):
+        # Al cerrarse, QProgressDialog emite canceled(): desconectarlo para no cancelar una descarga ya terminada
+        self.download_dialog.canceled.disconnect(self.cancel_download)
+        self.download_dialog.close()
 
-            except requests.exceptions.RequestException as e:
-                QMessageBox.critical(self, "Error", f"No se pudo descargar el archivo: {str(e)}")
-                self.temp_file_path = None
+    def cancel_download(self):
+        self.download_thread.cancel()
+        self.statusBar().showMessage("Descarga cancelada. Si vuelves a abrir la misma URL se reanudará donde se quedó.", 10000)
+
+    def on_download_finished(self, path):
+        self.close_download_dialog()
+        self.start_loading_m3u(path)
+
+    def on_download_error(self, message):
+        self.close_download_dialog()
+        QMessageBox.critical(self, "Error", f"No se pudo descargar el archivo: {message}")
+        self.temp_file_path = None
+
+    def open_saved_list(self, name, url):
+        """
+        Abre una lista guardada usando la copia ya analizada de la caché si existe; si no, la descarga.
+        """
+        store = load_cached_store(url)
+        if store is None:
+            self.download_and_load(url)
+            return
+        self.open_store(store)
+        self.statusBar().showMessage(f"Lista '{name}' abierta desde la caché ({self.refresh_scheduler.describe(name)})", 10000)
+
+    def open_store(self, store):
+        """
+        Muestra una lista ya analizada (un `ChannelStore`) sin volver a leerla.
+        """
+        self.probe_manager.cancel()
+        self.file_watcher.stop()
+        self.current_file_path = None
+        self.source_url = None
+        self.store = store
+        self.parser = M3UParser(store)
+        self.group_stats = GroupStats(store)
+        self.group_tree.set_stats(self.group_stats)
+        self.show_channels(range(len(store)))
+        self.history.clear()
+        self.schedule_publish()
 
     def start_loading_m3u(self, file_path):
         """
         Maneja el proceso de carga de un archivo M3U, ya sea desde un archivo local o una URL descargada.
         """
-        self.text_left.clear()  # Borra el texto actual antes de cargar el nuevo archivo
-        self.original_lines.clear()  # Limpiar la lista original
+        self.probe_manager.cancel()  # La lista cambia: descartar el análisis pendiente
+        self.file_watcher.stop()
+        self.current_file_path = None
+        self.reset_loaded_list()
 
         self.progress_dialog = QProgressDialog("Cargando archivo...", "Cancelar", 0, 100, self)
         self.progress_dialog.setWindowTitle("Cargando")
@@ -334,23 +644,71 @@ class M3UOrganizer(QMainWindow):
         self.progress_dialog.setAutoClose(False)
         self.progress_dialog.setValue(0)
 
-        self.thread = LoadFileThread(file_path)
-        self.threads.append(self.thread)
+        self.load_pipeline = LoadPipeline(file_path, self)
 
         # Conexiones
-        self.thread.progress.connect(self.update_progress)
-        self.thread.lines_loaded.connect(self.append_line_to_original)  # Almacenar línea por línea
-        self.thread.finished.connect(self.on_file_loaded)
+        self.load_pipeline.progress.connect(self.update_progress)
+        self.load_pipeline.batch.connect(self.append_loaded_channels)
+        self.load_pipeline.finished.connect(self.on_file_loaded)
+        self.load_pipeline.error.connect(self.on_file_load_error)
         self.progress_dialog.canceled.connect(self.cancel_loading)
 
-        self.thread.start()
+        self.load_pipeline.start()
+
+    def reset_loaded_list(self):
+        """
+        Deja el panel izquierdo y la lista cargada vacíos.
+        """
+        self.showing_all = True
+        self.text_left.clear()  # Borra el texto actual antes de cargar el nuevo archivo
+        self.store = ChannelStore()
+        self.parser = M3UParser(self.store)
+        self.view_ids = []
+        self.left_line_ids = []
+        self._pending_lines = 0
+        self.group_stats = GroupStats(self.store)
+        self.group_tree.set_stats(self.group_stats)
+        self.view_descriptor = ("all",)
+        self.history.clear()
+
+    def append_loaded_channels(self, records):
+        """
+        Añade a la lista un lote de canales ya preparados por `LoadPipeline`: los guarda en el almacén,
+        en los recuentos por grupo y en el texto de la izquierda.
+        """
+        lines = []
+        for display, extinf, extra, url, fields in records:
+            lines.extend(display)
+            self.left_line_ids.extend([None] * len(display))
+            self._pending_lines += len(display)
+            if url is None:
+                # Líneas finales sin URL: el analizador las recuerda por si el archivo crece
+                for line in display:
+                    self.parser.feed(line)
+                continue
+            channel_id = self.store.append(extinf, url, extra, fields)
+            self.view_ids.append(channel_id)
+            for i in range(len(self.left_line_ids) - self._pending_lines, len(self.left_line_ids)):
+                self.left_line_ids[i] = channel_id
+            self._pending_lines = 0
+            self.group_stats.add(channel_id)
+        self.append_lines_to_text_edit(self.text_left, lines)
+        self.group_tree.schedule_refresh()
 
     def append_line_to_original(self, line):
         """
-        Almacena cada línea en la lista original y la añade al texto de la izquierda.
+        Pasa cada línea al analizador y la añade al texto de la izquierda.
         """
-        self.original_lines.append(line)
         self.append_text_to_left(line)
+        channel_id = self.parser.feed(line)
+        if channel_id is not None:
+            self.view_ids.append(channel_id)
+            # Asignar el canal a las líneas mostradas desde su #EXTINF hasta su URL
+            for i in range(len(self.left_line_ids) - self._pending_lines, len(self.left_line_ids)):
+                self.left_line_ids[i] = channel_id
+            self._pending_lines = 0
+            self.group_stats.add(channel_id)
+            self.group_tree.schedule_refresh()
         
     def update_progress(self, value):
         self.progress_dialog.setValue(value)
@@ -358,20 +716,58 @@ class M3UOrganizer(QMainWindow):
     def append_text_to_left(self, text):
         # Ignora la línea #EXTM3U
         if not text.startswith("#EXTM3U"):
-            self.original_content.append(text)  # Almacena el contenido original sin la línea #EXTM3U
             # Aquí pasamos una lista con una sola línea a la función que maneja el coloreado
             self.append_lines_to_text_edit(self.text_left, [text])
+            self.left_line_ids.append(None)
+            self._pending_lines += 1
+
+    def close_progress_dialog(self):
+        # Al cerrarse, QProgressDialog emite canceled(): desconectarlo para no cancelar una carga ya terminada
+        self.progress_dialog.canceled.disconnect(self.cancel_loading)
+        self.progress_dialog.close()
 
     def on_file_loaded(self):
-        self.progress_dialog.close()  # Cerrar el QProgressDialog cuando todo haya terminado
-        self.threads.remove(self.sender())
-        
+        self.close_progress_dialog()  # Cerrar el QProgressDialog cuando todo haya terminado
+        if self.load_pipeline.header:
+            self.store.header = self.load_pipeline.header
+        self.file_encoding = self.load_pipeline.encoding
+        self.schedule_publish()
+        if self.watch_action.isChecked() and self.current_file_path:
+            self.file_watcher.watch(self.current_file_path, self.file_encoding)
+
+    def on_file_load_error(self, message):
+        self.close_progress_dialog()
+        self.current_file_path = None
+        QMessageBox.critical(self, "Error", f"No se pudo leer el archivo: {message}")
+        self.keep_or_discard_partial_list()
+
     def cancel_loading(self):
-        if self.thread.isRunning():
-            self.thread.terminate()
-            self.progress_dialog.close()
-            QMessageBox.information(self, "Cancelado", "La carga del archivo ha sido cancelada.")
+        """
+        Detiene la carga en el acto. Los canales ya cargados están completos, así que se puede elegir
+        entre conservarlos o descartarlos.
+        """
+        if self.load_pipeline is None or not self.load_pipeline.is_running():
+            return
+        self.load_pipeline.cancel()
+        self.progress_dialog.canceled.disconnect(self.cancel_loading)
+        self.current_file_path = None  # Una lista a medias no se vigila
+        self.keep_or_discard_partial_list()
 
+    def keep_or_discard_partial_list(self):
+        if not len(self.store):
+            return
+        reply = QMessageBox.question(self, "Carga interrumpida",
+                                     f"Se han cargado {len(self.store)} canales antes de detener la carga.\n"
+                                     "¿Quieres conservarlos?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        if reply == QMessageBox.Yes:
+            if self.load_pipeline.header:
+                self.store.header = self.load_pipeline.header
+            self.statusBar().showMessage(f"Carga cancelada: se conservan {len(self.store)} canales.", 10000)
+        else:
+            self.reset_loaded_list()
+            self.statusBar().showMessage("Carga cancelada.", 10000)
+        self.schedule_publish()
 
     def append_lines_to_text_edit(self, text_edit, lines):
         cursor = text_edit.textCursor()
@@ -390,23 +786,144 @@ class M3UOrganizer(QMainWindow):
         cursor.insertText(text, fmt)
         cursor.setCharFormat(QTextCharFormat())  # Resetear el formato
         
-    def on_lines_loaded(self, line):
-        # Acumula las líneas cargadas
-        self.loaded_lines.append(line)
-        # Muestra las líneas en grupos (por ejemplo, de 10,000) para evitar recargar la UI
-        if len(self.loaded_lines) >= 10000:
-            self.append_lines_to_text_edit(self.text_left, self.loaded_lines)
-            self.loaded_lines.clear()
-
     def save_m3u(self):
+        """
+        Guarda la lista del panel derecho escribiendo directamente las líneas de los canales referenciados.
+        """
+        if not self.right_model.rows:
+            QMessageBox.warning(self, "Advertencia", "El panel derecho está vacío. Arrastra o envía canales a él antes de guardar.")
+            return
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getSaveFileName(self, "Guardar M3U", "", "M3U Files (*.m3u);;All Files (*)", options=options)
         if file_path:
-            content = self.text_right.toPlainText()
-            with open(file_path, 'w') as file:
-                # Añadir #EXTM3U al principio del archivo
-                file.write("#EXTM3U\n")
-                file.write(content)
+            export_to_file(self.right_model.rows, file_path, "m3u", self.store.header)
+
+    def export_refs(self):
+        """
+        Devuelve los canales que se exportan como referencias (almacén, id): los del panel derecho si tiene
+        alguno y, si no, los mostrados en el panel izquierdo. Se copian para que la exportación en segundo
+        plano no se vea afectada por cambios posteriores en los paneles.
+        """
+        if self.right_model.rows:
+            return list(self.right_model.rows)
+        return list(zip(itertools.repeat(self.store), self.view_ids))
+
+    def start_export(self, task):
+        self.export_thread = ExportThread(task)
+        self.threads.append(self.export_thread)
+        self.export_thread.done.connect(lambda message: self.statusBar().showMessage(message, 10000))
+        self.export_thread.error.connect(lambda message: QMessageBox.critical(self, "Error", f"No se pudo exportar la lista: {message}"))
+        self.export_thread.finished.connect(lambda thread=self.export_thread: self.threads.remove(thread) if thread in self.threads else None)
+        self.statusBar().showMessage("Exportando...")
+        self.export_thread.start()
+
+    def export_list(self):
+        refs = self.export_refs()
+        if not refs:
+            QMessageBox.warning(self, "Advertencia", "No hay canales para exportar.")
+            return
+        filters = {"JSON Lines (*.jsonl)": "jsonl", "CSV (*.csv)": "csv", "XSPF (*.xspf)": "xspf", "M3U Files (*.m3u)": "m3u"}
+        options = QFileDialog.Options()
+        file_path, selected_filter = QFileDialog.getSaveFileName(self, "Exportar lista", "", ";;".join(filters), options=options)
+        if not file_path:
+            return
+        fmt = filters.get(selected_filter, "jsonl")
+        if not os.path.splitext(file_path)[1]:
+            file_path += EXTENSIONS[fmt]
+        header = self.store.header
+        self.start_export(lambda: f"Exportados {export_to_file(refs, file_path, fmt, header)} canales a {file_path}")
+
+    def export_split_by_group(self):
+        refs = self.export_refs()
+        if not refs:
+            QMessageBox.warning(self, "Advertencia", "No hay canales para exportar.")
+            return
+        fmt, ok = QInputDialog.getItem(self, "Exportar dividido por group-title", "Formato de los archivos:", list(EXTENSIONS), 0, False)
+        if not ok:
+            return
+        directory = QFileDialog.getExistingDirectory(self, "Carpeta de destino")
+        if not directory:
+            return
+
+        header = self.store.header
+
+        def task():
+            counts = split_by_group(refs, directory, fmt, header=header)
+            return f"Exportados {sum(counts.values())} canales en {len(counts)} archivos a {directory}"
+
+        self.start_export(task)
+
+    def channels_in_blocks(self, first_block, last_block):
+        """
+        Devuelve (almacén, ids) de los canales a los que pertenecen los bloques indicados del panel izquierdo,
+        sin repetir y en orden. El coste depende del tamaño de la selección, no del de la lista.
+        """
+        start = max(first_block - 1, 0)
+        ids = []
+        for channel_id in self.left_line_ids[start:max(last_block, 0)]:
+            if channel_id is not None and (not ids or ids[-1] != channel_id):
+                ids.append(channel_id)
+        return self.store, ids
+
+    def send_selection_to_right_panel(self):
+        store, ids = self.text_left.selected_channels()
+        if not ids:
+            QMessageBox.information(self, "Información", "Selecciona en el panel izquierdo los canales que quieres enviar.")
+            return
+        self.right_model.append_ids(store, ids)
+
+    def paste_into_right_panel(self, mime):
+        """
+        Añade al final del panel derecho los canales del portapapeles: referencias si vienen de otro panel
+        o, si es texto M3U, los canales que contiene.
+        """
+        if mime is not None:
+            self.right_model.insert_refs(self.right_model.rowCount(), self.right_model.refs_from_mime(mime))
+
+    def move_right_panel_rows(self, rows, destination):
+        self.right_model.move_rows(rows, destination)
+        self.right_panel.select_rows(max(destination - sum(1 for row in rows if row < destination), 0), len(rows))
+
+    def edit_right_panel_row(self, row, extinf):
+        """
+        Cambia la línea EXTINF de un canal del panel derecho. El canal se copia antes al almacén propio del
+        panel para que la edición no modifique la lista cargada en el panel izquierdo.
+        """
+        old_ref = store, channel_id = self.right_model.rows[row]
+        old_extinf = store.extinf[channel_id]
+        if store is not self.right_store:
+            channel_id = self.right_store.append(store.extinf[channel_id], store.url[channel_id], store.extra[channel_id])
+            store = self.right_store
+        new_ref = (store, channel_id)
+        self.set_right_panel_channel(row, new_ref, extinf)
+        self.history.push(Operation("Editar canal", self, ("set_right_panel_channel", (row, old_ref, old_extinf)),
+                                    ("set_right_panel_channel", (row, new_ref, extinf))))
+
+    def set_right_panel_channel(self, row, ref, extinf):
+        store, channel_id = ref
+        if store.extinf[channel_id] != extinf:
+            store.set_extinf(channel_id, extinf)
+        self.right_model.set_row(row, ref)
+
+    def update_right_panel_title(self, *args):
+        self.right_title.setText(f"Lista nueva: {self.right_model.rowCount()} canales")
+
+    def undo(self):
+        description = self.history.undo()
+        if description:
+            self.statusBar().showMessage(f"Deshecho: {description}", 5000)
+
+    def redo(self):
+        description = self.history.redo()
+        if description:
+            self.statusBar().showMessage(f"Rehecho: {description}", 5000)
+
+    def update_undo_actions(self):
+        undo_text, redo_text = self.history.undo_text(), self.history.redo_text()
+        self.undo_action.setEnabled(bool(undo_text))
+        self.undo_action.setText(f"Deshacer: {undo_text}" if undo_text else "Deshacer")
+        self.redo_action.setEnabled(bool(redo_text))
+        self.redo_action.setText(f"Rehacer: {redo_text}" if redo_text else "Rehacer")
 
     def search_group_title(self):
         search_term, ok = QInputDialog.getText(self, 'Buscar', 'Escribe el contenido de group-title a buscar:')
@@ -438,14 +955,162 @@ class M3UOrganizer(QMainWindow):
             if self.temp_file_path and os.path.exists(self.temp_file_path):
                 os.remove(self.temp_file_path)
                 self.temp_file_path = None
-            if self.media_player is not None:
-                self.media_player.stop()
+            # Guardar la sesión de trabajo para recuperarla al volver a abrir el programa
+            self.session_timer.stop()
+            self.save_session()
+            # Detener la carga de la lista en curso
+            if self.load_pipeline is not None:
+                self.load_pipeline.cancel()
+            # Detener la descarga en curso; lo descargado se conserva para reanudarla
+            if self.download_thread is not None and self.download_thread.isRunning():
+                self.download_thread.cancel()
+                self.download_thread.wait()
+            if self.video_dialog is not None:
+                self.video_dialog.close()
+                self.video_dialog.release_player()
+            # Detener las capturas de miniaturas y liberar sus reproductores
+            if self.thumbnail_loader is not None:
+                self.thumbnail_loader.shutdown()
+            if self.player_pool is not None:
+                self.player_pool.shutdown()
+            # Cancelar el análisis de canales y guardar su caché y el historial de disponibilidad
+            self.probe_manager.shutdown()
+            self.uptime.flush()
+            # Detener las descargas de logos pendientes
+            self.logo_loader.shutdown()
+            # Detener las actualizaciones programadas de las listas guardadas
+            self.refresh_scheduler.shutdown()
+            # Detener el servidor de listas
+            self.playlist_server.stop()
+            # Cerrar la sesión HTTP compartida y su pool de conexiones
+            network.close()
             # Cerrar todos los hilos y procesos en ejecución
             self.close_all_threads_and_processes()
             event.accept()
         else:
             event.ignore()
 
+    def session_header(self):
+        source = {"path": self.current_file_path, "url": self.source_url, "encoding": self.file_encoding,
+                  "watch": self.watch_action.isChecked()}
+        if self.current_file_path and os.path.exists(self.current_file_path):
+            stat = os.stat(self.current_file_path)
+            source.update(size=stat.st_size, mtime=stat.st_mtime)
+        return {
+            "source": source,
+            "filter": self.filter_input.text(),
+            "quality": self.quality_selector.currentIndex(),
+            "sort": self.sort_selector.currentIndex(),
+            "channels": len(self.store),
+            "right_rows": self.right_model.rowCount(),
+        }
+
+    def current_session_signature(self):
+        return (self.store.key, self.store.version, self.right_store.version, self.right_model.version,
+                self.history.version, self.view_descriptor, self.current_file_path, self.source_url,
+                self.filter_input.text(), self.quality_selector.currentIndex(), self.sort_selector.currentIndex(),
+                self.watch_action.isChecked())
+
+    def capture_session(self):
+        """
+        Copia la sesión actual para guardarla, o devuelve None si no ha cambiado desde la última vez o si
+        ahora no se debe guardar (lista a medio cargar o sesión anterior aún sin recuperar).
+        """
+        if self.is_loading() or (self.session_load_thread is not None and self.session_load_thread.isRunning()):
+            return None
+        signature = self.current_session_signature()
+        if signature == self.session_signature:
+            return None
+        snapshot = capture_session(self.session_header(), self.store, self.right_store, self.right_model.rows,
+                                   self.view_descriptor, self.view_ids, self.history.to_state())
+        return signature, snapshot
+
+    def save_session_in_background(self):
+        if self.session_save_thread is not None and self.session_save_thread.isRunning():
+            return
+        captured = self.capture_session()
+        if captured is None:
+            return
+        signature, snapshot = captured
+        self.session_save_thread = ExportThread(lambda: write_session(snapshot))
+        self.threads.append(self.session_save_thread)
+        self.session_save_thread.done.connect(lambda path, signature=signature: setattr(self, "session_signature", signature))
+        self.session_save_thread.error.connect(lambda message: logging.warning(f"No se pudo guardar la sesión: {message}"))
+        self.session_save_thread.finished.connect(lambda thread=self.session_save_thread: self.threads.remove(thread) if thread in self.threads else None)
+        self.session_save_thread.start()
+
+    def save_session(self):
+        if self.session_save_thread is not None:
+            self.session_save_thread.wait()
+        captured = self.capture_session()
+        if captured is None:
+            return
+        signature, snapshot = captured
+        try:
+            write_session(snapshot)
+            self.session_signature = signature
+        except OSError as e:
+            logging.warning(f"No se pudo guardar la sesión: {e}")
+
+    def restore_session(self):
+        """
+        Recupera la sesión anterior: el filtro, la ordenación y el origen de la lista se muestran enseguida y
+        los canales, el panel derecho y el historial se leen en segundo plano.
+        """
+        header = read_session_header(SESSION_PATH)
+        if header is None or not (header["channels"] or header["right_rows"]):
+            return
+        self.filter_input.setText(header["filter"])
+        self.quality_selector.setCurrentIndex(header["quality"])
+        self.sort_selector.setCurrentIndex(header["sort"])
+        source = header["source"]
+        origin = source["path"] or source["url"]
+        self.statusBar().showMessage(f"Recuperando la sesión anterior ({header['channels']} canales"
+                                     + (f" de {origin}" if origin else "") + ")...")
+        self.session_load_thread = SessionLoadThread(SESSION_PATH)
+        self.threads.append(self.session_load_thread)
+        self.session_load_thread.loaded.connect(self.on_session_loaded)
+        self.session_load_thread.error.connect(lambda message: self.statusBar().showMessage(f"No se pudo recuperar la sesión anterior: {message}", 10000))
+        self.session_load_thread.finished.connect(lambda thread=self.session_load_thread: self.threads.remove(thread) if thread in self.threads else None)
+        self.session_load_thread.start()
+
+    def on_session_loaded(self, session):
+        if session is None:
+            self.statusBar().clearMessage()
+            return
+        if len(self.store) or self.right_model.rowCount() or self.is_loading():
+            # Mientras se recuperaba, el usuario ya ha abierto otra lista
+            self.statusBar().showMessage("Se ha descartado la sesión anterior porque ya hay una lista abierta.", 10000)
+            return
+        header = session["header"]
+        store, self.right_store = session["stores"][0], session["stores"][1]
+        self.right_model.text_store = self.right_store
+        self.store = store
+        self.parser = M3UParser(store)
+        self.group_stats = GroupStats(store)
+        self.group_tree.set_stats(self.group_stats)
+        # Se muestran los mismos canales que al guardar, aunque al evaluar de nuevo la vista pudieran cambiar
+        self.show_channels(session["view_ids"], session["view"])
+        self.right_model.set_rows(session["rows"])
+        self.history.from_state(session["history"])
+
+        # Solo se vuelve a vigilar el archivo si no ha cambiado desde que se guardó la sesión
+        source = header["source"]
+        self.source_url = source["url"]
+        self.file_encoding = source["encoding"]
+        message = f"Sesión anterior recuperada: {len(store)} canales."
+        path = source["path"]
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            if (stat.st_size, stat.st_mtime) == (source.get("size"), source.get("mtime")):
+                self.current_file_path = path
+                self.watch_action.setChecked(source["watch"])
+            else:
+                message += f" El archivo {path} ha cambiado desde entonces: vuelve a abrirlo para ver los cambios."
+        self.session_signature = self.current_session_signature()
+        self.schedule_publish()
+        self.statusBar().showMessage(message, 10000)
+
     def close_all_threads_and_processes(self):
         # Aquí deberías cerrar todos los hilos y procesos que estén en ejecución
         for thread in self.threads:
@@ -456,74 +1121,683 @@ class M3UOrganizer(QMainWindow):
 
     def filter_list(self):
         """
-        Filtra la lista M3U en función del texto ingresado en la entrada de filtro.
-        Cada canal está compuesto por un par de líneas (EXTINF y URL).
+        Filtra la lista M3U con la consulta escrita en la entrada de filtro (ver `query.py`), por ejemplo
+        `group:"Deportes" AND NOT host:example.com AND name~/hd$/i AND status:alive`. Un texto sin campos
+        se busca en la línea EXTINF y en la URL de cada canal.
         """
-        filter_term = self.filter_input.text().strip()
-        if not filter_term:
+        query_text = self.current_query_text()
+        if not query_text:
             QMessageBox.warning(self, "Entrada Vacía", "Por favor, ingrese un término para filtrar.")
             return
 
-        filtered_lines = []
-        # Iterar en pasos de 2 para considerar cada canal (EXTINF + URL) como un bloque
-        for i in range(0, len(self.original_lines), 2):
-            extinf_line = self.original_lines[i]
-            url_line = self.original_lines[i + 1] if i + 1 < len(self.original_lines) else ""
-            
-            # Verificar si el término de filtro aparece en alguna de las dos líneas
-            if filter_term.lower() in extinf_line.lower() or filter_term.lower() in url_line.lower():
-                filtered_lines.append(extinf_line)
-                filtered_lines.append(url_line)
-
-        if filtered_lines:
-            self.text_left.clear()
-            self.append_lines_to_text_edit(self.text_left, filtered_lines)
+        try:
+            query = compile_query(query_text)
+        except QueryError as e:
+            QMessageBox.warning(self, "Filtro no válido", str(e))
+            return
+
+        filtered_ids = query.evaluate(self.store)
+        if filtered_ids:
+            self.set_view(filtered_ids, ("query", query_text), "Filtrar")
         else:
             QMessageBox.information(self, "Sin Resultados", "No se encontraron coincidencias con el criterio de filtrado.")
 
+    def current_query_text(self):
+        """
+        Devuelve la consulta formada por el texto del filtro y la calidad seleccionada ('' si no hay filtro).
+        """
+        filter_term = self.filter_input.text().strip()
+        min_height = self.selected_min_height()
+        if not min_height:
+            return filter_term
+        return f"({filter_term}) AND res>={min_height}" if filter_term else f"res>={min_height}"
+
+    def show_channels(self, ids, descriptor=None):
+        """
+        Muestra en el panel izquierdo los canales indicados, en ese orden. `descriptor` indica cómo se ha
+        obtenido la vista (ver `show_view`); si no se indica, se guardan los ids.
+        """
+        self.view_ids = list(ids)
+        self.showing_all = self.view_ids == list(range(len(self.store)))
+        if descriptor is None:
+            descriptor = ("all",) if self.showing_all else ("ids", encode_ids(self.view_ids))
+        self.view_descriptor = descriptor
+        self._pending_lines = 0
+        lines = []
+        self.left_line_ids = []
+        for channel_id in self.view_ids:
+            record_lines = self.store.record_lines(channel_id)
+            lines.extend(record_lines)
+            self.left_line_ids.extend([channel_id] * len(record_lines))
+        self.text_left.clear()
+        self.append_lines_to_text_edit(self.text_left, lines)
+        self.group_stats.set_view(self.view_ids)
+        self.group_tree.schedule_refresh()
+
+    def show_group(self, group):
+        """
+        Muestra los canales de un group-title usando el índice por grupo del almacén.
+        """
+        self.set_view(self.group_ids(group), ("group", group), f"Mostrar el grupo {group}")
+
+    def group_ids(self, group):
+        return [channel_id for channel_id in self.store.group_index().get(group.lower(), [])
+                if self.store.group[channel_id] == group]
+
+    def set_view(self, ids, descriptor, description):
+        """
+        Muestra una vista nueva en el panel izquierdo y la registra en el historial. Se guarda solo cómo
+        se obtuvo la vista (p. ej. la consulta del filtro), no sus ids, así que el paso apenas ocupa memoria.
+        """
+        previous = self.view_descriptor
+        self.show_channels(ids, descriptor)
+        current = self.view_descriptor
+        self.history.push(Operation(description, self, ("show_view", (previous,)), ("show_view", (current,))))
+
+    def view_ids_for(self, descriptor):
+        """
+        Vuelve a obtener los ids de una vista a partir de su descripción.
+        """
+        kind = descriptor[0]
+        if kind == "query":
+            return compile_query(descriptor[1]).evaluate(self.store)
+        if kind == "group":
+            return self.group_ids(descriptor[1])
+        if kind == "sort":
+            return self.sorted_ids(self.view_ids_for(descriptor[2]), descriptor[1])
+        if kind == "ids":
+            return decode_ids(descriptor[1])
+        return range(len(self.store))
+
+    def show_view(self, descriptor):
+        self.show_channels(self.view_ids_for(descriptor), descriptor)
+
+    def channel_at_block(self, block_number):
+        """
+        Devuelve el id del canal al que pertenece un bloque (línea) del panel izquierdo, o None.
+        El primer bloque del panel está siempre vacío, por eso la línea n está en el bloque n + 1.
+        """
+        index = block_number - 1
+        if 0 <= index < len(self.left_line_ids):
+            return self.left_line_ids[index]
+        return None
+
+    def on_left_lines_changed(self):
+        """
+        Vuelve a mostrar la vista actual si una acción del usuario ha añadido o quitado líneas del panel
+        izquierdo, para que cada línea siga correspondiendo a su canal.
+        """
+        if self.is_loading():
+            return
+        self.show_channels(self.view_ids, self.view_descriptor)
+        self.statusBar().showMessage("En el panel izquierdo no se pueden añadir ni quitar líneas: se ha restaurado la vista", 5000)
+
+    def on_left_line_edited(self, block_number, old_text, new_text):
+        """
+        Lleva al almacén la edición de una línea del panel izquierdo y actualiza los recuentos del grupo.
+        """
+        channel_id = self.channel_at_block(block_number)
+        if channel_id is None or old_text == new_text:
+            return
+        old_text, new_text = old_text.strip(), new_text.strip()
+        if self.store.extinf[channel_id] == old_text:
+            field = "extinf"
+        elif self.store.url[channel_id] == old_text:
+            field = "url"
+        else:
+            return
+        # Al cambiar la URL se pierde el resultado del análisis: se guarda para poder deshacerlo
+        status, height = self.store.status[channel_id], self.store.height[channel_id]
+        self.update_channel_field(channel_id, field, new_text)
+        self.history.push(Operation("Editar línea", self,
+                                    ("apply_channel_edit", (channel_id, field, new_text, old_text, status, height)),
+                                    ("apply_channel_edit", (channel_id, field, old_text, new_text))))
+
+    def update_channel_field(self, channel_id, field, value, status=None, height=None):
+        if field == "extinf":
+            self.store.set_extinf(channel_id, value)
+        else:
+            self.store.set_url(channel_id, value)
+            if status is not None:
+                self.store.status[channel_id] = status
+                self.store.height[channel_id] = height
+        self.group_stats.refresh(channel_id)
+        self.group_tree.schedule_refresh()
+        self.schedule_publish()
+
+    def apply_channel_edit(self, channel_id, field, current, value, status=None, height=None):
+        """
+        Cambia una línea de un canal (al deshacer o rehacer una edición) en el almacén y en el panel izquierdo.
+        """
+        self.update_channel_field(channel_id, field, value, status, height)
+        try:
+            index = self.left_line_ids.index(channel_id)
+        except ValueError:
+            return  # El canal no está en la vista actual
+        document = self.text_left.document()
+        while index < len(self.left_line_ids) and self.left_line_ids[index] == channel_id:
+            block = document.findBlockByNumber(index + 1)
+            if block.text().strip() == current:
+                cursor = QTextCursor(block)
+                cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+                cursor.insertText(value)
+                return
+            index += 1
 
-    def extract_group_title(self, line):
-        match = re.search(r'group-title="([^"]*)"', line)
-        if match:
-            return match.group(1).strip().lower()
-        return ''  # Devuelve una cadena vacía si no se encuentra el group-title
-    
     def sort_list(self):
         """
-        Ordena la lista M3U basada en la opción seleccionada en el combo box.
-        Cada canal está compuesto por un par de líneas (EXTINF y URL).
+        Ordena los canales mostrados en el panel izquierdo según la opción seleccionada en el combo box.
         """
         sort_criteria = self.sort_selector.currentText()
+        self.set_view(self.sorted_ids(self.view_ids, sort_criteria), ("sort", sort_criteria, self.view_descriptor),
+                      f"Ordenar por {sort_criteria}")
 
-        # Crear pares de líneas para cada canal
-        channel_pairs = [(self.original_lines[i], self.original_lines[i + 1])
-                        for i in range(0, len(self.original_lines), 2)]
-
+    def sorted_ids(self, ids, sort_criteria):
+        store = self.store
         if sort_criteria == 'Nombre del Canal (A-Z)':
-            sorted_pairs = sorted(channel_pairs, key=lambda pair: pair[0])
+            return sorted(ids, key=lambda i: store.name[i].lower())
         elif sort_criteria == 'Nombre del Canal (Z-A)':
-            sorted_pairs = sorted(channel_pairs, key=lambda pair: pair[0], reverse=True)
+            return sorted(ids, key=lambda i: store.name[i].lower(), reverse=True)
         elif sort_criteria == 'Group-title (A-Z)':
-            sorted_pairs = sorted(channel_pairs, key=lambda pair: self.extract_group_title(pair[0]))
+            return sorted(ids, key=lambda i: store.group[i].lower())
         elif sort_criteria == 'Group-title (Z-A)':
-            sorted_pairs = sorted(channel_pairs, key=lambda pair: self.extract_group_title(pair[0]), reverse=True)
+            return sorted(ids, key=lambda i: store.group[i].lower(), reverse=True)
+        elif sort_criteria == 'Resolución (mayor a menor)':
+            return sorted(ids, key=store.height.__getitem__, reverse=True)
+        elif sort_criteria in UPTIME_SORT_CRITERIA:
+            key = self.uptime.ranking_key(UPTIME_SORT_CRITERIA[sort_criteria])
+            return sorted(ids, key=lambda i: key(store.url[i]))
+        return list(ids)
 
-        # Descomprimir los pares en una lista simple de líneas ordenadas
-        sorted_lines = [line for pair in sorted_pairs for line in pair]
+    def reset_list(self):
+        """
+        Restaura la lista original cargada antes de aplicar filtros u ordenaciones. Se puede deshacer.
+        """
+        self.set_view(range(len(self.store)), ("all",), "Restablecer")
 
-        self.text_left.clear()
-        self.append_lines_to_text_edit(self.text_left, sorted_lines)
+        self.filter_input.clear()
+        self.quality_selector.setCurrentIndex(0)
+        self.sort_selector.setCurrentIndex(0)
 
-    def reset_list(self):
+    def selected_min_height(self):
         """
-        Restaura la lista original cargada antes de aplicar filtros u ordenaciones.
+        Devuelve la altura mínima (en píxeles) de la calidad seleccionada, o 0 si se aceptan todas.
         """
-        self.text_left.clear()
-        # Filtrar la línea que contiene #EXTM3U antes de mostrar el contenido
-        filtered_lines = [line for line in self.original_content if not line.startswith("#EXTM3U")]
+        label = self.quality_selector.currentText().replace(" o superior", "")
+        return QUALITY_MIN_HEIGHT.get(label, 0)
 
-        # Mostrar el contenido filtrado en el cuadro de texto izquierdo
-        self.append_lines_to_text_edit(self.text_left, filtered_lines)
+    def probe_channels(self, force=False):
+        """
+        Lanza en segundo plano el análisis de resolución, códecs y bitrate de las URLs cargadas. Con `force`
+        se analizan todas de nuevo, para registrar su disponibilidad actual.
+        """
+        urls = [url for url in self.store.url if url.startswith(("http://", "https://"))]
+        if not urls:
+            QMessageBox.warning(self, "Advertencia", "No hay ninguna lista cargada para analizar.")
+            return
+        self.statusBar().showMessage(f"Analizando {len(urls)} canales...")
+        self.probe_manager.start(urls, force=force)
+
+    def on_probe_result(self, url, info):
+        self.probe_results[url] = info
+        self.uptime.record(url, info)
+        self.store.set_probe_result(url, info.get("estado", ""), height_key(info))
+        for channel_id in self.store.ids_for_url(url):
+            self.group_stats.refresh(channel_id)
+        self.group_tree.schedule_refresh()
+        self.schedule_publish()
+
+    def on_probe_progress(self, done, total):
+        self.statusBar().showMessage(f"Analizando canales: {done}/{total}")
+
+    def show_channel_info(self):
+        """
+        Muestra en la barra de estado la resolución, códecs y bitrate del canal bajo el cursor.
+        """
+        block = self.text_left.textCursor().block()
+        text = block.text().strip()
+        if text.startswith("#EXTINF:"):
+            extinf, text = text, block.next().text().strip()
+        else:
+            extinf = block.previous().text().strip()
+        parts = [describe(self.probe_results.get(text))]
+        stats = self.uptime.channel_stats(text, UPTIME_WINDOWS[0])
+        if stats is not None:
+            parts.append(f"Últimos {UPTIME_WINDOWS[0]} días: {stats.describe()}")
+        if self.epg_index is not None:
+            current, following = self.epg_index.now_next(extract_tvg_id(extinf))
+            if current:
+                parts.append(f"Ahora: {self.format_programme(current)}")
+            if following:
+                parts.append(f"Después: {self.format_programme(following)}")
+        message = "  |  ".join(part for part in parts if part)
+        if message:
+            self.statusBar().showMessage(message)
+
+    def toggle_file_watch(self, checked):
+        if not checked:
+            self.file_watcher.stop()
+        elif self.current_file_path and not self.is_loading():
+            self.file_watcher.watch(self.current_file_path, self.file_encoding)
+
+    def is_loading(self):
+        return self.load_pipeline is not None and self.load_pipeline.is_running()
+
+    def on_watched_lines_appended(self, lines):
+        """
+        Añade a la lista las líneas que se han escrito al final del archivo vigilado, sin releerlo.
+        """
+        first_new = len(self.store)
+        for line in lines:
+            if self.showing_all:
+                self.append_line_to_original(line)  # Se muestran también en el panel izquierdo
+            else:
+                channel_id = self.parser.feed(line)
+                if channel_id is not None:
+                    self.group_stats.add(channel_id)
+        self.group_tree.schedule_refresh()
+        self.schedule_publish()
+        if len(self.store) > first_new:
+            self.statusBar().showMessage(f"{len(self.store) - first_new} canales nuevos añadidos desde el archivo", 5000)
+
+    def on_watched_file_rewritten(self, path):
+        """
+        El archivo vigilado ha cambiado en medio: se relee en segundo plano y se aplican solo las diferencias.
+        """
+        if self.is_loading() or (self.reload_thread is not None and self.reload_thread.isRunning()):
+            self.reload_pending = True
+            return
+        self.reload_pending = False
+        self.file_watcher.sync()  # Lo que cambie a partir de ahora se detectará de nuevo al terminar
+        self.reload_thread = DiffThread(self.store, path, keep_unchanged=True)
+        self.threads.append(self.reload_thread)
+        self.reload_thread.loaded.connect(self.apply_reloaded_list)
+        self.reload_thread.error.connect(lambda message: self.statusBar().showMessage(f"No se pudo releer la lista: {message}", 5000))
+        self.reload_thread.finished.connect(self.on_reload_finished)
+        self.statusBar().showMessage("El archivo ha cambiado, releyendo la lista...")
+        self.reload_thread.start()
+
+    def on_reload_finished(self):
+        if self.sender() in self.threads:
+            self.threads.remove(self.sender())
+        if self.reload_pending:
+            self.file_watcher.check()
+
+    def apply_reloaded_list(self, diff):
+        """
+        Sustituye el almacén por la lista releída trasladando a ella las vistas (panel izquierdo, panel
+        derecho y resultados del análisis) y modificando en el panel izquierdo solo los canales que han cambiado.
+        """
+        old, new = diff.old, diff.new
+        if old is not self.store:
+            return
+        mapping = diff.id_map()
+        for old_id, new_id in mapping.items():
+            if old.url[old_id] == new.url[new_id]:
+                new.status[new_id] = old.status[old_id]
+                new.height[new_id] = old.height[old_id]
+
+        showing_all = self.showing_all
+        # Las líneas pasan a referirse a los ids de la lista nueva (None para los canales eliminados), también
+        # cuando solo ha cambiado el orden de los canales
+        line_ids = self.left_line_ids
+        self.left_line_ids = [None if channel_id is None else mapping.get(channel_id) for channel_id in line_ids]
+        if diff.change_count():
+            self.patch_left_panel(diff, line_ids)
+        self.view_ids = [mapping[channel_id] for channel_id in self.view_ids if channel_id in mapping]
+        if showing_all:
+            # Los canales añadidos se muestran al final, como si se hubieran leído del archivo
+            self.view_ids.extend(diff.added)
+            self.append_lines_to_text_edit(self.text_left, list(new.iter_lines(diff.added)))
+            self.left_line_ids.extend(channel_id for channel_id in diff.added for _ in new.record_lines(channel_id))
+        self.showing_all = showing_all and self.view_ids == list(range(len(new)))
+
+        self.store = new
+        self.parser = self.reload_thread.parser
+        self.right_model.remap_store(old, new, mapping)
+        self.group_stats = GroupStats(new)
+        self.group_stats.set_view(self.view_ids)
+        self.group_tree.set_stats(self.group_stats)
+        if self.view_descriptor[0] == "ids":
+            self.view_descriptor = ("all",) if self.showing_all else ("ids", encode_ids(self.view_ids))
+        # Los pasos del historial se refieren a los ids de la lista anterior
+        self.history.clear()
+        self.schedule_publish()
+        self.statusBar().showMessage(f"Lista actualizada desde el archivo: {diff.summary()}", 10000)
+
+    def patch_left_panel(self, diff, old_line_ids):
+        """
+        Modifica en el panel izquierdo solo las líneas de los canales cambiados o eliminados, de abajo
+        arriba para que los números de bloque pendientes sigan siendo válidos. `old_line_ids` son los ids
+        de cada línea en la lista anterior.
+        """
+        changed = {old_id: new_id for old_id, new_id in diff.url_changed + diff.attributes_changed}
+        removed = set(diff.removed)
+
+        # Tramos consecutivos de líneas de cada canal afectado: (primera línea, última línea, id antiguo)
+        runs = []
+        for index, channel_id in enumerate(old_line_ids):
+            if channel_id in changed or channel_id in removed:
+                if runs and runs[-1][2] == channel_id and runs[-1][1] == index - 1:
+                    runs[-1][1] = index
+                else:
+                    runs.append([index, index, channel_id])
+
+        document = self.text_left.document()
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        for first, last, old_id in reversed(runs):
+            first_block = document.findBlockByNumber(first + 1)
+            last_block = document.findBlockByNumber(last + 1)
+            if old_id in removed:
+                # Borrar las líneas junto con el salto de línea que las precede
+                cursor.setPosition(first_block.position() - 1)
+                cursor.setPosition(last_block.position() + last_block.length() - 1, QTextCursor.KeepAnchor)
+                cursor.removeSelectedText()
+                new_lines = []
+            else:
+                cursor.setPosition(first_block.position())
+                cursor.setPosition(last_block.position() + last_block.length() - 1, QTextCursor.KeepAnchor)
+                cursor.removeSelectedText()
+                new_lines = diff.new.record_lines(changed[old_id])
+                for i, line in enumerate(new_lines):
+                    if i:
+                        cursor.insertBlock()
+                    fmt = QTextCharFormat()
+                    fmt.setForeground(QBrush(QColor('black' if line.startswith(("#EXTINF:", "http")) else 'red')))
+                    cursor.insertText(line, fmt)
+            new_id = changed.get(old_id)
+            self.left_line_ids[first:last + 1] = [new_id] * len(new_lines)
+        cursor.endEditBlock()
+
+    def compare_with_file(self):
+        options = QFileDialog.Options()
+        file_path, _ = QFileDialog.getOpenFileName(self, "Comparar con otra lista", "", M3U_FILE_FILTER, options=options)
+        if file_path:
+            self.start_diff(file_path)
 
-        self.filter_input.clear()
-        self.sort_selector.setCurrentIndex(0)
\ No newline at end of file
+    def compare_with_url(self):
+        url, ok = QInputDialog.getText(self, 'Comparar con lista desde URL', 'Escribe la URL de la otra versión de la lista:')
+        if ok and url:
+            self.start_diff(url)
+
+    def start_diff(self, source):
+        """
+        Lee en segundo plano otra versión de la lista y la compara con la lista cargada.
+        """
+        if not len(self.store):
+            QMessageBox.warning(self, "Advertencia", "Primero carga la lista que quieres comparar.")
+            return
+
+        self.diff_thread = DiffThread(self.store, source)
+        self.threads.append(self.diff_thread)
+        self.diff_thread.loaded.connect(self.on_diff_finished)
+        self.diff_thread.error.connect(lambda message: QMessageBox.critical(self, "Error", f"No se pudo leer la lista: {message}"))
+        self.diff_thread.finished.connect(lambda thread=self.diff_thread: self.threads.remove(thread) if thread in self.threads else None)
+        self.statusBar().showMessage("Comparando listas...")
+        self.diff_thread.start()
+
+    def on_diff_finished(self, diff):
+        """
+        Muestra los cambios en los dos paneles: a la izquierda los canales de la lista cargada que han
+        cambiado o desaparecido, y a la derecha, en el mismo orden, su versión nueva y los canales añadidos.
+        """
+        self.statusBar().clearMessage()
+        if diff.old is not self.store:
+            return  # La lista cargada ha cambiado mientras se comparaba
+        self.last_diff = diff
+        self.export_diff_action.setEnabled(True)
+        if not diff.change_count():
+            QMessageBox.information(self, "Comparación", "Las dos listas son iguales.")
+            return
+
+        if self.right_model.rows:
+            reply = QMessageBox.question(self, "Comparación", "El panel derecho se sustituirá por los cambios. ¿Continuar?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+            if reply != QMessageBox.Yes:
+                return
+
+        changed = diff.url_changed + diff.attributes_changed
+        with self.history.macro("Comparar listas"):
+            self.set_view([old_id for old_id, _ in changed] + diff.removed, None, "Comparar listas")
+            self.right_model.clear()
+            self.right_model.append_ids(diff.new, [new_id for _, new_id in changed] + diff.added)
+        QMessageBox.information(self, "Comparación", f"Cambios encontrados: {diff.summary()}.")
+
+    def export_diff_report(self):
+        if self.last_diff is None:
+            return
+        options = QFileDialog.Options()
+        file_path, _ = QFileDialog.getSaveFileName(self, "Exportar informe de diferencias", "", "CSV Files (*.csv);;All Files (*)", options=options)
+        if file_path:
+            try:
+                write_report(self.last_diff, file_path)
+            except OSError as e:
+                QMessageBox.critical(self, "Error", f"No se pudo guardar el informe: {str(e)}")
+
+    def start_server(self):
+        port, ok = QInputDialog.getInt(self, 'Iniciar servidor HTTP', 'Puerto:', DEFAULT_PORT, 1, 65535)
+        if not ok:
+            return
+        try:
+            self.playlist_server.start(port)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"No se pudo iniciar el servidor en el puerto {port}: {str(e)}")
+            return
+        self.start_server_action.setEnabled(False)
+        self.stop_server_action.setEnabled(True)
+        self.publish_playlists()
+        self.show_server_addresses()
+
+    def stop_server(self):
+        self.playlist_server.stop()
+        self.start_server_action.setEnabled(True)
+        self.stop_server_action.setEnabled(False)
+        self.statusBar().showMessage("Servidor HTTP detenido", 5000)
+
+    def schedule_publish(self, *args):
+        if self.playlist_server.is_running():
+            self.publish_timer.start()
+
+    def publish_playlists(self):
+        """
+        Vuelve a generar las respuestas del servidor cuyos datos han cambiado desde la última publicación. Las
+        respuestas se preparan en un hilo sobre copias de los almacenes; aquí solo se decide qué rutas cambian.
+        """
+        if not self.playlist_server.is_running():
+            return
+        if self.publish_thread is not None:
+            self.publish_timer.start()  # Se vuelve a comprobar cuando termine la preparación en curso
+            return
+
+        jobs = {}
+        stores = {}
+        header = self.store.header  # Línea #EXTM3U de la lista cargada (con su url-tvg), también para el panel derecho
+        version = (self.right_model.version, self.store.key, self.store.version, self.right_store.version, header)
+        if self.published_versions.get(PLAYLIST_PATH) != version:
+            rows = list(self.right_model.rows)
+            jobs[PLAYLIST_PATH] = (version, rows, None)
+            stores.update((store.key, store) for store in {store for store, _ in rows})
+
+        views = load_views()
+        for path in set(self.playlist_server.paths()) - {PLAYLIST_PATH, *map(view_path, views)}:
+            self.playlist_server.unpublish(path)
+            self.published_versions.pop(path, None)
+        for name, query_text in views.items():
+            path = view_path(name)
+            version = (self.store.key, self.store.version, header, query_text)
+            if self.published_versions.get(path) != version:
+                jobs[path] = (version, self.store.key, query_text)
+                stores[self.store.key] = self.store
+        if not jobs:
+            return
+
+        # Copia de las columnas (referencias a las mismas cadenas): rápida, y el hilo no ve cambios a medias
+        copies = {key: ChannelStore.from_state(store.to_state()) for key, store in stores.items()}
+        self.publish_thread = PublishThread(self.playlist_server, jobs, copies, header)
+        self.threads.append(self.publish_thread)
+        self.publish_thread.prepared.connect(self.on_playlists_prepared)
+        self.publish_thread.finished.connect(self.on_publish_thread_finished)
+        self.publish_thread.start()
+
+    def on_playlists_prepared(self, resources, versions):
+        if self.playlist_server.is_running():
+            self.playlist_server.update(resources)
+            self.published_versions.update(versions)
+
+    def on_publish_thread_finished(self):
+        if self.publish_thread in self.threads:
+            self.threads.remove(self.publish_thread)
+        self.publish_thread = None
+
+    def save_filter_view(self):
+        query_text = self.current_query_text()
+        if not query_text:
+            QMessageBox.warning(self, "Advertencia", "Escribe primero un filtro para publicarlo como vista.")
+            return
+        try:
+            compile_query(query_text)
+        except QueryError as e:
+            QMessageBox.warning(self, "Filtro no válido", str(e))
+            return
+        name, ok = QInputDialog.getText(self, 'Publicar vista', f'Nombre de la vista para el filtro:\n{query_text}')
+        if not ok or not name.strip():
+            return
+        views = load_views()
+        views[name.strip()] = query_text
+        save_views(views)
+        self.schedule_publish()
+        QMessageBox.information(self, "Acción completada", f"Vista '{name.strip()}' publicada en {path_url(view_path(name.strip()))}")
+
+    def delete_filter_view(self):
+        views = load_views()
+        if not views:
+            QMessageBox.information(self, "Información", "No hay vistas publicadas.")
+            return
+        name, ok = QInputDialog.getItem(self, 'Eliminar vista publicada', 'Vista:', sorted(views), 0, False)
+        if ok and name:
+            del views[name]
+            save_views(views)
+            self.schedule_publish()
+
+    def show_server_addresses(self):
+        if not self.playlist_server.is_running():
+            QMessageBox.information(self, "Información", "El servidor HTTP no está iniciado.")
+            return
+        port = self.playlist_server.address()[1]
+        host = "localhost"
+        for address in QNetworkInterface.allAddresses():
+            if address.protocol() == QAbstractSocket.IPv4Protocol and not address.isLoopback():
+                host = address.toString()
+                break
+        paths = [PLAYLIST_PATH] + [view_path(name) for name in sorted(load_views())]
+        urls = "\n".join(f"http://{host}:{port}{path_url(path)}" for path in paths)
+        QMessageBox.information(self, "Servidor HTTP", f"Listas publicadas:\n{urls}")
+
+    def load_epg(self):
+        options = QFileDialog.Options()
+        file_path, _ = QFileDialog.getOpenFileName(self, "Cargar guía EPG", "", "XMLTV (*.xml *.xml.gz *.xml.xz *.gz *.xz *.zip);;All Files (*)", options=options)
+        if file_path:
+            self.start_loading_epg(file_path)
+
+    def load_epg_from_url(self):
+        url, ok = QInputDialog.getText(self, 'Cargar guía EPG desde URL', 'Escribe la URL de la guía XMLTV (.xml o .xml.gz):')
+        if ok and url:
+            self.start_loading_epg(url)
+
+    def start_loading_epg(self, source):
+        """
+        Lee en segundo plano la guía XMLTV conservando solo los canales de la lista cargada.
+        """
+        wanted_ids = set(self.store.tvg_id)
+        wanted_ids.discard('')
+        if not wanted_ids:
+            QMessageBox.warning(self, "Advertencia", "La lista cargada no tiene canales con tvg-id.")
+            return
+
+        self.epg_thread = EpgLoadThread(source, wanted_ids)
+        self.threads.append(self.epg_thread)
+        self.epg_thread.progress.connect(lambda count: self.statusBar().showMessage(f"Leyendo guía EPG: {count} programas procesados..."))
+        self.epg_thread.loaded.connect(self.on_epg_loaded)
+        self.epg_thread.error.connect(lambda message: QMessageBox.critical(self, "Error", f"No se pudo cargar la guía EPG: {message}"))
+        self.epg_thread.finished.connect(lambda thread=self.epg_thread: self.threads.remove(thread) if thread in self.threads else None)
+        self.statusBar().showMessage("Leyendo guía EPG...")
+        self.epg_thread.start()
+
+    def on_epg_loaded(self, index):
+        self.epg_index = index
+        self.statusBar().showMessage(f"Guía EPG cargada: {index.programme_count()} programas de {index.channel_count()} canales", 5000)
+
+    def format_programme(self, programme):
+        start, stop, title = programme
+        start_text = QDateTime.fromSecsSinceEpoch(int(start)).toString("HH:mm")
+        stop_text = QDateTime.fromSecsSinceEpoch(int(stop)).toString("HH:mm")
+        return f"{start_text}-{stop_text} {title}"
+
+    def show_uptime_dialog(self):
+        """
+        Muestra la disponibilidad, el TTFB medio y el bitrate medio de cada servidor (host) de la lista cargada
+        en los últimos días, del menos disponible al más disponible.
+        """
+        urls = self.store.url if len(self.store) else None  # Sin lista cargada: todos los analizados
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Disponibilidad por servidor")
+        layout = QVBoxLayout(dialog)
+        days_selector = QComboBox(dialog)
+        days_selector.addItems([f"Últimos {days} días" for days in UPTIME_WINDOWS])
+        layout.addWidget(days_selector)
+        table = QTableWidget(0, 6, dialog)
+        table.setHorizontalHeaderLabels(["Servidor", "Canales", "Análisis", "Disponibilidad", "TTFB medio", "Bitrate medio"])
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(table)
+
+        def fill(index):
+            hosts = self.uptime.host_stats(UPTIME_WINDOWS[index], urls)
+            rows = sorted(hosts.items(), key=lambda item: (item[1].availability, -item[1].probes))
+            table.setRowCount(len(rows))
+            for row, (host, stats) in enumerate(rows):
+                values = [
+                    host or "(sin host)", str(stats.channels), str(stats.probes), f"{stats.availability:.1%}",
+                    f"{stats.average_ttfb:.0f} ms" if stats.average_ttfb is not None else "",
+                    f"{stats.average_bitrate / 1000:.1f} Mb/s" if stats.average_bitrate is not None else "",
+                ]
+                for column, value in enumerate(values):
+                    table.setItem(row, column, QTableWidgetItem(value))
+
+        days_selector.currentIndexChanged.connect(fill)
+        fill(0)
+        if not table.rowCount():
+            QMessageBox.information(self, "Información", "Aún no hay datos de disponibilidad. Usa 'Editar > Comprobar disponibilidad de los canales'.")
+            return
+        dialog.resize(800, 500)
+        dialog.exec_()
+
+    def show_epg_dialog(self):
+        """
+        Muestra una tabla con el programa actual y el siguiente de cada canal de la lista.
+        """
+        if self.epg_index is None:
+            QMessageBox.information(self, "Información", "Primero carga una guía EPG desde el menú 'Guía'.")
+            return
+
+        rows = []
+        for channel_id in range(len(self.store)):
+            current, following = self.epg_index.now_next(self.store.tvg_id[channel_id])
+            if current or following:
+                rows.append((self.store.name[channel_id], current, following))
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Guía: ahora y a continuación")
+        layout = QVBoxLayout(dialog)
+        table = QTableWidget(len(rows), 3, dialog)
+        table.setHorizontalHeaderLabels(["Canal", "Ahora", "A continuación"])
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        for row, (name, current, following) in enumerate(rows):
+            table.setItem(row, 0, QTableWidgetItem(name))
+            table.setItem(row, 1, QTableWidgetItem(self.format_programme(current) if current else ""))
+            table.setItem(row, 2, QTableWidgetItem(self.format_programme(following) if following else ""))
+        layout.addWidget(table)
+        dialog.resize(800, 500)
+        dialog.exec_()
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""
+player.py - Pool de reproductores VLC reutilizables para M3U Organizer
+
+Crear un `vlc.MediaPlayer` nuevo para cada previsualización es costoso (se inicializan de nuevo las
+salidas de audio y vídeo) y, si se crea con `vlc.MediaPlayer()`, además ignora la instancia compartida
+de VLC de la aplicación. Este módulo mantiene un pequeño pool de reproductores ligados a esa instancia
+compartida, que se reutilizan entre previsualizaciones y al cambiar de canal.
+
+Clases:
+-------
+- PlayerPool: Pool de reproductores VLC creados a partir de una `vlc.Instance` compartida.
+
+    Methods:
+    - acquire(): Devuelve un reproductor libre del pool (o crea uno nuevo si no hay ninguno libre).
+    - release(player): Detiene el reproductor, le quita el medio y lo devuelve al pool.
+    - shutdown(): Detiene y libera todos los reproductores.
+"""
+
+import threading
+
+
+class PlayerPool:
+    def __init__(self, instance, max_idle=2):
+        self.instance = instance
+        self.max_idle = max_idle
+        self._idle = []
+        self._in_use = set()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            player = self._idle.pop() if self._idle else self.instance.media_player_new()
+            self._in_use.add(player)
+            return player
+
+    def release(self, player):
+        if player is None:
+            return
+        player.stop()
+        player.set_media(None)
+        with self._lock:
+            self._in_use.discard(player)
+            if len(self._idle) < self.max_idle:
+                self._idle.append(player)
+            else:
+                player.release()
+
+    def shutdown(self):
+        with self._lock:
+            players = self._idle + list(self._in_use)
+            self._idle.clear()
+            self._in_use.clear()
+        for player in players:
+            player.stop()
+            player.release()
@@ -0,0 +1,297 @@
+"""
+probe.py - Análisis en segundo plano de los streams (resolución, códecs y bitrate) para M3U Organizer
+
+Este módulo obtiene información técnica de cada URL de la lista para que el usuario sepa si un canal
+es SD, 720p, 1080p o 4K sin tener que abrirlo. Para cada URL se intenta, por este orden:
+
+1. Leer la cabecera del stream. Si es una lista maestra HLS (#EXT-X-STREAM-INF), se extraen
+   directamente RESOLUTION, BANDWIDTH y CODECS de la mejor variante, sin descargar vídeo.
+2. Si no es HLS (o la lista no indica resolución), se usa el análisis de medios de libvlc
+   (`parse_with_options`) para leer las pistas de vídeo y audio.
+
+Los resultados se guardan en una caché en disco (`cache/probe.json`) indexada por URL, de modo que las
+URLs ya analizadas no se vuelven a consultar mientras el resultado no caduque.
+
+Funciones:
+----------
+- probe_url(url, instance=None): Analiza una URL y devuelve un diccionario con la información obtenida.
+- parse_hls_master(text): Extrae la mejor variante de una lista maestra HLS.
+- resolution_label(info): Devuelve una etiqueta legible ('SD', '720p', '1080p', '4K') para un resultado.
+- height_key(info): Devuelve la altura en píxeles del resultado (0 si se desconoce), útil como clave de orden.
+- describe(info): Devuelve un texto corto con la resolución, los códecs y el bitrate.
+
+Clases:
+-------
+- ProbeCache: Caché persistente en disco de los resultados del análisis, indexada por URL.
+- ProbeManager(QObject): Pool de hilos acotado que analiza una lista de URLs en segundo plano.
+
+    Signals:
+    - result (str, dict): Emitida con la URL y su información cada vez que termina un análisis.
+    - progress (int, int): Emitida con el número de URLs analizadas y el total.
+    - finished (): Emitida cuando se han analizado todas las URLs de la tarea actual.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PyQt5.QtCore import QObject, pyqtSignal
+import vlc
+
+import network
+
+# Directorio del script actual
+current_directory = Path(__file__).parent
+
+PROBE_CACHE_PATH = current_directory / "cache" / "probe.json"
+# Días que se considera válido un resultado de la caché
+PROBE_TTL = 7 * 24 * 3600
+# Análisis simultáneos
+MAX_PROBE_THREADS = 4
+# Bytes que se leen de la cabecera del stream
+HEADER_BYTES = 64 * 1024
+# Tiempo máximo del análisis con libvlc (milisegundos)
+VLC_PARSE_TIMEOUT_MS = 8000
+
+# Altura mínima (en píxeles) de cada nivel de calidad, usada por los filtros
+QUALITY_MIN_HEIGHT = {"SD": 1, "720p": 700, "1080p": 1000, "4K": 2000}
+
+_RESOLUTION_RE = re.compile(r'RESOLUTION=(\d+)x(\d+)')
+_BANDWIDTH_RE = re.compile(r'(?<![-A-Z])BANDWIDTH=(\d+)')
+_CODECS_RE = re.compile(r'CODECS="([^"]*)"')
+
+
+def parse_hls_master(text):
+    """
+    Devuelve la variante de mayor resolución (o mayor bitrate) de una lista maestra HLS como un
+    diccionario con width, height, bitrate, vcodec y acodec, o None si el texto no es una lista maestra.
+    """
+    best = None
+    for line in text.splitlines():
+        if not line.startswith("#EXT-X-STREAM-INF"):
+            continue
+        variant = {"width": 0, "height": 0, "bitrate": 0, "vcodec": "", "acodec": ""}
+        match = _RESOLUTION_RE.search(line)
+        if match:
+            variant["width"], variant["height"] = int(match.group(1)), int(match.group(2))
+        match = _BANDWIDTH_RE.search(line)
+        if match:
+            variant["bitrate"] = int(match.group(1))
+        match = _CODECS_RE.search(line)
+        if match:
+            for codec in match.group(1).split(","):
+                codec = codec.strip().split(".")[0]
+                if codec in ("avc1", "avc3", "hvc1", "hev1", "vp09", "av01") and not variant["vcodec"]:
+                    variant["vcodec"] = codec
+                elif codec in ("mp4a", "ac-3", "ec-3", "opus") and not variant["acodec"]:
+                    variant["acodec"] = codec
+        if best is None or (variant["height"], variant["bitrate"]) > (best["height"], best["bitrate"]):
+            best = variant
+    return best
+
+
+def _fourcc(code):
+    try:
+        return code.to_bytes(4, "little").decode("ascii").strip()
+    except (UnicodeDecodeError, OverflowError):
+        return ""
+
+
+def _probe_with_vlc(instance, url):
+    info = {}
+    media = instance.media_new(url)
+    try:
+        media.parse_with_options(vlc.MediaParseFlag.network, VLC_PARSE_TIMEOUT_MS)
+        deadline = time.monotonic() + VLC_PARSE_TIMEOUT_MS / 1000 + 1
+        while media.get_parsed_status() == 0 and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if media.get_parsed_status() != vlc.MediaParsedStatus.done:
+            return info
+        for track in media.tracks_get() or []:
+            if track.type == vlc.TrackType.video:
+                video = track.u.video.contents
+                info.update(width=video.width, height=video.height, vcodec=_fourcc(track.codec))
+            elif track.type == vlc.TrackType.audio and "acodec" not in info:
+                info["acodec"] = _fourcc(track.codec)
+            if track.bitrate:
+                info["bitrate"] = info.get("bitrate", 0) + track.bitrate
+    finally:
+        media.release()
+    return info
+
+
+def probe_url(url, instance=None):
+    """
+    Analiza una URL. El resultado siempre incluye `estado` ('alive' o 'dead'), `ttfb` (segundos hasta
+    recibir las cabeceras de la respuesta, o None) y `ts` (momento del análisis); el resto de campos solo
+    aparecen si se han podido obtener. Si la petición tuvo que repetirse, el tiempo incluiría los intentos
+    fallidos y las esperas entre ellos, así que `ttfb` queda en None aunque el canal haya respondido.
+    """
+    info = {"estado": "dead", "ttfb": None, "ts": time.time()}
+    try:
+        start = time.monotonic()
+        with network.get(url, stream=True) as response:
+            ttfb = time.monotonic() - start
+            response.raise_for_status()
+            header = network.read_bytes(response, HEADER_BYTES)
+            if not network.was_retried(response):
+                info["ttfb"] = round(ttfb, 3)
+        info["estado"] = "alive"
+    except Exception as e:
+        logging.debug(f"No se pudo leer la cabecera de {url}: {e}")
+        return info
+
+    if header.lstrip().startswith(b"#EXTM3U"):
+        variant = parse_hls_master(header.decode("utf-8", errors="ignore"))
+        if variant:
+            info.update({key: value for key, value in variant.items() if value})
+
+    if not info.get("height") and instance is not None:
+        try:
+            info.update(_probe_with_vlc(instance, url))
+        except Exception as e:
+            logging.debug(f"libvlc no pudo analizar {url}: {e}")
+    return info
+
+
+def height_key(info):
+    return (info or {}).get("height", 0) or 0
+
+
+def resolution_label(info):
+    height = height_key(info)
+    for label in ("4K", "1080p", "720p", "SD"):
+        if height >= QUALITY_MIN_HEIGHT[label]:
+            return label
+    return ""
+
+
+def describe(info):
+    if not info:
+        return ""
+    parts = []
+    if info.get("height"):
+        parts.append(f"{info.get('width', 0)}x{info['height']} ({resolution_label(info)})")
+    codecs = "/".join(c for c in (info.get("vcodec"), info.get("acodec")) if c)
+    if codecs:
+        parts.append(codecs)
+    if info.get("bitrate"):
+        parts.append(f"{info['bitrate'] / 1_000_000:.1f} Mb/s")
+    if info.get("estado") == "dead":
+        parts.append("sin respuesta")
+    return " · ".join(parts)
+
+
+class ProbeCache:
+    def __init__(self, path=PROBE_CACHE_PATH, ttl=PROBE_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    self._data = json.load(file)
+            except (OSError, ValueError) as e:
+                logging.warning(f"No se pudo leer la caché de análisis {self.path}: {e}")
+
+    def get(self, url, include_expired=False):
+        with self._lock:
+            info = self._data.get(url)
+        if info and (include_expired or time.time() - info.get("ts", 0) < self.ttl):
+            return info
+        return None
+
+    def put(self, url, info):
+        with self._lock:
+            self._data[url] = info
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = dict(self._data)
+            self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, self.path)
+
+
+class ProbeManager(QObject):
+    result = pyqtSignal(str, dict)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal()
+
+    def __init__(self, parent=None, instance=None, cache=None, max_threads=MAX_PROBE_THREADS):
+        super().__init__(parent)
+        self.instance = instance
+        self.cache = cache if cache is not None else ProbeCache()
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="probe")
+        self._generation = 0
+        self._futures = []
+        self._lock = threading.Lock()
+        self._done = 0
+        self._total = 0
+
+    def start(self, urls, force=False):
+        """
+        Analiza las URLs indicadas en segundo plano. Cualquier análisis anterior se cancela. Las URLs
+        con un resultado válido en caché se emiten de inmediato sin volver a consultarse.
+        """
+        self.cancel()
+        generation = self._generation
+        pending = []
+        for url in dict.fromkeys(urls):  # Sin duplicados, conservando el orden
+            info = None if force else self.cache.get(url)
+            if info is not None:
+                self.result.emit(url, info)
+            else:
+                pending.append(url)
+        self._done = 0
+        self._total = len(pending)
+        if not pending:
+            self.finished.emit()
+            return
+        with self._lock:
+            self._futures = [self.executor.submit(self._run, url, generation) for url in pending]
+
+    def cancel(self):
+        """
+        Cancela el análisis en curso (por ejemplo, cuando se carga otra lista). Las tareas que aún no
+        han empezado se descartan y las que están en marcha no emiten su resultado.
+        """
+        with self._lock:
+            self._generation += 1
+            for future in self._futures:
+                future.cancel()
+            self._futures = []
+
+    def _run(self, url, generation):
+        if generation != self._generation:
+            return
+        info = probe_url(url, self.instance)
+        self.cache.put(url, info)
+        if generation != self._generation:
+            return
+        with self._lock:
+            self._done += 1
+            done = self._done
+        self.result.emit(url, info)
+        self.progress.emit(done, self._total)
+        if done == self._total:
+            self.cache.save()
+            self.finished.emit()
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False)
+        self.cache.save()
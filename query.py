@@ -0,0 +1,461 @@
+"""
+query.py - Lenguaje de consulta para filtrar canales en M3U Organizer
+
+Este módulo implementa el lenguaje de filtrado de la caja "Filtrar". Una consulta se analiza y se compila
+una sola vez en un plan que se evalúa sobre las columnas del `ChannelStore`, usando los índices por
+group-title y host cuando es posible y recorriendo columnas completas (con `str.find` o expresiones
+regulares sobre el texto de la columna unido) en lugar de comparar canal a canal en Python.
+
+Sintaxis:
+---------
+- Texto libre: `deportes`, `canal sur` o `"canal sur"` busca el texto en la línea #EXTINF o en la URL (como antes).
+  Si la consulta no usa campos ni `AND`/`OR`/`NOT`, o no se puede analizar, se busca tal cual, con sus paréntesis
+  y comillas (`Canal (HD)`); solo unas comillas que la rodean entera se quitan. Dentro de una consulta con
+  operadores, las palabras seguidas se buscan juntas; para buscarlas por separado se unen con `AND`.
+- Campos: `group:"Deportes"`, `host:example.com`, `name:hd`, `url:m3u8`, `id:la1.es`, `status:alive`.
+  - `group:` compara el group-title completo (sin distinguir mayúsculas).
+  - `host:` acepta también subdominios (`host:example.com` incluye `cdn.example.com`).
+  - `name:`, `url:` e `id:` buscan el texto dentro del campo; `campo=valor` exige igualdad exacta.
+- Expresiones regulares: `name~/hd$/i` (el sufijo `i` ignora mayúsculas).
+- Resolución: `res>=1080`, `res<720` o `res:1080p` (1080p o superior), según el análisis de los canales.
+- Operadores: `AND` (o simplemente un espacio), `OR`, `NOT` y paréntesis.
+
+Ejemplo: `group:"Deportes" AND NOT host:example.com AND name~/hd$/i AND status:alive`
+
+Funciones:
+----------
+- compile_query(text): Analiza y compila una consulta. Lanza `QueryError` si la sintaxis no es válida.
+
+Clases:
+-------
+- QueryError(ValueError): Error de sintaxis en una consulta.
+- CompiledQuery: Consulta compilada; `evaluate(store, ids=None)` devuelve los ids que cumplen la consulta.
+"""
+
+import operator
+import re
+from bisect import bisect_right
+from functools import partial
+from itertools import compress
+
+from probe import QUALITY_MIN_HEIGHT
+
+# Por debajo de esta fracción del total, los predicados se comprueban solo sobre los candidatos
+# en lugar de recorrer la columna completa
+CANDIDATE_SCAN_RATIO = 0.1
+
+# Campo de la consulta -> columna del almacén
+TEXT_FIELDS = {
+    'name': 'name', 'nombre': 'name',
+    'group': 'group', 'grupo': 'group',
+    'host': 'host',
+    'url': 'url',
+    'id': 'tvg_id', 'tvg-id': 'tvg_id',
+    'status': 'status', 'estado': 'status',
+    'extinf': 'extinf',
+}
+NUMERIC_FIELDS = {'res': 'height', 'height': 'height'}
+
+# Comparaciones invertidas (valor OP columna) para poder aplicar partial sobre funciones en C
+_INVERTED_COMPARISONS = {
+    '>=': operator.le, '<=': operator.ge, '>': operator.lt, '<': operator.gt, '=': operator.eq,
+}
+
+_TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<lpar>\() | (?P<rpar>\)) |
+        (?P<field>[A-Za-z][\w-]*)(?P<op>>=|<=|:|~|>|<|=)
+            (?: "(?P<fquoted>(?:[^"\\]|\\.)*)"
+              | /(?P<regex>(?:[^/\\]|\\.)*)/(?P<flags>[a-z]*)
+              | (?P<fvalue>[^\s()]+) ) |
+        "(?P<quoted>(?:[^"\\]|\\.)*)" |
+        (?P<word>[^\s()"]+)
+    )''', re.VERBOSE)
+
+
+class QueryError(ValueError):
+    pass
+
+
+# Consulta mal formada (paréntesis, comillas u operadores sueltos): se busca como texto libre
+class _StructureError(QueryError):
+    pass
+
+
+def _unescape(value):
+    return re.sub(r'\\(.)', r'\1', value)
+
+
+# Columnas preparadas para búsquedas masivas -------------------------------------------------------
+
+def _column_text(store, column, lower):
+    """
+    Devuelve la columna unida en un único texto (un valor por línea) y la lista de posiciones en las
+    que empieza cada valor. Se cachea en el almacén hasta que este cambia.
+    """
+    def build():
+        values = getattr(store, column)
+        if lower:
+            values = [value.lower() for value in values]
+        offsets = []
+        position = 0
+        for value in values:
+            offsets.append(position)
+            position += len(value) + 1
+        return '\n'.join(values), offsets
+    return store.cached(('text', column, lower), build)
+
+
+def _scan(text, offsets, search):
+    """
+    Recorre el texto de una columna con `search(text, pos)` (que devuelve la posición de la siguiente
+    coincidencia o -1) y devuelve el conjunto de ids con alguna coincidencia. Tras cada coincidencia se
+    salta al siguiente valor, así el coste es proporcional al número de canales que coinciden.
+    """
+    ids = set()
+    count = len(offsets)
+    position = 0
+    while True:
+        found = search(text, position)
+        if found < 0:
+            break
+        channel_id = bisect_right(offsets, found) - 1
+        ids.add(channel_id)
+        if channel_id + 1 >= count:
+            break
+        position = offsets[channel_id + 1]
+    return ids
+
+
+# Nodos del plan ------------------------------------------------------------------------------------
+
+class _Node:
+    cost = 3  # Coste relativo; los nodos baratos se evalúan primero en un AND
+
+    def evaluate(self, store, candidates):
+        """
+        Devuelve el conjunto de ids que cumplen el nodo. `candidates` es None (todos los canales) o un
+        conjunto de ids; los nodos pueden devolver ids fuera de los candidatos.
+        """
+        raise NotImplementedError
+
+
+class _All(_Node):
+    cost = 0
+
+    def evaluate(self, store, candidates):
+        return set(range(len(store))) if candidates is None else set(candidates)
+
+
+class _And(_Node):
+    def __init__(self, children):
+        self.children = sorted(children, key=lambda child: child.cost)
+        self.cost = max(child.cost for child in self.children)
+
+    def evaluate(self, store, candidates):
+        result = candidates
+        for child in self.children:
+            matches = child.evaluate(store, result)
+            result = matches if result is None else result & matches
+            if not result:
+                break
+        return result if result is not None else _All().evaluate(store, None)
+
+
+class _Or(_Node):
+    def __init__(self, children):
+        self.children = children
+        self.cost = max(child.cost for child in children)
+
+    def evaluate(self, store, candidates):
+        result = set()
+        for child in self.children:
+            result |= child.evaluate(store, candidates)
+        return result
+
+
+class _Not(_Node):
+    def __init__(self, child):
+        self.child = child
+        self.cost = child.cost
+
+    def evaluate(self, store, candidates):
+        universe = _All().evaluate(store, candidates)
+        return universe - self.child.evaluate(store, candidates)
+
+
+class _GroupEquals(_Node):
+    cost = 0
+
+    def __init__(self, value):
+        self.value = value.lower()
+
+    def evaluate(self, store, candidates):
+        return set(store.group_index().get(self.value, ()))
+
+
+class _HostMatches(_Node):
+    cost = 0
+
+    def __init__(self, value):
+        self.value = value.lower().lstrip('.')
+
+    def evaluate(self, store, candidates):
+        ids = set()
+        suffix = '.' + self.value
+        for host, host_ids in store.host_index().items():
+            if host == self.value or host.endswith(suffix):
+                ids.update(host_ids)
+        return ids
+
+
+class _ColumnEquals(_Node):
+    cost = 1
+
+    def __init__(self, column, value):
+        self.column = column
+        self.value = value.lower()
+
+    def evaluate(self, store, candidates):
+        values = store.cached(('lower', self.column), lambda: [value.lower() for value in getattr(store, self.column)])
+        return set(compress(range(len(store)), map(self.value.__eq__, values)))
+
+
+class _Contains(_Node):
+    cost = 2
+
+    def __init__(self, columns, value):
+        self.columns = columns
+        self.value = value.lower()
+
+    def evaluate(self, store, candidates):
+        ids = set()
+        use_candidates = candidates is not None and len(candidates) < CANDIDATE_SCAN_RATIO * len(store)
+        for column in self.columns:
+            if use_candidates:
+                values = getattr(store, column)
+                ids.update(i for i in candidates if self.value in values[i].lower())
+            else:
+                text, offsets = _column_text(store, column, True)
+                ids |= _scan(text, offsets, lambda text, pos: text.find(self.value, pos))
+        return ids
+
+
+class _Regex(_Node):
+    cost = 3
+
+    def __init__(self, column, pattern, flags):
+        self.column = column
+        try:
+            self.pattern = re.compile(pattern, re.MULTILINE | (re.IGNORECASE if 'i' in flags else 0))
+        except re.error as e:
+            raise QueryError(f"Expresión regular no válida /{pattern}/: {e}")
+
+    def evaluate(self, store, candidates):
+        if candidates is not None and len(candidates) < CANDIDATE_SCAN_RATIO * len(store):
+            values = getattr(store, self.column)
+            return {i for i in candidates if self.pattern.search(values[i])}
+
+        def search(text, pos):
+            while True:
+                match = self.pattern.search(text, pos)
+                if match is None:
+                    return -1
+                channel_id = bisect_right(offsets, match.start()) - 1
+                end = offsets[channel_id + 1] - 1 if channel_id + 1 < len(offsets) else len(text)
+                if match.end() <= end:
+                    return match.start()
+                # La coincidencia incluye el salto de línea que separa los valores (p. ej. con [^a] o \s):
+                # se busca de nuevo solo dentro de este valor
+                match = self.pattern.search(text, max(pos, offsets[channel_id]), end)
+                if match is not None:
+                    return match.start()
+                pos = end + 1
+                if pos > len(text):
+                    return -1
+        text, offsets = _column_text(store, self.column, False)
+        return _scan(text, offsets, search)
+
+
+class _Compare(_Node):
+    cost = 1
+
+    def __init__(self, column, op, value):
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def evaluate(self, store, candidates):
+        predicate = partial(_INVERTED_COMPARISONS[self.op], self.value)
+        return set(compress(range(len(store)), map(predicate, getattr(store, self.column))))
+
+
+# Analizador ----------------------------------------------------------------------------------------
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = self._tokenize(text)
+        self.position = 0
+
+    def _tokenize(self, text):
+        tokens = []
+        position = 0
+        text = self.text = text.strip()
+        while position < len(text):
+            match = _TOKEN_RE.match(text, position)
+            if not match or match.end() == position:
+                raise _StructureError(f"Consulta no válida cerca de: {text[position:]!r}")
+            position = match.end()
+            tokens.append(match)
+        return tokens
+
+    def _peek_keyword(self):
+        if self.position < len(self.tokens):
+            word = self.tokens[self.position].group('word')
+            if word and word.upper() in ('AND', 'OR', 'NOT'):
+                return word.upper()
+        return None
+
+    def has_operators(self):
+        """Indica si la consulta usa algún campo conocido o `AND`/`OR`/`NOT`."""
+        for token in self.tokens:
+            field = token.group('field')
+            if field and (field.lower() in TEXT_FIELDS or field.lower() in NUMERIC_FIELDS):
+                return True
+            word = token.group('word')
+            if word and word.upper() in ('AND', 'OR', 'NOT'):
+                return True
+        return False
+
+    def parse(self):
+        if not self.tokens:
+            return _All()
+        node = self._parse_or()
+        if self.position < len(self.tokens):
+            raise _StructureError(f"Paréntesis o término inesperado: {self.tokens[self.position].group().strip()!r}")
+        return node
+
+    def _parse_or(self):
+        children = [self._parse_and()]
+        while self._peek_keyword() == 'OR':
+            self.position += 1
+            children.append(self._parse_and())
+        return children[0] if len(children) == 1 else _Or(children)
+
+    def _parse_and(self):
+        children = [self._parse_not()]
+        while self.position < len(self.tokens):
+            keyword = self._peek_keyword()
+            if keyword == 'OR' or self.tokens[self.position].group('rpar'):
+                break
+            if keyword == 'AND':
+                self.position += 1
+            children.append(self._parse_not())
+        return children[0] if len(children) == 1 else _And(children)
+
+    def _parse_not(self):
+        if self._peek_keyword() == 'NOT':
+            self.position += 1
+            return _Not(self._parse_not())
+        return self._parse_primary()
+
+    def _parse_primary(self):
+        if self.position >= len(self.tokens):
+            raise _StructureError("La consulta termina de forma inesperada.")
+        token = self.tokens[self.position]
+        self.position += 1
+        if token.group('lpar'):
+            node = self._parse_or()
+            if self.position >= len(self.tokens) or not self.tokens[self.position].group('rpar'):
+                raise _StructureError("Falta cerrar un paréntesis.")
+            self.position += 1
+            return node
+        if token.group('rpar'):
+            raise _StructureError("Paréntesis de cierre inesperado.")
+        if token.group('field'):
+            node = self._field_term(token)
+            if node is not None:
+                return node
+            return _Contains(('extinf', 'url'), token.group().strip())
+        value = token.group('quoted')
+        if value is not None:
+            return _Contains(('extinf', 'url'), _unescape(value))
+        # Varias palabras seguidas sin comillas ni operadores se buscan juntas, tal cual (como el filtro
+        # anterior): "Canal 1" no encuentra "Canal 10 ... 1"
+        last = token
+        while (self.position < len(self.tokens) and self.tokens[self.position].group('word')
+               and self._peek_keyword() is None):
+            last = self.tokens[self.position]
+            self.position += 1
+        return _Contains(('extinf', 'url'), self.text[token.start('word'):last.end('word')])
+
+    def _field_term(self, token):
+        field = token.group('field').lower()
+        op = token.group('op')
+        regex = token.group('regex')
+        value = token.group('fquoted')
+        value = _unescape(value) if value is not None else token.group('fvalue')
+
+        if field in NUMERIC_FIELDS:
+            column = NUMERIC_FIELDS[field]
+            if op == ':':
+                label = (value or '').upper().replace('P', 'p')
+                if label not in QUALITY_MIN_HEIGHT:
+                    raise QueryError(f"Calidad desconocida: {value!r} (usa {', '.join(QUALITY_MIN_HEIGHT)})")
+                return _Compare(column, '>=', QUALITY_MIN_HEIGHT[label])
+            if op in _INVERTED_COMPARISONS and value and value.isdigit():
+                return _Compare(column, op, int(value))
+            raise QueryError(f"Comparación no válida: {token.group().strip()!r}")
+
+        if field not in TEXT_FIELDS:
+            return None  # Por ejemplo "http://...": se trata como texto libre
+        column = TEXT_FIELDS[field]
+        if op == '~':
+            if regex is None:
+                raise QueryError(f"Se esperaba una expresión regular /.../ en {token.group().strip()!r}")
+            return _Regex(column, regex, token.group('flags') or '')
+        if regex is not None:
+            value = token.group().split(op, 1)[1]
+        if op == '=':
+            return _ColumnEquals(column, value)
+        if op != ':':
+            raise QueryError(f"Operador no válido para el campo {field!r}: {op}")
+        if column == 'group':
+            return _GroupEquals(value)
+        if column == 'host':
+            return _HostMatches(value)
+        if column == 'status':
+            return _ColumnEquals(column, '' if value.lower() in ('unknown', 'desconocido') else value)
+        return _Contains((column,), value)
+
+
+class CompiledQuery:
+    def __init__(self, text, plan):
+        self.text = text
+        self.plan = plan
+
+    def evaluate(self, store, ids=None):
+        """
+        Devuelve la lista de ids que cumplen la consulta. Si se indica `ids`, el resultado conserva
+        su orden; si no, se devuelven en el orden del almacén.
+        """
+        candidates = None if ids is None else set(ids)
+        matches = self.plan.evaluate(store, candidates)
+        if ids is not None:
+            return [channel_id for channel_id in ids if channel_id in matches]
+        return sorted(matches)
+
+
+def _literal(text):
+    return _Contains(('extinf', 'url'), text.strip())
+
+
+def compile_query(text):
+    try:
+        parser = _Parser(text)
+        if not parser.has_operators() and not (len(parser.tokens) == 1 and parser.tokens[0].group('quoted')):
+            # Texto libre: se busca tal cual, como hacía el filtro anterior
+            return CompiledQuery(text, _literal(text) if parser.tokens else _All())
+        return CompiledQuery(text, parser.parse())
+    except _StructureError:
+        return CompiledQuery(text, _literal(text))
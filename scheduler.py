@@ -0,0 +1,231 @@
+"""
+scheduler.py - Actualización programada de las listas guardadas para M3U Organizer
+
+Este módulo descarga en segundo plano, cada cierto tiempo, las listas de las URLs guardadas en
+`urls_guardadas.json`. Cada entrada puede tener su propio intervalo de actualización (en minutos). Las
+descargas se hacen en un pool pequeño de hilos, para no saturar la red ni al proveedor, y a cada intervalo
+se le suma un pequeño margen aleatorio para que las listas programadas a la vez no se descarguen todas en
+el mismo instante.
+
+Cada lista descargada se analiza y se guarda ya analizada en la caché (`cache/listas`), de modo que abrir
+una lista guardada no necesita descargarla ni analizarla de nuevo. Además se compara con la copia anterior
+(ver `diff.py`) para saber cuántos canales han cambiado. El estado de cada entrada (última actualización,
+tamaño, canales y cambios) se guarda en `cache/listas/estado.json`. Si el servidor indica con ETag o
+Last-Modified que la lista no ha cambiado, no se vuelve a descargar. Las listas comprimidas (`.m3u.gz`,
+`.m3u.xz`, `.zip`...) se descomprimen mientras se descargan.
+
+Funciones:
+----------
+- entry_url(entry) / entry_interval(entry): URL e intervalo (minutos, 0 si no se actualiza sola) de una
+  entrada de `urls_guardadas.json`, que puede ser solo la URL o un diccionario {"url", "intervalo"}.
+- cached_store_path(url): Ruta de la copia analizada de una lista en la caché.
+- load_cached_store(url): Devuelve el `ChannelStore` guardado en la caché para una URL, o None.
+- load_state() / save_state(state): Estado de las actualizaciones por nombre de entrada.
+- refresh_entry(url, previous_state): Descarga, analiza y guarda en caché una lista (se ejecuta en un hilo).
+
+Clases:
+-------
+- RefreshScheduler(QObject): Comprueba periódicamente qué entradas toca actualizar y las actualiza en segundo plano.
+
+    Signals:
+    - refreshed (str, dict): Emitida con el nombre de la entrada y su nuevo estado.
+
+    Methods:
+    - start() / shutdown(): Arranca y detiene el planificador.
+    - refresh_now(name, url): Actualiza una entrada inmediatamente.
+    - describe(name): Texto con la última actualización, el tamaño y los cambios de una entrada.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+import network
+from channelstore import ChannelStore, M3UParser
+from compression import decompress_stream, response_stream, text_stream
+from diff import diff_stores
+
+# Directorio del script actual
+current_directory = Path(__file__).parent
+
+LIST_CACHE_DIR = current_directory / "cache" / "listas"
+STATE_PATH = LIST_CACHE_DIR / "estado.json"
+# Actualizaciones simultáneas
+MAX_PARALLEL_REFRESHES = 2
+# Cada cuánto se comprueba si alguna entrada debe actualizarse (milisegundos)
+CHECK_INTERVAL_MS = 30 * 1000
+# Margen aleatorio máximo que se añade a cada intervalo, como fracción del intervalo
+JITTER_FRACTION = 0.1
+
+
+def entry_url(entry):
+    return entry["url"] if isinstance(entry, dict) else entry
+
+
+def entry_interval(entry):
+    return int(entry.get("intervalo", 0)) if isinstance(entry, dict) else 0
+
+
+def cached_store_path(url):
+    return LIST_CACHE_DIR / (hashlib.sha1(url.encode('utf-8')).hexdigest() + ".pickle")
+
+
+def load_cached_store(url):
+    path = cached_store_path(url)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "rb") as file:
+            return ChannelStore.from_state(pickle.load(file))
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+        return None
+
+
+def _save_cached_store(url, store):
+    path = cached_store_path(url)
+    temporary = path.with_suffix(".tmp")
+    with open(temporary, "wb") as file:
+        pickle.dump(store.to_state(), file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)  # Sustitución atómica: nunca queda una copia a medio escribir
+
+
+def load_state():
+    try:
+        with open(STATE_PATH, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    LIST_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(STATE_PATH, "w") as file:
+        json.dump(state, file, indent=4)
+
+
+def refresh_entry(url, previous_state):
+    """
+    Descarga y analiza la lista de una entrada y devuelve su nuevo estado. Usa una petición condicional
+    (ETag / Last-Modified) para no descargar una lista que no ha cambiado.
+    """
+    previous_state = previous_state or {}
+    state = {key: value for key, value in previous_state.items() if key != "error"}
+    state["url"] = url
+    headers = {}
+    if previous_state.get("url") == url and cached_store_path(url).exists():
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+
+    store = ChannelStore()
+    parser = M3UParser(store)
+    with network.get(url, stream=True, headers=headers) as response:
+        if response.status_code == 304:
+            state["ultima"] = time.time()
+            state["cambios"] = 0
+            return state
+        response.raise_for_status()
+        # Se analiza mientras se descarga (y se descomprime, si la lista está comprimida), sin guardar la
+        # lista completa en memoria ni en disco
+        with decompress_stream(response_stream(response)) as stream:
+            text, _ = text_stream(stream)
+            for line in text:
+                parser.feed(line)
+        size = response.raw.tell()  # Bytes recibidos
+
+    previous = load_cached_store(url)
+    LIST_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _save_cached_store(url, store)
+
+    state.update({
+        "ultima": time.time(),
+        "tamano": size,
+        "canales": len(store),
+        "cambios": diff_stores(previous, store).change_count() if previous is not None else len(store),
+        "etag": response.headers.get("ETag", ""),
+        "last_modified": response.headers.get("Last-Modified", ""),
+    })
+    return state
+
+
+class RefreshScheduler(QObject):
+    refreshed = pyqtSignal(str, dict)
+
+    def __init__(self, parent=None, load_urls=None):
+        super().__init__(parent)
+        self.load_urls = load_urls  # Función que devuelve el diccionario de urls_guardadas.json
+        self.state = load_state()
+        self._executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_REFRESHES, thread_name_prefix="listas")
+        self._running = set()  # Entradas que se están actualizando
+        self._jitter = {}  # Margen aleatorio de la próxima actualización de cada entrada (segundos)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(CHECK_INTERVAL_MS)
+        self._timer.timeout.connect(self.check_due)
+        self.refreshed.connect(self._on_refreshed)
+
+    def start(self):
+        self._timer.start()
+        QTimer.singleShot(0, self.check_due)
+
+    def shutdown(self):
+        self._timer.stop()
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=False)
+
+    def check_due(self):
+        now = time.time()
+        for name, entry in self.load_urls().items():
+            interval = entry_interval(entry) * 60
+            if interval <= 0 or name in self._running:
+                continue
+            jitter = self._jitter.setdefault(name, random.uniform(0, interval * JITTER_FRACTION))
+            last = self.state.get(name, {}).get("ultima", 0)
+            if now >= last + interval + jitter:
+                self.refresh_now(name, entry_url(entry))
+
+    def refresh_now(self, name, url):
+        if name in self._running:
+            return
+        self._running.add(name)
+        self._jitter.pop(name, None)
+        self._executor.submit(self._refresh, name, url, dict(self.state.get(name, {})))
+
+    def _refresh(self, name, url, previous_state):
+        try:
+            state = refresh_entry(url, previous_state)
+        except Exception as e:
+            state = dict(previous_state, url=url, ultima=time.time(), error=str(e))
+        with self._lock:
+            if not self._closed:
+                self.refreshed.emit(name, state)
+
+    def _on_refreshed(self, name, state):
+        self._running.discard(name)
+        self.state[name] = state
+        save_state(self.state)
+
+    def describe(self, name):
+        if name in self._running:
+            return "actualizando..."
+        state = self.state.get(name)
+        if not state or not state.get("ultima"):
+            return "sin actualizar"
+        when = time.strftime("%d/%m/%Y %H:%M", time.localtime(state["ultima"]))
+        if state.get("error"):
+            return f"error el {when}: {state['error']}"
+        size_mb = state.get("tamano", 0) / (1024 * 1024)
+        return (f"actualizada el {when}, {size_mb:.1f} MB, {state.get('canales', 0)} canales, "
+                f"{state.get('cambios', 0)} cambios")
@@ -0,0 +1,232 @@
+"""
+server.py - Servidor HTTP local de listas para M3U Organizer
+
+Este módulo publica listas M3U en la red local para que los reproductores (decodificadores, Kodi, VLC...)
+puedan descargarlas directamente desde la aplicación: la lista del panel derecho y las vistas de filtro
+guardadas, cada una en una URL fija.
+
+Las respuestas se generan por adelantado (en un hilo aparte, ver `PublishThread` en `threads.py`, y solo
+cuando la lista cambia) junto con su versión comprimida con gzip y su ETag; el hilo de la interfaz solo
+sustituye el diccionario de respuestas publicadas. Los clientes se atienden en hilos propios del servidor que solo
+leen esas respuestas ya preparadas, y un cliente que repite la petición con `If-None-Match` recibe un 304
+sin cuerpo. Así, decenas de clientes consultando la lista cada pocos minutos apenas tienen coste.
+
+Funciones:
+----------
+- load_views(): Carga las vistas de filtro guardadas (nombre -> consulta) desde un archivo JSON.
+- save_views(views): Guarda las vistas de filtro en el archivo JSON.
+- view_path(name): Ruta en el servidor de una vista guardada.
+- path_url(path): Codifica una ruta publicada para usarla en una URL.
+- make_resource(body, content_type): Prepara una respuesta (cuerpo, gzip y ETag); se puede llamar desde cualquier hilo.
+
+Clases:
+-------
+- PlaylistServer: Servidor HTTP en segundo plano con las respuestas publicadas por ruta.
+
+    Methods:
+    - start(port, host): Arranca el servidor en un hilo propio.
+    - stop(): Detiene el servidor.
+    - update(resources): Publica de una vez las respuestas ya preparadas (ruta -> respuesta).
+    - unpublish(path): Deja de publicar una ruta.
+    - resource(path): Respuesta publicada en una ruta, o None.
+    - paths(): Rutas publicadas.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import quote, unquote, urlsplit
+
+# Directorio del script actual
+current_directory = Path(__file__).parent
+
+VIEWS_FILE = current_directory / "vistas_guardadas.json"
+DEFAULT_PORT = 8080
+PLAYLIST_PATH = "/lista.m3u"
+M3U_CONTENT_TYPE = "audio/x-mpegurl; charset=utf-8"
+
+
+def load_views():
+    if not os.path.exists(VIEWS_FILE):
+        return {}
+    with open(VIEWS_FILE, "r") as file:
+        return json.load(file)
+
+
+def save_views(views):
+    with open(VIEWS_FILE, "w") as file:
+        json.dump(views, file, indent=4)
+
+
+def view_path(name):
+    return "/vistas/" + name + ".m3u"
+
+
+def path_url(path):
+    """
+    Devuelve la ruta codificada para usarla en una URL (los nombres de las vistas pueden tener espacios).
+    """
+    return quote(path)
+
+
+class _Resource:
+    """
+    Respuesta ya preparada de una ruta. Es inmutable: al publicar una versión nueva se sustituye entera,
+    así los hilos del servidor nunca ven una respuesta a medio actualizar.
+    """
+    __slots__ = ("body", "gzip_body", "etag", "content_type")
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=6)
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.content_type = content_type
+
+
+def make_resource(body, content_type=M3U_CONTENT_TYPE):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return _Resource(body, content_type)
+
+
+class _PlaylistRequestHandler(BaseHTTPRequestHandler):
+    server_version = "M3UOrganizer"
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body):
+        path = unquote(urlsplit(self.path).path)
+        resources = self.server.resources
+        if path == "/":
+            resource = _Resource(self._index(resources).encode("utf-8"), "text/plain; charset=utf-8")
+        else:
+            resource = resources.get(path)
+        if resource is None:
+            self.send_error(404, "Lista no publicada")
+            return
+
+        if self._etag_matches(resource.etag):
+            self.send_response(304)
+            self.send_header("ETag", resource.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        use_gzip = self._accepts_gzip()
+        body = resource.gzip_body if use_gzip else resource.body
+        self.send_response(200)
+        self.send_header("Content-Type", resource.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", resource.etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _etag_matches(self, etag):
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+    def _accepts_gzip(self):
+        """
+        Indica si el cliente acepta gzip según `Accept-Encoding`, teniendo en cuenta los valores q
+        (`gzip;q=0` lo rechaza) y el comodín `*`.
+        """
+        qualities = {}
+        for item in self.headers.get("Accept-Encoding", "").split(","):
+            coding, *parameters = item.split(";")
+            coding = coding.strip().lower()
+            if not coding:
+                continue
+            quality = 1.0
+            for parameter in parameters:
+                name, _, value = parameter.partition("=")
+                if name.strip().lower() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            qualities[coding] = quality
+        for coding in ("gzip", "x-gzip", "*"):
+            if coding in qualities:
+                return qualities[coding] > 0
+        return False
+
+    def _index(self, resources):
+        return "\n".join(map(path_url, sorted(resources))) + "\n"
+
+    def log_message(self, format, *args):
+        logging.debug("Servidor de listas: %s - %s", self.address_string(), format % args)
+
+
+class PlaylistServer:
+    def __init__(self):
+        self._httpd = None
+        self._thread = None
+        # Ruta -> _Resource. Nunca se modifica: cada cambio crea un diccionario nuevo, de modo que los hilos
+        # del servidor pueden leerlo sin bloqueos
+        self._resources = {}
+
+    def is_running(self):
+        return self._httpd is not None
+
+    def address(self):
+        if self._httpd is None:
+            return None
+        return self._httpd.server_address
+
+    def start(self, port=DEFAULT_PORT, host="0.0.0.0"):
+        """
+        Arranca el servidor en un hilo en segundo plano. Lanza OSError si el puerto no está disponible.
+        """
+        if self._httpd is not None:
+            return
+        httpd = ThreadingHTTPServer((host, port), _PlaylistRequestHandler)
+        httpd.daemon_threads = True
+        httpd.resources = self._resources
+        self._httpd = httpd
+        self._thread = threading.Thread(target=httpd.serve_forever, name="servidor-listas", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+        self._httpd = None
+        self._thread = None
+
+    def update(self, resources):
+        if resources:
+            self._set_resources({**self._resources, **resources})
+
+    def resource(self, path):
+        return self._resources.get(path)
+
+    def unpublish(self, path):
+        if path in self._resources:
+            self._set_resources({key: value for key, value in self._resources.items() if key != path})
+
+    def _set_resources(self, resources):
+        self._resources = resources
+        if self._httpd is not None:
+            self._httpd.resources = resources
+
+    def paths(self):
+        return sorted(self._resources)
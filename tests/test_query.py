@@ -0,0 +1,29 @@
+from channelstore import ChannelStore
+from query import compile_query
+
+CHANNELS = [
+    ("Canal (HD)", "http://a.example/1"),
+    ("Canal HD 2", "http://b.example/2"),
+    ('Canal "Sur"', "http://a.example/3"),
+    ("Otro", "http://c.example/4"),
+]
+
+
+def _names(text):
+    store = ChannelStore()
+    for name, url in CHANNELS:
+        store.append(f'#EXTINF:-1 group-title="G",{name}', url)
+    return [store.name[channel_id] for channel_id in compile_query(text).evaluate(store)]
+
+
+def test_free_text_with_parentheses_is_searched_literally():
+    assert _names("Canal (HD)") == ["Canal (HD)"]
+
+
+def test_unmatched_quote_is_searched_literally():
+    assert _names('Canal "Sur') == ['Canal "Sur"']
+
+
+def test_queries_with_operators_are_still_parsed():
+    assert _names("name:hd AND host:b.example") == ["Canal HD 2"]
+    assert _names("(Canal AND HD") == []
@@ -1,23 +1,75 @@
 """
 threads.py - Hilos para operaciones en segundo plano en M3U Organizer
 
-Este módulo contiene dos clases que heredan de QThread y están diseñadas para realizar operaciones en segundo plano 
-en una aplicación PyQt5. Las clases `LoadFileThread` y `SearchThread` proporcionan hilos para cargar archivos 
-y buscar términos específicos en texto, respectivamente.
+Este módulo contiene las clases que heredan de QThread y están diseñadas para realizar operaciones en segundo plano 
+en una aplicación PyQt5. La clase `SearchThread` proporciona un hilo para buscar términos específicos en texto
+y `EpgLoadThread` lee guías de programación XMLTV. La carga de listas M3U está en `loader.py`.
 
 Classes:
 --------
-- LoadFileThread(QThread):
-    Hilo para cargar un archivo grande en segmentos, emitiendo señales de progreso y las líneas cargadas.
+- EpgLoadThread(QThread):
+    Hilo para leer una guía XMLTV (local o remota, comprimida o no) y unirla a los canales por tvg-id.
 
     Signals:
-    - progress (int): Señal emitida con el porcentaje de progreso de la carga del archivo.
-    - lines_loaded (str): Señal emitida con las líneas cargadas del archivo.
-    - finished (): Señal emitida cuando la carga del archivo ha finalizado.
+    - progress (int): Señal emitida con el número de programas leídos hasta el momento.
+    - loaded (object): Señal emitida con el `EpgIndex` resultante.
+    - error (str): Señal emitida con el mensaje de error si la guía no se puede leer.
 
     Methods:
-    - run(): Ejecuta la carga del archivo línea por línea, emitiendo el progreso y las líneas cargadas.
-    - process_lines(lines): Procesa las líneas cargadas, aplicando color según el tipo de línea (EXTINF o URL).
+    - run(): Abre la guía y la procesa de forma incremental.
+    - cancel(): Solicita detener la lectura en el siguiente punto de control.
+
+- DiffThread(QThread):
+    Hilo para leer otra versión de la lista (archivo local o URL) y compararla con la lista cargada.
+
+    Signals:
+    - loaded (object): Señal emitida con el `PlaylistDiff` resultante.
+    - error (str): Señal emitida con el mensaje de error si la lista no se puede leer.
+
+    Methods:
+    - run(): Lee la lista en un almacén nuevo y la compara con el almacén de la lista cargada.
+
+- DownloadThread(QThread):
+    Hilo para descargar una lista remota (reanudable y en tramos paralelos si el servidor admite Range).
+
+    Signals:
+    - progress (int, str): Señal emitida con el porcentaje descargado (-1 si se desconoce el tamaño) y un texto con lo descargado y la velocidad.
+    - done (str): Señal emitida con la ruta del archivo descargado.
+    - error (str): Señal emitida con el mensaje de error si la descarga falla.
+
+    Methods:
+    - run(): Descarga la URL al archivo indicado.
+    - cancel(): Solicita detener la descarga; lo descargado se conserva para reanudarla.
+
+- ExportThread(QThread):
+    Hilo para ejecutar una exportación sin bloquear la interfaz.
+
+    Signals:
+    - done (str): Señal emitida con el mensaje de resumen de la exportación.
+    - error (str): Señal emitida con el mensaje de error si la exportación falla.
+
+    Methods:
+    - run(): Ejecuta la tarea de exportación y emite su resultado.
+
+- SessionLoadThread(QThread):
+    Hilo para leer la sesión de trabajo guardada (ver `workspace.py`) sin bloquear el arranque.
+
+    Signals:
+    - loaded (object): Señal emitida con la sesión leída (None si no hay una sesión válida).
+    - error (str): Señal emitida con el mensaje de error si la sesión no se puede leer.
+
+    Methods:
+    - run(): Lee la sesión y la emite.
+
+- PublishThread(QThread):
+    Hilo para preparar las respuestas del servidor de listas (M3U, gzip y ETag) sin bloquear la interfaz.
+
+    Signals:
+    - prepared (dict, dict): Señal emitida con las respuestas nuevas (ruta -> respuesta) y la versión de los
+      datos con la que se ha preparado cada ruta.
+
+    Methods:
+    - run(): Evalúa las consultas de las vistas sobre copias de los almacenes y genera las respuestas.
 
 - SearchThread(QThread):
     Hilo para buscar un término en un texto dado, emitiendo las posiciones encontradas.
@@ -29,46 +81,20 @@ Classes:
     - run(): Ejecuta la búsqueda del término dentro del texto, almacenando las posiciones encontradas.
 """
 
+import io
+import itertools
+import logging
+import time
 from PyQt5.QtCore import QThread, pyqtSignal
-import chardet
-
-class LoadFileThread(QThread):
-    progress = pyqtSignal(int)
-    lines_loaded = pyqtSignal(str)
-    finished = pyqtSignal()
-
-    def __init__(self, file_path, chunk_size=10000):  # chunk_size aumentado
-        super().__init__()
-        self.file_path = file_path
-        self.chunk_size = chunk_size
-
-    def run(self):
-        # Detectar la codificación
-        with open(self.file_path, 'rb') as f:
-            raw_data = f.read(10000)  # Leer una pequeña parte del archivo
-            result = chardet.detect(raw_data)
-            encoding = result['encoding']
-
-        total_lines = 0
-        with open(self.file_path, 'r', encoding=encoding, errors='ignore') as file:
-            while file.readline():
-                total_lines += 1
-
-        with open(self.file_path, 'r', encoding=encoding, errors='ignore') as file:
-            for i, line in enumerate(file):
-                if i % self.chunk_size == 0:
-                    self.progress.emit(int((i / total_lines) * 100))
-                self.lines_loaded.emit(line.strip())
-
-        self.finished.emit()
-        
-    def process_lines(self, lines):
-        processed_lines = []
-        for line in lines:
-            line = line.strip()
-            color = 'black' if line.startswith("#EXTINF:") or line.startswith("http") else 'red'
-            processed_lines.append(f"<span style='color:{color}'>{line}</span>")
-        return "\n".join(processed_lines)
+from compression import open_playlist, text_stream
+from downloads import DownloadCancelled, download_file, format_progress
+from channelstore import ChannelStore, M3UParser
+from diff import diff_stores
+from epg import open_guide, parse_xmltv
+from workspace import read_session
+from exporters import write_m3u
+from query import QueryError, compile_query
+from server import make_resource
 
 class SearchThread(QThread):
     result = pyqtSignal(dict)
@@ -87,4 +113,166 @@ class SearchThread(QThread):
                 positions[current_pos] = self.search_term
                 current_pos += len(self.search_term)
         self.result.emit(positions)
-        
+
+
+class EpgLoadThread(QThread):
+    progress = pyqtSignal(int)
+    loaded = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, source, wanted_ids):
+        super().__init__()
+        self.source = source
+        self.wanted_ids = set(wanted_ids)
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            with open_guide(self.source) as stream:
+                index = parse_xmltv(stream, self.wanted_ids,
+                                    progress_callback=self.progress.emit,
+                                    is_cancelled=lambda: self._cancelled)
+        except Exception as e:
+            self.error.emit(str(e))
+            return
+        if not self._cancelled:
+            self.loaded.emit(index)
+
+
+class DiffThread(QThread):
+    loaded = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, old_store, source, keep_unchanged=False):
+        super().__init__()
+        self.old_store = old_store
+        self.source = source
+        self.keep_unchanged = keep_unchanged
+        self.parser = None  # Analizador de la lista leída, por si luego se le añaden más líneas
+
+    def read_lines(self):
+        with open_playlist(self.source) as stream:
+            text, _ = text_stream(stream)
+            yield from text
+
+    def run(self):
+        try:
+            store = ChannelStore()
+            self.parser = M3UParser(store)
+            for line in self.read_lines():
+                self.parser.feed(line)
+        except Exception as e:
+            self.error.emit(str(e))
+            return
+        self.loaded.emit(diff_stores(self.old_store, store, self.keep_unchanged))
+
+
+class DownloadThread(QThread):
+    progress = pyqtSignal(int, str)
+    done = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    # Intervalo mínimo entre avisos de progreso (segundos), para no saturar la interfaz
+    PROGRESS_INTERVAL = 0.2
+
+    def __init__(self, url, path):
+        super().__init__()
+        self.url = url
+        self.path = path
+        self._cancelled = False
+        self._last_progress = 0
+
+    def cancel(self):
+        self._cancelled = True
+
+    def report_progress(self, done, total, speed):
+        now = time.monotonic()
+        if now - self._last_progress < self.PROGRESS_INTERVAL and done != total:
+            return
+        self._last_progress = now
+        percent = int(done * 100 / total) if total else -1
+        self.progress.emit(percent, format_progress(done, total, speed))
+
+    def run(self):
+        try:
+            download_file(self.url, self.path, progress_callback=self.report_progress,
+                          is_cancelled=lambda: self._cancelled)
+        except DownloadCancelled:
+            return
+        except Exception as e:
+            self.error.emit(str(e))
+            return
+        self.done.emit(self.path)
+
+
+class ExportThread(QThread):
+    done = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    def __init__(self, task):
+        super().__init__()
+        self.task = task  # Función sin argumentos que devuelve el mensaje de resumen
+
+    def run(self):
+        try:
+            message = self.task()
+        except Exception as e:
+            self.error.emit(str(e))
+            return
+        self.done.emit(message)
+
+
+class SessionLoadThread(QThread):
+    loaded = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def run(self):
+        try:
+            session = read_session(self.path)
+        except Exception as e:
+            self.error.emit(str(e))
+            return
+        self.loaded.emit(session)
+
+
+class PublishThread(QThread):
+    prepared = pyqtSignal(dict, dict)
+
+    def __init__(self, server, jobs, stores, header):
+        super().__init__()
+        self.server = server
+        self.header = header  # Línea #EXTM3U con la que empiezan las listas
+        # Ruta -> (versión, origen, consulta): el origen son las referencias (almacén, id) de la lista o, si hay
+        # consulta, la clave del almacén sobre el que se evalúa. Se resuelven sobre `stores` (clave -> copia
+        # del almacén tomada en el hilo de la interfaz), así el hilo no lee los almacenes mientras cambian
+        self.jobs = jobs
+        self.stores = stores
+
+    def run(self):
+        resources = {}
+        versions = {}
+        for path, (version, source, query_text) in self.jobs.items():
+            if query_text is None:
+                refs = ((self.stores[store.key], channel_id) for store, channel_id in source)
+            else:
+                store = self.stores[source]
+                try:
+                    refs = zip(itertools.repeat(store), compile_query(query_text).evaluate(store))
+                except QueryError as e:
+                    logging.warning(f"Vista {path} no válida: {e}")
+                    continue
+            buffer = io.StringIO()
+            write_m3u(refs, buffer, self.header)
+            body = buffer.getvalue().encode("utf-8")
+            versions[path] = version
+            current = self.server.resource(path)
+            if current is None or current.body != body:  # Sin cambios se conserva la respuesta (y su ETag)
+                resources[path] = make_resource(body)
+        self.prepared.emit(resources, versions)
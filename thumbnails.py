@@ -0,0 +1,458 @@
+"""
+thumbnails.py - Miniaturas de los canales para M3U Organizer
+
+Este módulo muestra una cuadrícula con una imagen fija de lo que emite cada canal, para ver de un vistazo
+qué hay en cada URL sin abrirlas una a una en la previsualización.
+
+Las imágenes se capturan con libvlc sin ninguna ventana: cada reproductor decodifica el vídeo en un búfer
+en memoria (callbacks de vídeo de libvlc, ya escalado por VLC), se queda con uno de los primeros fotogramas
+y se detiene. Las capturas se hacen en un pool acotado de reproductores (`MAX_THUMBNAIL_PLAYERS`), que se
+reutilizan de una captura a otra, y solo para las celdas visibles de la cuadrícula: las peticiones que dejan
+de ser visibles antes de empezar se retiran de la cola, igual que con los logos (ver `logos.py`).
+
+Cada miniatura se guarda en una caché en disco (`cache/miniaturas`), que vale durante `THUMBNAIL_TTL`
+segundos (lo que emite un canal cambia, así que pasado ese tiempo se captura de nuevo), y en una caché en
+memoria. Funciona igual con URLs de streams que con archivos de vídeo locales (rutas o `file://`).
+
+Funciones:
+----------
+- thumbnail_cache_path(url): Ruta de la miniatura de una URL en la caché en disco.
+- cached_thumbnail(url, ttl): Devuelve la QImage guardada en disco si no ha caducado, o None.
+- prune_thumbnail_cache(): Borra las miniaturas caducadas y, si la caché sigue siendo grande, las más antiguas.
+
+Clases:
+-------
+- FrameGrabber: Reproductor de libvlc sin ventana que captura un fotograma de una URL.
+- ThumbnailLoader(QObject): Pool de capturas en segundo plano.
+
+    Signals:
+    - thumbnail_ready (str): Emitida con la URL cuando su miniatura está en la caché en memoria.
+    - thumbnail_failed (str): Emitida con la URL si no se ha podido capturar ningún fotograma.
+
+    Methods:
+    - pixmap(url) / has_failed(url): Miniatura en memoria (o None) y si la captura ha fallado.
+    - request(url): Pide la miniatura de una URL. set_visible(urls): Retira de la cola las que ya no se ven.
+    - refresh(urls): Descarta las miniaturas guardadas de esas URLs y las vuelve a capturar.
+    - shutdown(): Detiene las capturas y libera los reproductores.
+
+- ThumbnailModel(QAbstractListModel): Canales de la cuadrícula (almacén + ids) con su miniatura.
+- ThumbnailDialog(QDialog): Ventana con la cuadrícula de miniaturas. Doble clic para previsualizar el canal.
+"""
+
+import ctypes
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QObject, QPoint, QRunnable, QSize, QThreadPool, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QPainter, QPixmap
+from PyQt5.QtWidgets import QDialog, QHBoxLayout, QLabel, QListView, QPushButton, QVBoxLayout
+import vlc
+
+import network
+from logos import PixmapLRUCache, prune_disk_cache
+
+# Directorio del script actual
+current_directory = Path(__file__).parent
+
+THUMBNAIL_CACHE_DIR = current_directory / "cache" / "miniaturas"
+# Tamaño máximo de cada miniatura (se conserva la proporción del vídeo)
+THUMBNAIL_SIZE = QSize(160, 90)
+# Tamaño al que VLC escala el vídeo en el búfer (el doble, para reducirlo después con buena calidad)
+CAPTURE_WIDTH = 320
+CAPTURE_HEIGHT = 180
+# Segundos que vale una miniatura guardada
+THUMBNAIL_TTL = 6 * 3600
+# Reproductores (y capturas) simultáneos
+MAX_THUMBNAIL_PLAYERS = 3
+# Tiempo máximo para obtener un fotograma de una URL (segundos)
+CAPTURE_TIMEOUT = 12
+# Fotogramas que se descartan al empezar (suelen salir grises o incompletos hasta el primer fotograma clave)
+SKIP_FRAMES = 2
+# Límite de la caché en memoria y en disco
+MEMORY_CACHE_BYTES = 32 * 1024 * 1024
+DISK_CACHE_BYTES = 128 * 1024 * 1024
+
+
+def thumbnail_cache_path(url):
+    return THUMBNAIL_CACHE_DIR / (hashlib.sha1(url.encode('utf-8')).hexdigest() + ".jpg")
+
+
+def cached_thumbnail(url, ttl=THUMBNAIL_TTL):
+    path = thumbnail_cache_path(url)
+    try:
+        if time.time() - path.stat().st_mtime >= ttl:
+            return None
+    except OSError:
+        return None
+    image = QImage()
+    return image if image.load(str(path)) else None
+
+
+def prune_thumbnail_cache(ttl=THUMBNAIL_TTL, max_bytes=DISK_CACHE_BYTES):
+    if not THUMBNAIL_CACHE_DIR.exists():
+        return
+    now = time.time()
+    for entry in os.scandir(THUMBNAIL_CACHE_DIR):
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime >= ttl:
+                os.remove(entry.path)
+        except OSError:
+            pass
+    prune_disk_cache(max_bytes, THUMBNAIL_CACHE_DIR)
+
+
+class FrameGrabber:
+    """
+    Reproductor de libvlc que no abre ninguna ventana: el vídeo se decodifica en un búfer en memoria y se
+    copia el fotograma que interesa. Un mismo capturador sirve para muchas URLs, una tras otra.
+    """
+    def __init__(self, instance, width=CAPTURE_WIDTH, height=CAPTURE_HEIGHT):
+        self.instance = instance
+        self.width = width
+        self.height = height
+        self._buffer = ctypes.create_string_buffer(width * height * 4)
+        self._frame = None
+        self._frames = 0
+        self._ready = threading.Event()
+        # Los callbacks deben seguir referenciados mientras exista el reproductor
+        self._lock_cb = vlc.CallbackDecorators.VideoLockCb(self._lock)
+        self._display_cb = vlc.CallbackDecorators.VideoDisplayCb(self._display)
+        self.player = instance.media_player_new()
+        self.player.video_set_callbacks(self._lock_cb, None, self._display_cb, None)
+        self.player.video_set_format("RV32", width, height, width * 4)
+
+    def _lock(self, opaque, planes):
+        planes[0] = ctypes.addressof(self._buffer)
+        return None
+
+    def _display(self, opaque, picture):
+        # Hilo de vídeo de libvlc: copiar el fotograma antes de que se escriba el siguiente en el búfer
+        if self._ready.is_set():
+            return
+        self._frame = self._buffer.raw
+        self._frames += 1
+        if self._frames > SKIP_FRAMES:
+            self._ready.set()
+
+    def grab(self, url, timeout=CAPTURE_TIMEOUT, is_cancelled=None):
+        """
+        Reproduce `url` sin sonido hasta obtener un fotograma y lo devuelve como QImage del tamaño de
+        `THUMBNAIL_SIZE` con la proporción del vídeo, o None si no llega ninguno a tiempo.
+        """
+        self._frame = None
+        self._frames = 0
+        self._ready.clear()
+        media = self.instance.media_new(url)
+        media.add_option(":no-audio")
+        media.add_option(":no-spu")
+        self.player.set_media(media)
+        media.release()
+        try:
+            self.player.play()
+            deadline = time.monotonic() + timeout
+            while not self._ready.wait(0.1):
+                if self.player.get_state() in (vlc.State.Ended, vlc.State.Error):
+                    break  # Vídeo más corto que los fotogramas descartados: vale el último que haya llegado
+                if time.monotonic() > deadline or (is_cancelled and is_cancelled()):
+                    return None
+            self._ready.set()  # No copiar más fotogramas mientras se lee el último
+            frame = self._frame
+            if frame is None:
+                return None
+            try:
+                video_width, video_height = self.player.video_get_size(0)
+            except vlc.VLCException:
+                video_width = video_height = 0
+        finally:
+            self.player.stop()
+            self.player.set_media(None)
+
+        image = QImage(frame, self.width, self.height, self.width * 4, QImage.Format_RGB32)
+        # VLC ha estirado el vídeo al tamaño del búfer: se devuelve a su proporción al reducirlo
+        size = THUMBNAIL_SIZE
+        if video_width and video_height:
+            size = QSize(video_width, video_height).scaled(THUMBNAIL_SIZE, Qt.KeepAspectRatio)
+        return image.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+    def release(self):
+        self.player.stop()
+        self.player.release()
+
+
+class _ThumbnailSignals(QObject):
+    loaded = pyqtSignal(str, QImage)
+    failed = pyqtSignal(str)
+
+
+class _ThumbnailTask(QRunnable):
+    """
+    Tarea que obtiene una miniatura de la caché en disco o capturándola con uno de los reproductores del pool.
+    Se ejecuta en un hilo del QThreadPool, por eso trabaja con QImage y no con QPixmap.
+    """
+    def __init__(self, url, loader):
+        super().__init__()
+        self.url = url
+        self.loader = loader
+        self.setAutoDelete(False)
+
+    def run(self):
+        loader = self.loader
+        try:
+            image = cached_thumbnail(self.url, loader.ttl)
+            if image is None:
+                grabber = loader.acquire_grabber()
+                try:
+                    image = grabber.grab(self.url, is_cancelled=loader.closing.is_set)
+                finally:
+                    loader.release_grabber(grabber)
+                if image is None:
+                    raise ValueError("No se ha recibido ningún fotograma")
+                path = thumbnail_cache_path(self.url)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                image.save(str(path), "JPG", 85)
+        except Exception as e:
+            logging.debug(f"No se pudo capturar la miniatura de {self.url}: {e}")
+            self._emit(loader.signals.failed, self.url)
+            return
+        self._emit(loader.signals.loaded, self.url, image)
+
+    @staticmethod
+    def _emit(signal, *args):
+        try:
+            signal.emit(*args)
+        except RuntimeError:
+            pass  # El cargador ya se ha destruido (la aplicación se está cerrando)
+
+
+class ThumbnailLoader(QObject):
+    thumbnail_ready = pyqtSignal(str)
+    thumbnail_failed = pyqtSignal(str)
+
+    def __init__(self, parent=None, instance=None, max_players=MAX_THUMBNAIL_PLAYERS, ttl=THUMBNAIL_TTL):
+        super().__init__(parent)
+        self.instance = instance
+        self.ttl = ttl
+        self.cache = PixmapLRUCache(MEMORY_CACHE_BYTES)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_players)  # Cada hilo usa como mucho un reproductor
+        self.closing = threading.Event()
+        self.signals = _ThumbnailSignals(self)
+        self.signals.loaded.connect(self._on_loaded)
+        self.signals.failed.connect(self._on_failed)
+        self._queued = {}  # url -> tarea aún no finalizada
+        self._failed = set()  # URLs sin imagen (no se reintentan hasta pedir actualizarlas)
+        self._grabbers = []  # Reproductores libres
+        self._all_grabbers = []
+        self._lock = threading.Lock()
+        network.submit(prune_thumbnail_cache, ttl)
+
+    def acquire_grabber(self):
+        with self._lock:
+            if self._grabbers:
+                return self._grabbers.pop()
+        grabber = FrameGrabber(self.instance)
+        with self._lock:
+            self._all_grabbers.append(grabber)
+        return grabber
+
+    def release_grabber(self, grabber):
+        with self._lock:
+            self._grabbers.append(grabber)
+
+    def pixmap(self, url):
+        return self.cache.get(url)
+
+    def has_failed(self, url):
+        return url in self._failed
+
+    def request(self, url):
+        if not url or url in self.cache or url in self._queued or url in self._failed or self.closing.is_set():
+            return
+        task = _ThumbnailTask(url, self)
+        self._queued[url] = task
+        self.pool.start(task)
+
+    def set_visible(self, urls):
+        """
+        Retira de la cola las capturas que todavía no han empezado y ya no corresponden a celdas visibles.
+        Las que ya están en curso se dejan terminar (acabarán en la caché).
+        """
+        visible = set(urls)
+        for url in [u for u in self._queued if u not in visible]:
+            if self.pool.tryTake(self._queued[url]):
+                del self._queued[url]
+
+    def refresh(self, urls):
+        for url in urls:
+            if url in self._queued:
+                continue
+            self._failed.discard(url)
+            self.cache.remove(url)
+            try:
+                os.remove(thumbnail_cache_path(url))
+            except OSError:
+                pass
+            self.request(url)
+
+    def _on_loaded(self, url, image):
+        self._queued.pop(url, None)
+        # La conversión a QPixmap debe hacerse en el hilo de la interfaz gráfica
+        self.cache.put(url, QPixmap.fromImage(image))
+        self.thumbnail_ready.emit(url)
+
+    def _on_failed(self, url):
+        self._queued.pop(url, None)
+        self._failed.add(url)
+        self.thumbnail_failed.emit(url)
+
+    def shutdown(self):
+        self.closing.set()
+        self.pool.clear()
+        self.pool.waitForDone(CAPTURE_TIMEOUT * 1000)
+        with self._lock:
+            grabbers, self._all_grabbers, self._grabbers = self._all_grabbers, [], []
+        for grabber in grabbers:
+            grabber.release()
+
+
+def _placeholder(text):
+    pixmap = QPixmap(THUMBNAIL_SIZE)
+    pixmap.fill(QColor("#202020"))
+    painter = QPainter(pixmap)
+    painter.setPen(QColor("#a0a0a0"))
+    painter.drawText(pixmap.rect(), Qt.AlignCenter, text)
+    painter.end()
+    return pixmap
+
+
+class ThumbnailModel(QAbstractListModel):
+    def __init__(self, store, ids, loader, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.ids = list(ids)
+        self.loader = loader
+        self._rows_by_url = {}
+        for row, channel_id in enumerate(self.ids):
+            self._rows_by_url.setdefault(store.url[channel_id], []).append(row)
+        self._pending = _placeholder("Cargando...")
+        self._no_image = _placeholder("Sin imagen")
+        loader.thumbnail_ready.connect(self._on_thumbnail)
+        loader.thumbnail_failed.connect(self._on_thumbnail)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.ids)
+
+    def url(self, row):
+        return self.store.url[self.ids[row]]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        channel_id = self.ids[index.row()]
+        if role == Qt.DisplayRole:
+            return self.store.name[channel_id]
+        if role == Qt.DecorationRole:
+            url = self.store.url[channel_id]
+            pixmap = self.loader.pixmap(url)
+            if pixmap is not None:
+                return pixmap
+            return self._no_image if self.loader.has_failed(url) else self._pending
+        if role == Qt.ToolTipRole:
+            return f"{self.store.name[channel_id]}\n{self.store.url[channel_id]}"
+        return None
+
+    def _on_thumbnail(self, url):
+        for row in self._rows_by_url.get(url, ()):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class ThumbnailDialog(QDialog):
+    def __init__(self, parent, loader, store, ids, preview=None):
+        super().__init__(parent)
+        self.setWindowTitle("Miniaturas de los canales")
+        self.resize(900, 600)
+        self.loader = loader
+        self.preview = preview  # Función que abre la previsualización de una URL
+
+        self.view = QListView()
+        self.view.setViewMode(QListView.IconMode)
+        self.view.setResizeMode(QListView.Adjust)
+        self.view.setMovement(QListView.Static)
+        self.view.setUniformItemSizes(True)
+        self.view.setIconSize(THUMBNAIL_SIZE)
+        self.view.setGridSize(QSize(THUMBNAIL_SIZE.width() + 16, THUMBNAIL_SIZE.height() + 40))
+        self.view.setWordWrap(True)
+        self.view.doubleClicked.connect(self.on_double_clicked)
+
+        self.status_label = QLabel("")
+        refresh_button = QPushButton("Volver a capturar las visibles")
+        refresh_button.clicked.connect(self.refresh_visible)
+        bottom_layout = QHBoxLayout()
+        bottom_layout.addWidget(self.status_label, 1)
+        bottom_layout.addWidget(refresh_button)
+        layout = QVBoxLayout()
+        layout.addWidget(self.view)
+        layout.addLayout(bottom_layout)
+        self.setLayout(layout)
+
+        # Agrupar las peticiones mientras el usuario se desplaza o cambia el tamaño de la ventana
+        self._visible_timer = QTimer(self)
+        self._visible_timer.setSingleShot(True)
+        self._visible_timer.setInterval(150)
+        self._visible_timer.timeout.connect(self.request_visible)
+        self.view.verticalScrollBar().valueChanged.connect(lambda: self._visible_timer.start())
+
+        self.model = None
+        self.set_channels(store, ids)
+
+    def set_channels(self, store, ids):
+        self.model = ThumbnailModel(store, ids, self.loader, self)
+        self.view.setModel(self.model)
+        self.status_label.setText(f"{self.model.rowCount()} canales")
+        self._visible_timer.start()
+
+    def visible_rows(self):
+        """
+        Filas de las celdas que se ven ahora en la cuadrícula.
+        """
+        grid = self.view.gridSize()
+        viewport = self.view.viewport().rect()
+        rows = set()
+        # Centro de cada celda, teniendo en cuenta la parte de la primera fila que queda por encima
+        first = grid.height() // 2 - self.view.verticalScrollBar().value() % grid.height()
+        for y in range(first, viewport.height() + grid.height(), grid.height()):
+            for x in range(grid.width() // 2, viewport.width(), grid.width()):
+                index = self.view.indexAt(QPoint(x, y))
+                if index.isValid():
+                    rows.add(index.row())
+        return sorted(rows)
+
+    def request_visible(self):
+        urls = [self.model.url(row) for row in self.visible_rows()]
+        self.loader.set_visible(urls)
+        for url in urls:
+            self.loader.request(url)
+
+    def refresh_visible(self):
+        self.loader.refresh([self.model.url(row) for row in self.visible_rows()])
+
+    def on_double_clicked(self, index):
+        if self.preview is not None and index.isValid():
+            self.preview(self.model.url(index.row()))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._visible_timer.start()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._visible_timer.start()
+
+    def closeEvent(self, event):
+        self.loader.set_visible([])  # Retirar de la cola las capturas que aún no han empezado
+        super().closeEvent(event)
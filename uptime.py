@@ -0,0 +1,467 @@
+"""
+uptime.py - Historial de disponibilidad y latencia de los canales para M3U Organizer
+
+Este módulo guarda cada resultado del análisis de canales (ver `probe.py`) como una muestra de una serie
+temporal: si el canal respondió, el tiempo hasta el primer byte (TTFB) y el bitrate, si se conoce. Con esas
+muestras se calcula la disponibilidad de cada canal y de cada servidor (host de la URL) en los últimos N días,
+para ordenar la lista por los canales más fiables y ver qué servidores fallan más.
+
+Todo se guarda en `cache/disponibilidad` de forma compacta, pensado para cientos de miles de canales
+analizados varias veces al día:
+
+- `urls.txt`: Diccionario de URLs, una por línea; el id de cada URL es su número de línea. Solo se añaden
+  líneas al final.
+- `muestras-AAAAMMDD.bin`: Muestras de un día, que solo se añaden al final. Cada muestra ocupa 16 bytes: cuatro
+  enteros sin signo (id de la URL, momento del análisis, TTFB en milisegundos —`NO_RESPONSE` si no
+  respondió y `NO_TTFB` si respondió sin un tiempo fiable— y bitrate en kb/s o 0 si se desconoce). Se
+  conservan `SAMPLE_RETENTION_DAYS` días.
+- `totales-AAAAMMDD.bin`: Totales acumulados de cada URL hasta el final de ese día (análisis, respuestas,
+  suma y número de TTFB, suma y número de bitrates), como arrays indexados por el id de la URL. Se escribe al
+  cerrar el día a partir de sus muestras y se conservan `TOTALS_RETENTION_DAYS` días.
+
+Como los totales son acumulados, las cifras de los últimos N días no dependen de N: son los totales de ayer
+menos los del día anterior a la ventana, más lo analizado hoy (que se lleva en memoria). La parte de los
+días cerrados se calcula una vez al día con unas pocas restas sobre arrays; lo de hoy se suma al consultar
+cada URL, así que las muestras nuevas no obligan a recalcular nada.
+
+Funciones:
+----------
+- day_key(timestamp=None): Día ('AAAAMMDD', hora local) de un momento dado, o de hoy.
+
+Clases:
+-------
+- ChannelUptime: Cifras de una URL o de un host en una ventana de días (análisis, disponibilidad, TTFB y
+  bitrate medios).
+- UptimeStore: Serie temporal de las muestras con sus totales diarios.
+
+    Methods:
+    - record(url, info): Añade el resultado de un análisis (se ignoran los ya registrados y los de días anteriores).
+    - flush(): Escribe en disco las muestras y URLs pendientes.
+    - channel_stats(url, days): Cifras de una URL en los últimos `days` días (None si nunca se ha analizado).
+    - host_stats(days, urls=None): Cifras por host en los últimos `days` días, de todas las URLs o de las indicadas.
+    - ranking_key(days): Función URL -> clave de orden, de la más disponible a la menos (las no analizadas al final).
+"""
+
+import logging
+import os
+import pickle
+import time
+import zlib
+from array import array
+from datetime import date, timedelta
+from operator import add, sub
+from pathlib import Path
+
+from channelstore import url_host
+
+# Directorio del script actual
+current_directory = Path(__file__).parent
+
+UPTIME_DIR = current_directory / "cache" / "disponibilidad"
+URLS_FILENAME = "urls.txt"
+SAMPLES_PREFIX = "muestras-"
+TOTALS_PREFIX = "totales-"
+TOTALS_VERSION = 2
+# Días que se conservan las muestras y los totales diarios
+SAMPLE_RETENTION_DAYS = 3
+TOTALS_RETENTION_DAYS = 31
+# Ventanas de días que se ofrecen para ordenar la lista y ver las cifras por host
+UPTIME_WINDOWS = (7, 30)
+# Archivos de totales que se mantienen leídos en memoria (los que restan las ventanas)
+TOTALS_CACHE_SIZE = 4
+# TTFB de una muestra sin respuesta
+NO_RESPONSE = 0xFFFFFFFF
+# TTFB de una muestra que respondió pero sin un tiempo fiable (p. ej., tras reintentar la petición)
+NO_TTFB = NO_RESPONSE - 1
+# Enteros por muestra: id de la URL, momento, TTFB (ms) y bitrate (kb/s)
+SAMPLE_FIELDS = 4
+# Columnas de los totales: análisis, respuestas, suma de TTFB (ms), TTFB conocidos, suma de bitrates (kb/s) y
+# bitrates conocidos
+TOTAL_COLUMNS = (("probes", 'I'), ("alive", 'I'), ("ttfb_ms", 'Q'), ("ttfbs", 'I'), ("bitrate_kbps", 'Q'),
+                 ("bitrates", 'I'))
+
+
+def day_key(timestamp=None):
+    return time.strftime("%Y%m%d", time.localtime(timestamp))
+
+
+def _shift_day(key, days):
+    day = date(int(key[:4]), int(key[4:6]), int(key[6:]))
+    return (day + timedelta(days=days)).strftime("%Y%m%d")
+
+
+def _padded(values, size):
+    """Array de `size` elementos: los totales de días anteriores no tienen las URLs añadidas después."""
+    if len(values) < size:
+        values = values + array(values.typecode, bytes(values.itemsize * (size - len(values))))
+    return values
+
+
+def _empty_totals(size=0):
+    return {name: array(typecode, bytes(array(typecode).itemsize * size)) for name, typecode in TOTAL_COLUMNS}
+
+
+class ChannelUptime:
+    __slots__ = ("probes", "alive", "ttfb_ms", "ttfbs", "bitrate_kbps", "bitrates", "channels")
+
+    def __init__(self, probes=0, alive=0, ttfb_ms=0, ttfbs=0, bitrate_kbps=0, bitrates=0, channels=1):
+        self.probes = probes
+        self.alive = alive
+        self.ttfb_ms = ttfb_ms  # Suma de los TTFB conocidos de las respuestas
+        self.ttfbs = ttfbs
+        self.bitrate_kbps = bitrate_kbps  # Suma de los bitrates conocidos
+        self.bitrates = bitrates
+        self.channels = channels  # URLs distintas sumadas (en las cifras por host)
+
+    def add(self, other):
+        self.probes += other.probes
+        self.alive += other.alive
+        self.ttfb_ms += other.ttfb_ms
+        self.ttfbs += other.ttfbs
+        self.bitrate_kbps += other.bitrate_kbps
+        self.bitrates += other.bitrates
+        self.channels += other.channels
+
+    @property
+    def availability(self):
+        return self.alive / self.probes if self.probes else None
+
+    @property
+    def average_ttfb(self):
+        return self.ttfb_ms / self.ttfbs if self.ttfbs else None
+
+    @property
+    def average_bitrate(self):
+        return self.bitrate_kbps / self.bitrates if self.bitrates else None
+
+    def describe(self):
+        if not self.probes:
+            return ""
+        parts = [f"disponible {self.availability:.0%} de {self.probes} análisis"]
+        if self.average_ttfb is not None:
+            parts.append(f"TTFB medio {self.average_ttfb:.0f} ms")
+        if self.average_bitrate is not None:
+            parts.append(f"{self.average_bitrate / 1000:.1f} Mb/s de media")
+        return ", ".join(parts)
+
+
+class UptimeStore:
+    def __init__(self, directory=UPTIME_DIR):
+        self.directory = Path(directory)
+        self._loaded = False
+        self._urls = []
+        self._url_ids = {}
+        self._hosts = []  # Host de cada URL, calculado al pedir las cifras por host
+        self._last_ts = array('I')  # Momento de la última muestra de cada URL
+        self._today = None
+        self._day = None  # Totales de hoy (los días cerrados están en los archivos de totales)
+        self._pending_urls = []
+        self._pending_samples = array('I')
+        self._closed_windows = {}  # (días, hoy) -> totales de los días ya cerrados de la ventana
+        self._writable = True
+        self._totals_cache = {}  # Día -> totales leídos de su archivo
+        self.version = 0  # Se incrementa con cada muestra nueva
+
+    # Carga (la primera vez que se usa)
+
+    def _path(self, prefix, key):
+        return self.directory / f"{prefix}{key}.bin"
+
+    def _days(self, prefix):
+        keys = []
+        if self.directory.exists():
+            for path in self.directory.glob(f"{prefix}*.bin"):
+                key = path.stem[len(prefix):]
+                if len(key) == 8 and key.isdigit():
+                    keys.append(key)
+        return sorted(keys)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            self._urls = self._read_urls()
+        except OSError as e:
+            # Sin el diccionario no se pueden añadir muestras sin mezclar los ids: solo se usa en memoria
+            logging.warning(f"No se pudo leer el historial de disponibilidad: {e}")
+            self._writable = False
+        self._url_ids = {url: url_id for url_id, url in enumerate(self._urls)}
+        self._last_ts = array('I', bytes(4 * len(self._urls)))
+        self._today = day_key()
+        self._close_days()
+        latest = self._totals_before(self._today)
+        if latest is not None:
+            self._last_ts = _padded(array('I', latest["last_ts"]), len(self._urls))
+        self._day = self._totals_from_samples(_empty_totals(), self._today)
+        self._prune()
+
+    def _read_urls(self):
+        try:
+            with open(self.directory / URLS_FILENAME, "r+b") as file:
+                data = file.read()
+                complete = data.rfind(b"\n") + 1
+                if complete < len(data):
+                    # Última línea a medio escribir: se descarta para que la siguiente URL empiece en su línea
+                    file.truncate(complete)
+        except FileNotFoundError:
+            return []
+        return data[:complete].decode("utf-8").split("\n")[:-1]
+
+    def _read_samples(self, key):
+        samples = array('I')
+        try:
+            with open(self._path(SAMPLES_PREFIX, key), "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return samples
+        samples.frombytes(data[:len(data) - len(data) % (4 * SAMPLE_FIELDS)])  # Sin una muestra a medio escribir
+        return samples
+
+    def _totals_from_samples(self, base, key):
+        """Suma a `base` (y a la última muestra de cada URL) las muestras del día `key`."""
+        samples = self._read_samples(key)
+        size = len(self._urls)
+        totals = {name: _padded(array(values.typecode, values), size) for name, values in base.items() if name != "last_ts"}
+        for url_id, ts, ttfb, bitrate in zip(*(samples[field::SAMPLE_FIELDS] for field in range(SAMPLE_FIELDS))):
+            if url_id >= size:
+                continue  # Muestra de una URL que no llegó a guardarse en el diccionario
+            self._add_sample(totals, url_id, ttfb, bitrate)
+            if ts > self._last_ts[url_id]:
+                self._last_ts[url_id] = ts
+        return totals
+
+    @staticmethod
+    def _add_sample(totals, url_id, ttfb, bitrate):
+        totals["probes"][url_id] += 1
+        if ttfb != NO_RESPONSE:
+            totals["alive"][url_id] += 1
+            if ttfb != NO_TTFB:
+                totals["ttfb_ms"][url_id] += ttfb
+                totals["ttfbs"][url_id] += 1
+        if bitrate:
+            totals["bitrate_kbps"][url_id] += bitrate
+            totals["bitrates"][url_id] += 1
+
+    def _read_totals(self, key):
+        # Los totales de un día no cambian una vez escritos: se guardan los últimos leídos
+        columns = self._totals_cache.get(key)
+        if columns is not None:
+            return columns
+        try:
+            with open(self._path(TOTALS_PREFIX, key), "rb") as file:
+                state = pickle.loads(zlib.decompress(file.read()))
+        except (OSError, pickle.UnpicklingError, EOFError, zlib.error) as e:
+            logging.warning(f"No se pudieron leer los totales de disponibilidad del {key}: {e}")
+            return None
+        if not isinstance(state, dict) or state.get("version") != TOTALS_VERSION:
+            return None
+        if len(self._totals_cache) >= TOTALS_CACHE_SIZE:
+            self._totals_cache.clear()
+        columns = self._totals_cache[key] = state["columns"]
+        return columns
+
+    def _totals_before(self, key):
+        """Totales acumulados hasta el final del día anterior a `key` (los del último día guardado antes)."""
+        previous = [day for day in self._days(TOTALS_PREFIX) if day < key]
+        return self._read_totals(previous[-1]) if previous else None
+
+    def _write_totals(self, key, totals):
+        if not self._writable:
+            return
+        columns = dict(totals, last_ts=self._last_ts)
+        data = zlib.compress(pickle.dumps({"version": TOTALS_VERSION, "columns": columns},
+                                          protocol=pickle.HIGHEST_PROTOCOL), 1)
+        path = self._path(TOTALS_PREFIX, key)
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)  # Sustitución atómica
+
+    def _close_days(self):
+        """Escribe los totales de los días anteriores a hoy que tienen muestras y aún no los tienen."""
+        closed = set(self._days(TOTALS_PREFIX))
+        for key in self._days(SAMPLES_PREFIX):
+            if key >= self._today or key in closed:
+                continue
+            base = self._totals_before(key) or _empty_totals()
+            self._last_ts = _padded(array('I', base.get("last_ts", ())), len(self._urls))
+            try:
+                self._write_totals(key, self._totals_from_samples(base, key))
+            except OSError as e:
+                logging.warning(f"No se pudieron guardar los totales de disponibilidad del {key}: {e}")
+
+    def _prune(self):
+        if not self._writable:
+            return
+        for prefix, days in ((SAMPLES_PREFIX, SAMPLE_RETENTION_DAYS), (TOTALS_PREFIX, TOTALS_RETENTION_DAYS)):
+            old = [key for key in self._days(prefix) if key < _shift_day(self._today, -days)]
+            if prefix == TOTALS_PREFIX:
+                old = old[:-1]  # El último anterior a la ventana hace falta para restarlo
+            for key in old:
+                try:
+                    os.remove(self._path(prefix, key))
+                except OSError:
+                    pass
+
+    # Registro de muestras
+
+    def _roll_day(self):
+        """Al cambiar de día, guarda los totales del día que termina y empieza uno nuevo."""
+        today = day_key()
+        if today == self._today:
+            return
+        self.flush()
+        base = self._totals_before(self._today) or _empty_totals()
+        try:
+            self._write_totals(self._today, {
+                name: array(values.typecode, map(add, _padded(base[name], len(values)), values))
+                for name, values in self._day.items()})
+        except OSError as e:
+            logging.warning(f"No se pudieron guardar los totales de disponibilidad del {self._today}: {e}")
+        self._today = today
+        self._day = _empty_totals(len(self._urls))
+        self._closed_windows.clear()
+        self._prune()
+
+    def _url_id(self, url):
+        url_id = self._url_ids.get(url)
+        if url_id is None:
+            url_id = self._url_ids[url] = len(self._urls)
+            self._urls.append(url)
+            self._pending_urls.append(url)
+            self._last_ts.append(0)
+            for values in self._day.values():
+                values.append(0)
+        return url_id
+
+    def record(self, url, info):
+        """
+        Añade el resultado de un análisis. Los resultados que vuelve a emitir la caché del análisis (con el
+        mismo momento que uno ya registrado) o que son de días anteriores no se vuelven a contar.
+        """
+        if not info or not url or "\n" in url:
+            return False
+        self._ensure_loaded()
+        self._roll_day()
+        ts = int(info.get("ts", 0))
+        if day_key(ts) != self._today:
+            return False
+        url_id = self._url_id(url)
+        if ts <= self._last_ts[url_id]:
+            return False
+        self._last_ts[url_id] = ts
+        ttfb = NO_RESPONSE
+        if info.get("estado") == "alive":
+            ttfb = NO_TTFB if info.get("ttfb") is None else min(int(info["ttfb"] * 1000), NO_TTFB - 1)
+        bitrate = min(int(info.get("bitrate") or 0) // 1000, NO_RESPONSE)
+        self._pending_samples.extend((url_id, ts, ttfb, bitrate))
+        self._add_sample(self._day, url_id, ttfb, bitrate)
+        self.version += 1
+        return True
+
+    def flush(self):
+        if not self._writable or not (self._pending_urls or self._pending_samples):
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Primero las URLs: una muestra nunca hace referencia a un id que no esté en el diccionario
+            if self._pending_urls:
+                with open(self.directory / URLS_FILENAME, "a", encoding="utf-8") as file:
+                    file.write("".join(url + "\n" for url in self._pending_urls))
+                self._pending_urls = []
+            with open(self._path(SAMPLES_PREFIX, self._today), "ab") as file:
+                partial = file.tell() % (4 * SAMPLE_FIELDS)
+                if partial:
+                    file.truncate(file.tell() - partial)  # Muestra a medio escribir en un cierre inesperado
+                self._pending_samples.tofile(file)
+            self._pending_samples = array('I')
+        except OSError as e:
+            logging.warning(f"No se pudo guardar el historial de disponibilidad: {e}")
+
+    # Consultas
+
+    def _closed(self, days):
+        """
+        Totales de cada URL en los días ya cerrados de la ventana de `days` días (los `days - 1` anteriores a
+        hoy). No cambian hasta el día siguiente, así que se calculan una vez por día; lo de hoy se suma al
+        consultar cada URL.
+        """
+        self._ensure_loaded()
+        self._roll_day()
+        cache_key = (days, self._today)
+        closed = self._closed_windows.get(cache_key)
+        if closed is None:
+            closed = _empty_totals(len(self._urls))
+            until = self._totals_before(self._today) if days > 1 else None
+            if until is not None:
+                since = self._totals_before(_shift_day(self._today, 1 - days)) or _empty_totals()
+                for name, typecode in TOTAL_COLUMNS:
+                    closed[name] = array(typecode, map(sub, _padded(until[name], len(self._urls)),
+                                                       _padded(since[name], len(self._urls))))
+            self._closed_windows[cache_key] = closed
+        for name, values in closed.items():
+            if len(values) < len(self._urls):  # URLs vistas por primera vez hoy
+                values.frombytes(bytes(values.itemsize * (len(self._urls) - len(values))))
+        return closed
+
+    def _stats(self, closed, url_id):
+        return ChannelUptime(*(closed[name][url_id] + self._day[name][url_id] for name, _ in TOTAL_COLUMNS))
+
+    def channel_stats(self, url, days):
+        self._ensure_loaded()
+        url_id = self._url_ids.get(url)
+        if url_id is None:
+            return None
+        stats = self._stats(self._closed(days), url_id)
+        return stats if stats.probes else None
+
+    def host_stats(self, days, urls=None):
+        """
+        Devuelve {host: ChannelUptime} con las cifras de cada host en los últimos `days` días. Si se indican
+        `urls`, solo se cuentan esas (por ejemplo, las de la lista cargada).
+        """
+        closed = self._closed(days)
+        if len(self._hosts) < len(self._urls):
+            self._hosts.extend(url_host(url) for url in self._urls[len(self._hosts):])
+        if urls is None:
+            url_ids = range(len(self._urls))
+        else:
+            url_ids = {self._url_ids[url] for url in urls if url in self._url_ids}
+        columns = [(closed[name], self._day[name]) for name, _ in TOTAL_COLUMNS]
+        (closed_probes, day_probes), others = columns[0], columns[1:]
+        hosts_of = self._hosts
+        totals = {}  # Host -> [análisis, respuestas, suma de TTFB, TTFB, suma de bitrates, bitrates, URLs]
+        for url_id in url_ids:
+            probes = closed_probes[url_id] + day_probes[url_id]
+            if not probes:
+                continue
+            host = hosts_of[url_id]
+            host_totals = totals.get(host)
+            if host_totals is None:
+                host_totals = totals[host] = [0] * (len(TOTAL_COLUMNS) + 1)
+            host_totals[0] += probes
+            for index, (closed_values, day_values) in enumerate(others, 1):
+                host_totals[index] += closed_values[url_id] + day_values[url_id]
+            host_totals[-1] += 1
+        return {host: ChannelUptime(*values[:-1], channels=values[-1]) for host, values in totals.items()}
+
+    def ranking_key(self, days):
+        """
+        Devuelve una función URL -> clave para `sorted` que ordena de la más disponible a la menos y, a igual
+        disponibilidad, de la que antes responde a la que más tarda. Las URLs sin análisis van al final.
+        """
+        closed = self._closed(days)
+        columns = [(closed[name], self._day[name]) for name in ("probes", "alive", "ttfb_ms", "ttfbs")]
+        url_ids = self._url_ids
+
+        def key(url):
+            url_id = url_ids.get(url)
+            if url_id is None:
+                return (1, 0.0, 0.0)
+            probes, responses, ttfb, ttfbs = (closed_values[url_id] + day_values[url_id]
+                                              for closed_values, day_values in columns)
+            if not probes:
+                return (1, 0.0, 0.0)
+            return (0, -responses / probes, ttfb / ttfbs if ttfbs else float("inf"))
+        return key
@@ -0,0 +1,139 @@
+"""
+watcher.py - Vigilancia de listas M3U locales para M3U Organizer
+
+Este módulo vigila el archivo de la lista cargada y avisa cuando cambia. Para cada archivo se recuerda hasta
+qué byte se ha leído y una huella de su principio y de los últimos bytes leídos: si al cambiar el archivo
+esas partes siguen iguales y el archivo es más grande, solo se le han añadido líneas al final y basta con
+leer esa cola nueva. En cualquier otro caso (líneas editadas o borradas) hay que volver a leer la lista.
+En una lista comprimida no se pueden leer solo los bytes añadidos, así que cualquier cambio obliga a releerla.
+
+Clases:
+-------
+- PlaylistWatcher(QObject): Vigila un archivo y determina si solo ha crecido.
+
+    Signals:
+    - appended (list): Emitida con las líneas completas añadidas al final del archivo.
+    - rewritten (str): Emitida con la ruta del archivo cuando ha cambiado de otra forma y hay que releerlo.
+
+    Methods:
+    - watch(path, encoding): Empieza a vigilar un archivo ya leído hasta el final.
+    - sync(): Da por leído el archivo tal y como está ahora (p. ej. tras releerlo completo).
+    - stop(): Deja de vigilar el archivo.
+"""
+
+import os
+
+from compression import MAGIC_SIZE, detect_compression
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+# Bytes que se comparan al principio del archivo y antes del último byte leído
+FINGERPRINT_SIZE = 4096
+
+
+class PlaylistWatcher(QObject):
+    appended = pyqtSignal(list)
+    rewritten = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.path = None
+        self.encoding = None
+        self.offset = 0  # Bytes ya leídos (siempre al final de una línea completa)
+        self._head = b''
+        self._before_offset = b''
+        self._mtime = 0
+        self._compressed = False
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+
+        # Los programas que escriben la lista suelen hacerlo en varias operaciones seguidas
+        self._check_timer = QTimer(self)
+        self._check_timer.setSingleShot(True)
+        self._check_timer.setInterval(300)
+        self._check_timer.timeout.connect(self.check)
+
+    def watch(self, path, encoding=None):
+        self.stop()
+        self.path = path
+        self.encoding = encoding or 'utf-8'
+        self.sync()
+        self._watcher.addPath(path)
+
+    def stop(self):
+        if self._watcher.files():
+            self._watcher.removePaths(self._watcher.files())
+        self._check_timer.stop()
+        self.path = None
+
+    def sync(self):
+        """
+        Toma el contenido actual del archivo como ya leído, hasta su última línea completa.
+        """
+        with open(self.path, 'rb') as file:
+            head = file.read(FINGERPRINT_SIZE)
+            self._compressed = detect_compression(head[:MAGIC_SIZE]) is not None
+            end = os.fstat(file.fileno()).st_size
+            # Buscar hacia atrás el último salto de línea sin leer el archivo entero (en una lista
+            # comprimida se toma el archivo completo)
+            while end > 0 and not self._compressed:
+                start = max(end - 65536, 0)
+                file.seek(start)
+                chunk = file.read(end - start)
+                newline = chunk.rfind(b'\n')
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            file.seek(max(end - FINGERPRINT_SIZE, 0))
+            before_offset = file.read(min(end, FINGERPRINT_SIZE))
+            self._remember(head, before_offset, end, os.fstat(file.fileno()).st_mtime)
+
+    def _remember(self, head, before_offset, offset, mtime):
+        self._head = head
+        self._before_offset = before_offset
+        self.offset = offset
+        self._mtime = mtime
+
+    def _on_file_changed(self, path):
+        # Algunos editores sustituyen el archivo por uno nuevo: hay que volver a vigilarlo
+        if path not in self._watcher.files() and os.path.exists(path):
+            self._watcher.addPath(path)
+        self._check_timer.start()
+
+    def check(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            size = stat.st_size
+            if self._compressed:
+                if size != self.offset or stat.st_mtime != self._mtime:
+                    self.rewritten.emit(self.path)
+                return
+            if size < self.offset or file.read(len(self._head)) != self._head:
+                self.rewritten.emit(self.path)
+                return
+            start = max(self.offset - FINGERPRINT_SIZE, 0)
+            file.seek(start)
+            if file.read(self.offset - start) != self._before_offset:
+                self.rewritten.emit(self.path)
+                return
+            if size == self.offset:
+                if stat.st_mtime != self._mtime:
+                    # Mismo tamaño pero contenido modificado en medio del archivo
+                    self.rewritten.emit(self.path)
+                return
+            tail = file.read(size - self.offset)
+
+        # Solo se procesan las líneas completas; una línea a medio escribir se leerá en el siguiente cambio
+        end = tail.rfind(b'\n') + 1
+        if not end:
+            return
+        offset = self.offset + end
+        before_offset = (self._before_offset + tail[:end])[-FINGERPRINT_SIZE:]
+        head = self._head
+        if len(head) < FINGERPRINT_SIZE:
+            head = (head + tail[:end])[:FINGERPRINT_SIZE]
+        self._remember(head, before_offset, offset, stat.st_mtime)
+        lines = tail[:end].decode(self.encoding, errors='ignore').splitlines()
+        self.appended.emit(lines)
@@ -0,0 +1,557 @@
+"""
+widgets.py - Widgets personalizados de M3U Organizer
+
+Este módulo contiene los widgets propios que usan los paneles de canales de la aplicación.
+
+Los canales se arrastran entre paneles como referencias (clave del almacén + ids de los canales) con el
+tipo MIME `CHANNEL_IDS_MIME`, de modo que mover o copiar una selección de 100.000 canales no obliga a
+copiar ni volver a trocear su texto.
+
+Funciones:
+----------
+- encode_channel_ids(store, ids): Codifica una referencia a canales para QMimeData.
+- decode_channel_ids(data): Devuelve (almacén, ids) a partir de los datos codificados.
+
+Clases:
+-------
+- ChannelTextEdit(QTextEdit): Editor de texto para listas M3U que dibuja, en un margen a la izquierda,
+  el logo (tvg-logo) de cada línea #EXTINF visible. Los logos se piden a un `LogoLoader` únicamente
+  para las líneas que están en pantalla, por lo que el coste no depende del tamaño de la lista.
+  Al arrastrar una selección incluye también las referencias a los canales seleccionados. Deshacer y
+  rehacer (Ctrl+Z / Ctrl+Y) se dejan al historial de la ventana. Como cada línea corresponde a un canal,
+  no admite ediciones que añadan o quiten líneas (saltos de línea, pegar o soltar varias líneas o canales).
+
+    Signals:
+    - lines_changed (): Emitida si, aun así, una acción del usuario ha añadido o quitado líneas.
+- ChannelListModel(QAbstractListModel): Modelo del panel derecho ("constructor" de listas). Cada fila es
+  una referencia (almacén, id) a un canal cargado; mover, copiar o reordenar filas solo manipula esas
+  referencias.
+- ChannelListView(QListView): Vista del panel derecho con arrastrar y soltar de referencias.
+"""
+
+import itertools
+import uuid
+from array import array
+
+from PyQt5.QtCore import (QAbstractListModel, QByteArray, QEvent, QItemSelection, QItemSelectionModel, QMimeData,
+                          QModelIndex, QPoint, QRect, QTimer, Qt, pyqtSignal)
+from PyQt5.QtGui import QKeySequence, QPainter
+from PyQt5.QtWidgets import QAbstractItemView, QListView, QTextEdit, QWidget
+
+from channelstore import M3UParser, get_store
+from history import Operation, encode_ids
+from logos import LOGO_SIZE, extract_tvg_logo
+
+CHANNEL_IDS_MIME = "application/x-m3u-channel-ids"
+# Por encima de este número de canales no se añade la versión en texto al arrastrar (sería muy costosa)
+MAX_TEXT_DRAG_CHANNELS = 5000
+
+
+# Identifica esta ejecución del programa: las claves de los almacenes solo valen dentro de ella, así que las
+# referencias copiadas desde otra instancia (o antes de reiniciar) se ignoran y se usa su texto
+_PROCESS_ID = uuid.uuid4().bytes
+
+
+def encode_channel_ids(store, ids):
+    data = array('I', [store.key])
+    data.extend(ids)
+    return QByteArray(_PROCESS_ID + data.tobytes())
+
+
+def decode_channel_ids(data):
+    data = bytes(data)
+    prefix = len(_PROCESS_ID)
+    if data[:prefix] != _PROCESS_ID or (len(data) - prefix) % 4:
+        return None, []
+    values = array('I')
+    values.frombytes(data[prefix:])
+    store = get_store(values[0]) if values else None
+    if store is None or (len(values) > 1 and max(values[1:]) >= len(store)):
+        return None, []
+    return store, values[1:].tolist()
+
+
+class _LogoArea(QWidget):
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+
+    def paintEvent(self, event):
+        self.editor.paint_logo_area(event)
+
+
+class ChannelTextEdit(QTextEdit):
+    LOGO_MARGIN = LOGO_SIZE + 6
+    lines_changed = pyqtSignal()
+
+    def __init__(self, parent=None, logo_loader=None):
+        super().__init__(parent)
+        self.logo_loader = None
+        self.logo_area = _LogoArea(self)
+        # Función (primer_bloque, último_bloque) -> (almacén, ids) que la ventana principal puede asignar
+        # para que las selecciones arrastradas lleven las referencias a sus canales
+        self.channel_ids_provider = None
+
+        # Agrupar las peticiones de logos mientras el usuario se desplaza
+        self._visible_timer = QTimer(self)
+        self._visible_timer.setSingleShot(True)
+        self._visible_timer.setInterval(150)
+        self._visible_timer.timeout.connect(self._request_visible_logos)
+
+        self.verticalScrollBar().valueChanged.connect(self._on_view_changed)
+        self.document().contentsChanged.connect(self._on_view_changed)
+        self.set_logo_loader(logo_loader)
+
+    def event(self, event):
+        # Deshacer y rehacer los gestiona el historial de la ventana (ver history.py), no el documento
+        if event.type() == QEvent.ShortcutOverride and (event.matches(QKeySequence.Undo) or event.matches(QKeySequence.Redo)):
+            event.ignore()
+            return False
+        return super().event(event)
+
+    # Cada línea del panel corresponde a un canal (ver `channel_ids_provider`): se rechazan las ediciones que
+    # añaden o quitan líneas y, si alguna llega a hacerlo (p. ej. un arrastre movido a otra aplicación), se avisa
+    # con `lines_changed` para que la ventana vuelva a mostrar la vista
+
+    def _spans_lines(self, cursor):
+        document = self.document()
+        return document.findBlock(cursor.selectionStart()) != document.findBlock(cursor.selectionEnd())
+
+    def _would_change_lines(self, event):
+        if self.isReadOnly():
+            return False
+        key = event.key()
+        if key in (Qt.Key_Return, Qt.Key_Enter):
+            return True
+        cursor = self.textCursor()
+        if not (event.text().isprintable() and event.text()) and key not in (Qt.Key_Backspace, Qt.Key_Delete) \
+                and not event.matches(QKeySequence.Cut):
+            return False  # No modifica el texto
+        if cursor.hasSelection():
+            return self._spans_lines(cursor)
+        return (key == Qt.Key_Backspace and cursor.atBlockStart()) or (key == Qt.Key_Delete and cursor.atBlockEnd())
+
+    def _rejects(self, source):
+        # Referencias a canales (del panel derecho) o varias líneas de texto
+        text = source.text() if source.hasText() else ''
+        return source.hasFormat(CHANNEL_IDS_MIME) or any(separator in text for separator in '\r\n\u2029')
+
+    def _guarded(self, handler, event):
+        count = self.document().blockCount()
+        handler(event)
+        if self.document().blockCount() != count:
+            self.lines_changed.emit()
+
+    def keyPressEvent(self, event):
+        if self._would_change_lines(event):
+            event.accept()
+            return
+        self._guarded(super().keyPressEvent, event)
+
+    def canInsertFromMimeData(self, source):
+        return not self._rejects(source) and super().canInsertFromMimeData(source)
+
+    def insertFromMimeData(self, source):
+        # Al pegar se sustituye la selección (al soltar el cursor ya está en el punto de destino, sin selección)
+        if not self._rejects(source) and not self._spans_lines(self.textCursor()):
+            self._guarded(super().insertFromMimeData, source)
+
+    def dropEvent(self, event):
+        self._guarded(super().dropEvent, event)
+
+    def mouseMoveEvent(self, event):
+        # Un arrastre empieza aquí y, si termina moviendo el texto a otro sitio, lo borra del panel
+        self._guarded(super().mouseMoveEvent, event)
+
+    def set_logo_loader(self, logo_loader):
+        self.logo_loader = logo_loader
+        if logo_loader is not None:
+            logo_loader.logo_ready.connect(lambda url: self.logo_area.update())
+            self.setViewportMargins(self.LOGO_MARGIN, 0, 0, 0)
+            self.logo_area.show()
+        else:
+            self.setViewportMargins(0, 0, 0, 0)
+            self.logo_area.hide()
+
+    def selected_channels(self):
+        """
+        Devuelve (almacén, ids) de los canales que tocan la selección actual, o (None, []).
+        """
+        cursor = self.textCursor()
+        if self.channel_ids_provider is None or not cursor.hasSelection():
+            return None, []
+        document = self.document()
+        first = document.findBlock(cursor.selectionStart()).blockNumber()
+        last = document.findBlock(cursor.selectionEnd()).blockNumber()
+        return self.channel_ids_provider(first, last)
+
+    def createMimeDataFromSelection(self):
+        mime = super().createMimeDataFromSelection()
+        store, ids = self.selected_channels()
+        if store is None or not ids:
+            return mime
+        # El QMimeData de QTextEdit solo anuncia sus propios formatos: se copia el texto a uno nuevo
+        channels = QMimeData()
+        channels.setText(mime.text())
+        channels.setData(CHANNEL_IDS_MIME, encode_channel_ids(store, ids))
+        return channels
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        rect = self.contentsRect()
+        self.logo_area.setGeometry(QRect(rect.left(), rect.top(), self.LOGO_MARGIN, rect.height()))
+        self._on_view_changed()
+
+    def _on_view_changed(self):
+        self.logo_area.update()
+        if self.logo_loader is not None:
+            self._visible_timer.start()
+
+    def visible_blocks(self):
+        """
+        Genera pares (bloque, top) para los bloques de texto visibles, donde `top` es la coordenada
+        vertical del bloque relativa al viewport.
+        """
+        layout = self.document().documentLayout()
+        offset = self.verticalScrollBar().value()
+        height = self.viewport().height()
+        block = self.cursorForPosition(QPoint(0, 0)).block()
+        while block.isValid():
+            top = layout.blockBoundingRect(block).top() - offset
+            if top > height:
+                break
+            yield block, top
+            block = block.next()
+
+    def _request_visible_logos(self):
+        urls = []
+        for block, _ in self.visible_blocks():
+            text = block.text()
+            if text.startswith("#EXTINF:"):
+                url = extract_tvg_logo(text)
+                if url:
+                    urls.append(url)
+        self.logo_loader.set_visible(urls)
+        for url in urls:
+            self.logo_loader.request(url)
+
+    def paint_logo_area(self, event):
+        if self.logo_loader is None:
+            return
+        painter = QPainter(self.logo_area)
+        painter.fillRect(event.rect(), self.palette().window())
+        layout = self.document().documentLayout()
+        for block, top in self.visible_blocks():
+            text = block.text()
+            if not text.startswith("#EXTINF:"):
+                continue
+            pixmap = self.logo_loader.pixmap(extract_tvg_logo(text))
+            if pixmap is None:
+                continue
+            line_height = int(layout.blockBoundingRect(block).height())
+            x = (self.LOGO_MARGIN - pixmap.width()) // 2
+            y = int(top) + max(0, (line_height - pixmap.height()) // 2)
+            painter.drawPixmap(x, y, pixmap)
+        painter.end()
+
+
+class ChannelListModel(QAbstractListModel):
+    def __init__(self, parent=None, logo_loader=None):
+        super().__init__(parent)
+        self.rows = []  # Referencias (almacén, id) a los canales, en el orden de la lista
+        self.logo_loader = logo_loader
+        self.text_store = None  # Almacén en el que se guardan los canales que llegan como texto M3U
+        self.version = 0  # Se incrementa con cada cambio (lo usan, p. ej., las cachés de exportación)
+        self.history = None  # Historial (ver history.py) en el que se registran los cambios de las filas
+        if logo_loader is not None:
+            logo_loader.logo_ready.connect(self._on_logo_ready)
+        self.modelReset.connect(self._bump_version)
+        self.rowsInserted.connect(self._bump_version)
+        self.rowsRemoved.connect(self._bump_version)
+        self.dataChanged.connect(self._on_data_changed)
+
+    def _bump_version(self, *args):
+        self.version += 1
+
+    def _on_data_changed(self, top_left, bottom_right, roles=()):
+        if list(roles) != [Qt.DecorationRole]:  # La llegada de un logo no cambia la lista
+            self.version += 1
+
+    def _on_logo_ready(self, url):
+        if self.rows:
+            # Solo se vuelven a pintar las filas visibles, así que basta con avisar de un cambio global
+            self.dataChanged.emit(self.index(0), self.index(len(self.rows) - 1), [Qt.DecorationRole])
+
+    # Interfaz de QAbstractListModel -------------------------------------------------------------
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        store, channel_id = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return store.name[channel_id]
+        if role == Qt.ToolTipRole:
+            group = store.group[channel_id]
+            return f"{group}\n{store.url[channel_id]}" if group else store.url[channel_id]
+        if role == Qt.DecorationRole and self.logo_loader is not None:
+            # data() solo se pide para las filas visibles: solo se descargan sus logos
+            url = extract_tvg_logo(store.extinf[channel_id])
+            if url:
+                pixmap = self.logo_loader.pixmap(url)
+                if pixmap is None:
+                    self.logo_loader.request(url)
+                return pixmap
+        return None
+
+    def flags(self, index):
+        default = Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+        return default if index.isValid() else Qt.ItemIsDropEnabled
+
+    def supportedDropActions(self):
+        return Qt.CopyAction | Qt.MoveAction
+
+    def mimeTypes(self):
+        return [CHANNEL_IDS_MIME, "text/plain"]
+
+    def mimeData(self, indexes):
+        rows = sorted({index.row() for index in indexes})
+        refs = [self.rows[row] for row in rows]
+        mime = QMimeData()
+        stores = {store for store, _ in refs}
+        if len(stores) == 1:
+            mime.setData(CHANNEL_IDS_MIME, encode_channel_ids(refs[0][0], [channel_id for _, channel_id in refs]))
+        if len(refs) <= MAX_TEXT_DRAG_CHANNELS:
+            mime.setText("\n".join(self.iter_lines(refs)))
+        return mime
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if action == Qt.IgnoreAction:
+            return True
+        refs = self.refs_from_mime(data)
+        if not refs:
+            return False
+        self.insert_refs(row if row >= 0 else len(self.rows), refs)
+        return True
+
+    # Operaciones sobre las referencias ---------------------------------------------------------
+
+    def refs_from_mime(self, data):
+        """
+        Devuelve las referencias (almacén, id) que contiene un QMimeData: directamente si trae ids de
+        canales, o analizando su texto M3U y guardándolo en `text_store`.
+        """
+        if data.hasFormat(CHANNEL_IDS_MIME):
+            store, ids = decode_channel_ids(data.data(CHANNEL_IDS_MIME))
+            if store is not None:
+                return [(store, channel_id) for channel_id in ids]
+        if data.hasText() and self.text_store is not None:
+            parser = M3UParser(self.text_store)
+            ids = [channel_id for channel_id in map(parser.feed, data.text().splitlines()) if channel_id is not None]
+            return [(self.text_store, channel_id) for channel_id in ids]
+        return []
+
+    def iter_lines(self, refs=None):
+        """
+        Genera las líneas M3U de las filas indicadas (por defecto, de toda la lista).
+        """
+        for store, channel_id in (self.rows if refs is None else refs):
+            yield from store.record_lines(channel_id)
+
+    def _record(self, description, undo_call, redo_call):
+        # Los argumentos llevan referencias (almacén, id): quien sustituya un almacén vacía el historial
+        if self.history is not None:
+            self.history.push(Operation(description, self, undo_call, redo_call))
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        # La usa Qt al terminar un arrastre con acción de mover hacia otro widget
+        if parent.isValid() or row < 0 or count <= 0 or row + count > len(self.rows):
+            return False
+        refs = self.rows[row:row + count]
+        self.beginRemoveRows(parent, row, row + count - 1)
+        del self.rows[row:row + count]
+        self.endRemoveRows()
+        self._record("Quitar canales", ("insert_refs", (row, refs)), ("removeRows", (row, count)))
+        return True
+
+    def insert_refs(self, row, refs):
+        if not refs:
+            return
+        refs = list(refs)
+        self.beginInsertRows(QModelIndex(), row, row + len(refs) - 1)
+        self.rows[row:row] = refs
+        self.endInsertRows()
+        self._record("Añadir canales", ("removeRows", (row, len(refs))), ("insert_refs", (row, refs)))
+
+    def append_ids(self, store, ids):
+        self.insert_refs(len(self.rows), [(store, channel_id) for channel_id in ids])
+
+    def remove_rows(self, rows):
+        """
+        Elimina las filas indicadas reconstruyendo la lista en una sola pasada.
+        """
+        if not rows:
+            return
+        removed = sorted(set(rows))
+        refs = [self.rows[row] for row in removed]
+        removed_set = set(removed)
+        self.beginResetModel()
+        self.rows = [ref for row, ref in enumerate(self.rows) if row not in removed_set]
+        self.endResetModel()
+        self._record("Eliminar canales", ("_restore_rows", (removed, refs)), ("remove_rows", (removed,)))
+
+    def _restore_rows(self, rows, refs, kept=None):
+        """
+        Vuelve a colocar las referencias `refs` en las posiciones `rows` (ordenadas) de las que se quitaron.
+        `kept` son las filas restantes (por defecto, las actuales).
+        """
+        kept = iter(self.rows if kept is None else kept)
+        restored = []
+        for row, ref in zip(rows, refs):
+            restored.extend(itertools.islice(kept, row - len(restored)))
+            restored.append(ref)
+        restored.extend(kept)
+        self.beginResetModel()
+        self.rows = restored
+        self.endResetModel()
+
+    def move_rows(self, rows, destination):
+        """
+        Mueve las filas indicadas (en su orden actual) delante de la fila `destination`.
+        Coste proporcional a la lista, independientemente del número de filas movidas.
+        """
+        moved = set(rows)
+        if not moved:
+            return
+        rows = sorted(moved)
+        moving = [self.rows[row] for row in rows]
+        first = destination - sum(1 for row in moved if row < destination)
+        kept = [ref for row, ref in enumerate(self.rows) if row not in moved]
+        self.beginResetModel()
+        self.rows = kept[:first] + moving + kept[first:]
+        self.endResetModel()
+        self._record("Mover canales", ("_unmove_rows", (rows, first)), ("move_rows", (rows, destination)))
+
+    def _unmove_rows(self, rows, first):
+        """
+        Deshace `move_rows`: devuelve el bloque movido, que empieza en `first`, a sus filas originales `rows`.
+        """
+        end = first + len(rows)
+        self._restore_rows(rows, self.rows[first:end], kept=self.rows[:first] + self.rows[end:])
+
+    def sort_by(self, key, reverse=False):
+        order = encode_ids(sorted(range(len(self.rows)), key=lambda row: key(*self.rows[row]), reverse=reverse))
+        self._apply_order(order)
+        self._record("Ordenar canales", ("_apply_order", (order, True)), ("_apply_order", (order,)))
+
+    def _apply_order(self, order, inverse=False):
+        """
+        Reordena las filas según la permutación `order` (posición nueva -> posición anterior) o su inversa.
+        """
+        if inverse:
+            rows = [None] * len(self.rows)
+            for position, row in enumerate(order):
+                rows[row] = self.rows[position]
+        else:
+            rows = [self.rows[row] for row in order]
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+    def remap_store(self, old, new, mapping):
+        """
+        Sustituye las referencias a canales de `old` por sus equivalentes en `new` según `mapping`
+        (id antiguo -> id nuevo). Las referencias a canales que ya no existen se eliminan.
+        """
+        self.beginResetModel()
+        self.rows = [(new, mapping[channel_id]) if store is old else (store, channel_id)
+                     for store, channel_id in self.rows
+                     if store is not old or channel_id in mapping]
+        self.endResetModel()
+
+    def set_row(self, row, ref):
+        self.rows[row] = ref
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def clear(self):
+        rows = self.rows
+        self.beginResetModel()
+        self.rows = []
+        self.endResetModel()
+        if rows:
+            self._record("Vaciar la lista nueva", ("set_rows", (rows,)), ("clear", ()))
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = list(rows)
+        self.endResetModel()
+
+
+class ChannelListView(QListView):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setDragEnabled(True)
+        self.setAcceptDrops(True)
+        self.setDropIndicatorShown(True)
+        self.setDragDropMode(QAbstractItemView.DragDrop)
+        self.setDefaultDropAction(Qt.MoveAction)
+        self.setUniformItemSizes(True)  # Necesario para que las listas grandes se desplacen con fluidez
+
+    def selected_rows(self):
+        return sorted(index.row() for index in self.selectionModel().selectedRows())
+
+    def select_rows(self, first, count):
+        """
+        Selecciona un bloque de filas consecutivas (por ejemplo, tras moverlas).
+        """
+        model = self.model()
+        if count <= 0 or first >= model.rowCount():
+            return
+        last = min(first + count, model.rowCount()) - 1
+        selection = QItemSelection(model.index(first), model.index(last))
+        self.selectionModel().select(selection, QItemSelectionModel.ClearAndSelect)
+        self.scrollTo(model.index(first))
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Delete:
+            self.model().remove_rows(self.selected_rows())
+            return
+        super().keyPressEvent(event)
+
+    def dropEvent(self, event):
+        if event.source() is self:
+            # Reordenación interna: se mueven las referencias en una sola pasada y se indica una acción
+            # de copia para que Qt no intente borrar después las filas originales una a una
+            index = self.indexAt(event.pos())
+            destination = index.row() if index.isValid() else self.model().rowCount()
+            if index.isValid() and self.dropIndicatorPosition() == QAbstractItemView.BelowItem:
+                destination += 1
+            self.model().move_rows(self.selected_rows(), destination)
+            event.setDropAction(Qt.CopyAction)
+            event.accept()
+            self._finish_drop()
+            return
+        if event.mimeData().hasFormat(CHANNEL_IDS_MIME):
+            # Se insertan aquí las referencias: QAbstractItemView::dropEvent acepta la acción propuesta (mover)
+            # y el panel de origen borraría después los canales arrastrados
+            index = self.indexAt(event.pos())
+            row = index.row() if index.isValid() else self.model().rowCount()
+            if index.isValid() and self.dropIndicatorPosition() == QAbstractItemView.BelowItem:
+                row += 1
+            if self.model().dropMimeData(event.mimeData(), Qt.CopyAction, row, -1, QModelIndex()):
+                event.setDropAction(Qt.CopyAction)
+                event.accept()
+            else:
+                event.ignore()
+            self._finish_drop()
+            return
+        super().dropEvent(event)
+
+    def _finish_drop(self):
+        # Lo que haría QAbstractItemView::dropEvent al terminar: salir del estado de arrastre y quitar el indicador
+        self.setState(QAbstractItemView.NoState)
+        self.viewport().update()
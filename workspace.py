@@ -0,0 +1,205 @@
+"""
+workspace.py - Sesión de trabajo de M3U Organizer
+
+Este módulo guarda la sesión de trabajo (la lista cargada ya analizada, el panel derecho, el filtro, la
+ordenación y el historial de deshacer) en un archivo binario compacto, `cache/sesion.bin`, para recuperarla
+al volver a abrir el programa sin descargar ni analizar de nuevo la lista. La sesión se guarda al cerrar y,
+mientras se trabaja, periódicamente en segundo plano si ha cambiado.
+
+El archivo es una secuencia de objetos pickle comprimidos con zlib:
+
+    cabecera -> columnas de cada almacén, por tramos -> paneles e historial
+
+La cabecera es pequeña: se lee al arrancar para mostrar enseguida el filtro, la ordenación y el origen de la
+lista, y el resto se lee después en un hilo. Las columnas se guardan en tramos de `CHUNK_SIZE` canales, así
+que leerlas en otro hilo no bloquea la interfaz más que unos milisegundos seguidos. Las columnas de una
+lista se repiten mucho (group-title, host, atributos de #EXTINF...), así que con el nivel de compresión más
+rápido el archivo ocupa varias veces menos que la propia lista. Las referencias a canales
+(panel derecho, historial) se guardan con la posición de su almacén en el archivo en lugar del almacén.
+
+Funciones:
+----------
+- encode_refs(refs, store_index) / decode_refs(runs, stores): Referencias (almacén, id) como tramos
+  consecutivos del mismo almacén con sus ids en un array, y de vuelta.
+- capture_session(header, store, right_store, rows, view, view_ids, history): Copia de la sesión, tomada en el hilo de
+  la interfaz, que se puede escribir en otro hilo mientras se sigue trabajando.
+- write_session(snapshot, path): Escribe la sesión (sustituyendo el archivo anterior de forma atómica).
+- read_session_header(path): Devuelve la cabecera de la sesión guardada, o None.
+- read_session(path): Lee la sesión completa (almacenes, filas del panel derecho, vista e historial).
+"""
+
+import os
+import pickle
+import struct
+import zlib
+from array import array
+from pathlib import Path
+
+from channelstore import ChannelStore
+from history import decode_ids, encode_ids
+
+# Directorio del script actual
+current_directory = Path(__file__).parent
+
+SESSION_PATH = current_directory / "cache" / "sesion.bin"
+SESSION_MAGIC = b"M3US"
+SESSION_VERSION = 1
+# Canales por tramo de cada columna
+CHUNK_SIZE = 20000
+# Nivel de zlib: el más rápido, que ya reduce mucho el tamaño
+COMPRESSION_LEVEL = 1
+# Cada cuánto se guarda la sesión en segundo plano si ha cambiado (milisegundos)
+SAVE_INTERVAL_MS = 2 * 60 * 1000
+
+
+class _StoreIndex:
+    """Posición de un almacén en el archivo de sesión (sustituye al almacén dentro del historial)."""
+    __slots__ = ("index",)
+
+    def __init__(self, index):
+        self.index = index
+
+
+def encode_refs(refs, store_index):
+    runs = []
+    for store, channel_id in refs:
+        index = store_index(store)
+        if not runs or runs[-1][0] != index:
+            runs.append((index, array('I')))
+        runs[-1][1].append(channel_id)
+    return runs
+
+
+def decode_refs(runs, stores):
+    return [(stores[index], channel_id) for index, ids in runs for channel_id in ids]
+
+
+def _encode_value(value, store_index):
+    if isinstance(value, ChannelStore):
+        return _StoreIndex(store_index(value))
+    if isinstance(value, dict):
+        return {key: _encode_value(item, store_index) for key, item in value.items()}
+    if isinstance(value, (tuple, list)):
+        return type(value)(_encode_value(item, store_index) for item in value)
+    return value
+
+
+def _decode_value(value, stores):
+    if isinstance(value, _StoreIndex):
+        return stores[value.index]
+    if isinstance(value, dict):
+        return {key: _decode_value(item, stores) for key, item in value.items()}
+    if isinstance(value, (tuple, list)):
+        return type(value)(_decode_value(item, stores) for item in value)
+    return value
+
+
+def _write_chunk(file, value):
+    data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), COMPRESSION_LEVEL)
+    file.write(struct.pack("<I", len(data)))
+    file.write(data)
+
+
+def _read_chunk(file):
+    size, = struct.unpack("<I", file.read(4))
+    return pickle.loads(zlib.decompress(file.read(size)))
+
+
+def _copy_columns(store):
+    state = {column: list(getattr(store, column)) for column in ChannelStore.COLUMNS}
+    state["header"] = store.header
+    return state
+
+
+def capture_session(header, store, right_store, rows, view, view_ids, history):
+    """
+    Toma una copia de la sesión: `header` es el diccionario de la cabecera (filtro, ordenación, origen...),
+    `rows` las referencias del panel derecho, `view` y `view_ids` la descripción de la vista del panel
+    izquierdo y los canales que muestra, y `history` el estado del historial (ver `History.to_state`). El almacén de la lista cargada se guarda en
+    la posición 0 y el del panel derecho en la 1; después, cualquier otro al que se haga referencia.
+    """
+    stores = []
+    indexes = {}
+
+    def store_index(value):
+        index = indexes.get(value.key)
+        if index is None:
+            index = indexes[value.key] = len(stores)
+            stores.append(value)
+        return index
+
+    store_index(store)
+    store_index(right_store)
+    tail = {
+        "rows": encode_refs(rows, store_index),
+        "view": view,
+        "view_ids": encode_ids(view_ids),
+        "history": _encode_value(history, store_index),
+    }
+    header = dict(header, version=SESSION_VERSION, stores=[len(value) for value in stores])
+    return {"header": header, "stores": [_copy_columns(value) for value in stores], "tail": tail}
+
+
+def write_session(snapshot, path=SESSION_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(".tmp")
+    with open(temporary, "wb") as file:
+        file.write(SESSION_MAGIC)
+        _write_chunk(file, snapshot["header"])
+        for state in snapshot["stores"]:
+            _write_chunk(file, state["header"])
+            for column in ChannelStore.COLUMNS:
+                values = state[column]
+                for start in range(0, len(values), CHUNK_SIZE):
+                    _write_chunk(file, values[start:start + CHUNK_SIZE])
+        _write_chunk(file, snapshot["tail"])
+    os.replace(temporary, path)  # Sustitución atómica: nunca queda una sesión a medio escribir
+    return str(path)
+
+
+def _read_header(file):
+    if file.read(len(SESSION_MAGIC)) != SESSION_MAGIC:
+        return None
+    header = _read_chunk(file)
+    if not isinstance(header, dict) or header.get("version") != SESSION_VERSION:
+        return None
+    return header
+
+
+def read_session_header(path=SESSION_PATH):
+    try:
+        with open(path, "rb") as file:
+            return _read_header(file)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError, struct.error, zlib.error):
+        return None
+
+
+def read_session(path=SESSION_PATH):
+    """
+    Lee la sesión completa. Devuelve un diccionario con la cabecera, los almacenes reconstruidos, las
+    referencias del panel derecho, la vista del panel izquierdo (descripción e ids) y el estado del historial, o None si no hay
+    una sesión válida.
+    """
+    with open(path, "rb") as file:
+        header = _read_header(file)
+        if header is None:
+            return None
+        stores = []
+        for size in header["stores"]:
+            state = {"header": _read_chunk(file)}
+            for column in ChannelStore.COLUMNS:
+                values = []
+                while len(values) < size:
+                    values.extend(_read_chunk(file))
+                state[column] = values
+            stores.append(ChannelStore.from_state(state))
+        tail = _read_chunk(file)
+    return {
+        "header": header,
+        "stores": stores,
+        "rows": decode_refs(tail["rows"], stores),
+        "view": tail["view"],
+        "view_ids": decode_ids(tail["view_ids"]),
+        "history": _decode_value(tail["history"], stores),
+    }